@@ -1,26 +1,42 @@
+import asyncio
 import datetime
 import importlib.util
+import time
 import json
 import logging
 import os
 import secrets
 from contextlib import asynccontextmanager
 from json import JSONDecodeError
-from typing import Literal, Optional
+from typing import Any, Dict, List, Literal, Optional
 
 import pandas as pd
 import requests
 from dotenv import load_dotenv
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Query
 from fastapi.exceptions import RequestValidationError
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import JSONResponse
 from pydantic import BaseModel
 from starlette.exceptions import HTTPException as StarletteHTTPException
 
+import contraindications
 import conversation_unified_routes
+import dataset
+import embedding_cache
+import explanation_cache
+import http_client
+import lookup
+import lookup_routes
+import memory_report
+import query_cache
 import routes
+import semantic_cache
+import single_flight
+import streaming
+import suggest
 import supabase_client
+from reloader import reloader
 
 # Configuration du logging AVANT toute initialisation
 logging.basicConfig(level=logging.INFO)
@@ -35,6 +51,60 @@ logging.getLogger("asyncio").setLevel(logging.WARNING)
 load_dotenv()
 os.environ["PYTHONIOENCODING"] = "utf-8"
 
+# État du pré-chargement (modèles, données, index): "pending" -> "warming" -> "ready" | "failed"
+WARMUP_RETRIES = int(os.getenv("WARMUP_RETRIES", "3"))
+WARMUP_RETRY_DELAY = float(os.getenv("WARMUP_RETRY_DELAY", "10"))
+# Sans index vectoriel, l'instance sert en recherche lexicale seule ("degraded" dans /ready).
+# false: elle reste dans le trafic (200); true: /ready répond 503 tant que l'index manque
+READY_REQUIRES_VECTOR_INDEX = os.getenv("READY_REQUIRES_VECTOR_INDEX", "false").lower() in ("true", "1", "t")
+warmup_state = {"status": "pending", "backend": None, "timings": {}, "error": None, "duration": None}
+
+# Tâches de fond en cours (pré-chargement): la boucle ne garde qu'une référence faible aux
+# tâches, celle-ci les protège du ramasse-miettes jusqu'à leur fin
+background_tasks = set()
+
+def start_background_task(coro, name):
+    task = asyncio.create_task(coro, name=name)
+    background_tasks.add(task)
+    task.add_done_callback(_background_task_done)
+    return task
+
+def _background_task_done(task):
+    background_tasks.discard(task)
+    if not task.cancelled() and task.exception() is not None:
+        logger.error(f"❌ Tâche de fond {task.get_name()} en échec: {task.exception()!r}", exc_info=task.exception())
+
+async def warm_up_llm_module():
+    """Pré-charge le module LLM courant dans un thread, sans bloquer la boucle d'événements"""
+    module = llm_module
+    # Un re-chargement (changement de backend) ne retire pas une instance déjà prête du trafic
+    was_ready = warmup_state["status"] == "ready"
+    warmup_state.update(status="ready" if was_ready else "warming", backend=current_llm_backend, error=None)
+    start_time = time.time()
+    
+    for attempt in range(1, WARMUP_RETRIES + 1):
+        try:
+            logger.info(f"🔥 Pré-chargement du module {module.__name__} (tentative {attempt})...")
+            source_df = reloader.current.df if reloader.current else df
+            report = await asyncio.to_thread(module.warm_up, source_df, csv_path)
+            # Première génération (ou génération du nouveau backend): données + index du module
+            reloader.install(source_df, csv_path, getattr(module, "vectorstore", None), module,
+                             {"timings": report["timings"]})
+            warmup_state.update(status="ready", timings=report["timings"], duration=round(time.time() - start_time, 3))
+            if report["vector_index"]:
+                logger.info(f"✅ Instance prête en {warmup_state['duration']}s")
+            else:
+                logger.warning(f"⚠️ Instance prête en {warmup_state['duration']}s, sans index vectoriel (mode dégradé)")
+            return
+        except Exception as e:
+            logger.error(f"❌ Échec du pré-chargement: {e}")
+            warmup_state["error"] = str(e)
+            if attempt < WARMUP_RETRIES:
+                await asyncio.sleep(WARMUP_RETRY_DELAY)
+    
+    if not was_ready:
+        warmup_state.update(status="failed", duration=round(time.time() - start_time, 3))
+
 @asynccontextmanager
 async def lifespan(app):
     try:
@@ -42,7 +112,14 @@ async def lifespan(app):
     except Exception as e:
         pass
     
+    # Le pré-chargement tourne en tâche de fond: /health répond immédiatement, /ready une fois chaud
+    start_background_task(warm_up_llm_module(), "warmup")
+    
     yield
+    
+    for task in list(background_tasks):
+        task.cancel()
+    await http_client.aclose()
 
 app = FastAPI(
     title="aiBotanik", 
@@ -79,7 +156,9 @@ app.add_middleware(
 @app.middleware("http")
 async def add_utf8_header(request, call_next):
     response = await call_next(request)
-    response.headers["Content-Type"] = "application/json; charset=utf-8"
+    # Les flux SSE (/recommend/stream, /chat/stream) gardent leur type text/event-stream
+    if not response.headers.get("Content-Type", "").startswith("text/event-stream"):
+        response.headers["Content-Type"] = "application/json; charset=utf-8"
     return response
 
 CONFIG_PATH = os.path.join(os.path.dirname(__file__), "config.json")
@@ -238,13 +317,12 @@ safe_initialize_llm()
 
 try:
     csv_path = os.path.join(os.path.dirname(__file__), "data", "baseplante.csv")
-    
-    if not os.path.exists(csv_path):
-        raise FileNotFoundError(f"Fichier CSV introuvable: {csv_path}")
-        
-    df = pd.read_csv(csv_path, sep=";", quotechar='"', encoding='utf-8')
+    # Instantané Arrow lu en mmap si le CSV n'a pas changé, analyse du CSV sinon;
+    # seules les colonnes de recherche restent en mémoire, la base compilée garde le reste
+    df = dataset.compact_for_serving(dataset.load_dataset(csv_path))
 except Exception as e:
-    df = pd.DataFrame(columns=["plante_recette", "maladiesoigneeparrecette", "plante_quantite_recette", "recette"])
+    logger.error(f"❌ Chargement du jeu de données impossible: {e}")
+    df = pd.DataFrame(columns=dataset.EXPECTED_COLUMNS)
 
 def normalize_text(text):
     """Normalise le texte pour éviter les problèmes d'encodage"""
@@ -276,6 +354,8 @@ class NormalizedResponse(BaseModel):
 class RequestBody(BaseModel):
     symptoms: str
     attempt_count: int = 1  # Défaut à 1 pour la première tentative
+    # Contre-indications du patient ("enceinte", "enfant", "ulcère", ...): recettes incompatibles écartées
+    patient_profile: Optional[List[str]] = None
 
 class ChatRequestBody(BaseModel):
     message: str
@@ -298,6 +378,10 @@ class ResponseBody(NormalizedResponse):
     precautions_info: str = ""
     composants_info: str = ""
     resume_traitement: str = ""
+    confidence: float = 0.0
+    alternatives: List[Dict[str, Any]] = []
+    needs_more_details: bool = False
+    requires_consultation: bool = False
 
 class ConfigUpdateBody(BaseModel):
     llm_backend: Literal["huggingface", "openai"]
@@ -312,8 +396,23 @@ async def get_current_llm_module():
     global llm_module
     return llm_module
 
+def get_profile_mask(patient_profile):
+    """Masque des contre-indications du profil patient; 422 pour un terme inconnu"""
+    try:
+        return contraindications.get_vocabulary().profile_mask(patient_profile)
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+
+def chat_plant_words():
+    """Mots des noms de plantes de la génération courante (garde-fou du cache sémantique du chat)"""
+    generation = reloader.current
+    if generation is None:
+        return frozenset()
+    return lookup.get_lookup(generation.df).name_words
+
 @app.post("/recommend", response_model=ResponseBody)
 async def recommend(body: RequestBody):
+    profile_mask = get_profile_mask(body.patient_profile)
     try:
         # Log explicite du module utilisé
         module_name = llm_module.__name__ if hasattr(llm_module, '__name__') else str(llm_module)
@@ -322,23 +421,116 @@ async def recommend(body: RequestBody):
         logger.info(f"🔍 REQUÊTE /recommend - Module path: {getattr(llm_module, '__file__', 'N/A')}")
         logger.info(f"🔍 REQUÊTE /recommend - Tentative n°: {body.attempt_count}")
         
-        csv_path = os.path.abspath("data/baseplante.csv")
-        result = llm_module.get_recommendation(body.symptoms, df, csv_path, body.attempt_count)
+        # Génération lue une seule fois: la requête termine sur celle-ci même si un rechargement la remplace
+        generation = reloader.current
+        module = llm_module
+        
+        # Chemin asynchrone: un appel lent (LLM, Unsplash) ne bloque pas les autres requêtes
+        def make_recommendation():
+            if generation is None:
+                return module.get_recommendation_async(body.symptoms, df, csv_path, body.attempt_count,
+                                                       profile_mask=profile_mask)
+            return module.get_recommendation_async(
+                body.symptoms, generation.df, generation.csv_path, body.attempt_count,
+                vs=generation.vectorstore_for(module), profile_mask=profile_mask
+            )
+        
+        # Mêmes symptômes déjà en cours de traitement: la requête attend ce calcul au lieu d'en relancer un
+        key = (module.__name__, generation.number if generation else None, query_cache.query_key(body.symptoms),
+               body.attempt_count, profile_mask)
+        result = await single_flight.coalesce("recommend", key, make_recommendation)
         return result
     except Exception as e:
         logger.error(f"Erreur lors de la génération de recommandation: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
 
-@app.post("/admin/rebuild-index")
-async def rebuild_index():
-    """Force la reconstruction de l'index vectoriel"""
-    try:
-        csv_path = os.path.abspath("data/baseplante.csv")
-        llm_module.build_and_save_vectorstore(df, csv_path)
-        return {"status": "success", "message": "Index vectoriel reconstruit avec succès"}
-    except Exception as e:
-        logger.error(f"Erreur lors de la reconstruction de l'index: {str(e)}")
-        raise HTTPException(status_code=500, detail=str(e))
+@app.post("/recommend/stream")
+async def recommend_stream(body: RequestBody):
+    """
+    /recommend en Server-Sent Events: champs de la recette ("plant") dès la fin de la recherche,
+    image, tokens et sections de l'explication au fil de la génération, puis "done" (réponse de /recommend).
+    """
+    profile_mask = get_profile_mask(body.patient_profile)
+    # Module et génération lus une seule fois: le flux termine sur ceux-ci même après un changement
+    module = llm_module
+    generation = reloader.current
+    logger.info(f"🔍 REQUÊTE /recommend/stream - Backend actuel: {current_llm_backend}")
+    
+    def events():
+        if generation is None:
+            stream = streaming.recommendation_events(module, body.symptoms, df, csv_path, body.attempt_count,
+                                                     profile_mask=profile_mask)
+        else:
+            stream = streaming.recommendation_events(
+                module, body.symptoms, generation.df, generation.csv_path, body.attempt_count,
+                vs=generation.vectorstore_for(module), profile_mask=profile_mask
+            )
+        try:
+            for event, data in stream:
+                if event == "done":
+                    data = ResponseBody(**data).dict()
+                yield event, data
+        except Exception as e:
+            logger.error(f"Erreur lors de la génération de recommandation en flux: {str(e)}")
+            yield "error", {"detail": str(e)}
+    
+    return streaming.event_stream(events())
+
+@app.get("/patient-profile")
+async def patient_profile_flags():
+    """Contre-indications reconnues dans le profil patient de /recommend, avec leurs alias"""
+    vocabulary = contraindications.get_vocabulary()
+    return {"version": vocabulary.version, "flags": vocabulary.describe()}
+
+@app.get("/suggest")
+async def suggest_symptoms(q: str = "", limit: int = Query(suggest.SUGGEST_TOP_K, ge=1, le=suggest.SUGGEST_TOP_K)):
+    """Autocomplétion de la saisie des symptômes (pathologies, alias, noms locaux), servie par le trie en mémoire"""
+    generation = reloader.current
+    if generation is None:
+        raise HTTPException(status_code=503, detail="Données en cours de chargement, réessayez dans quelques instants")
+    suggester = await asyncio.to_thread(suggest.get_suggester, generation.df)
+    suggestions = suggester.complete(q, limit)
+    return {"query": q, "suggestions": [s.to_dict() for s in suggestions]}
+
+@app.post("/admin/rebuild-index", status_code=202)
+async def rebuild_index(full: bool = False):
+    """
+    Relit le CSV et reconstruit l'index vectoriel en arrière-plan (incrémental par défaut).
+    La nouvelle génération remplace l'ancienne une fois prête; suivi via /admin/reload/status.
+    """
+    if not reloader.start(llm_module, csv_path, incremental=not full):
+        raise HTTPException(status_code=409, detail="Un rechargement est déjà en cours")
+    return {
+        "status": "accepted",
+        "message": "Reconstruction de l'index lancée en arrière-plan",
+        "reload": dict(reloader.status)
+    }
+
+@app.get("/admin/reload/status")
+async def reload_status():
+    """Progression du rechargement en cours, génération servie et historique"""
+    return reloader.describe()
+
+@app.get("/admin/cache/stats")
+async def cache_stats():
+    """Statistiques des caches (taille, hits/misses) pour leur dimensionnement"""
+    return {
+        "embeddings": embedding_cache.get_embedding_store().stats(),
+        "queries": query_cache.stats(),
+        "explanations": explanation_cache.stats(),
+        "chat": semantic_cache.stats(),
+        "coalescing": single_flight.stats()
+    }
+
+@app.get("/admin/memory")
+async def memory_usage():
+    """Mémoire du worker: structures de la génération servie et RSS privée/partagée"""
+    generation = reloader.current
+    if generation is None:
+        return {"generation": None, "process": memory_report.process_memory()}
+    report = await asyncio.to_thread(memory_report.generation_report, generation.df, generation.vectorstore)
+    report["generation"] = generation.number
+    return report
 
 @app.post("/chat")
 async def chat(body: ChatRequestBody):
@@ -351,7 +543,12 @@ async def chat(body: ChatRequestBody):
         
         start_time = datetime.datetime.now()
         
-        result = llm_module.generate_chat_response(body.message)
+        module = llm_module
+        plant_words = await asyncio.to_thread(chat_plant_words)
+        result = await single_flight.coalesce(
+            "chat", (module.__name__, query_cache.query_key(body.message)),
+            lambda: module.generate_chat_response_async(body.message, plant_words)
+        )
         
         if result:
             result = normalize_text(result)
@@ -381,6 +578,35 @@ async def chat(body: ChatRequestBody):
             "backend": current_llm_backend
         }
 
+@app.post("/chat/stream")
+async def chat_stream(body: ChatRequestBody):
+    """/chat en Server-Sent Events: tokens de la réponse au fil de la génération, puis "done" (réponse de /chat)"""
+    module = llm_module
+    backend_name = "OpenAI" if current_llm_backend == "openai" else "HuggingFace"
+    logger.info(f"🔍 REQUÊTE /chat/stream - Backend actuel: {current_llm_backend}")
+    
+    def events():
+        start_time = datetime.datetime.now()
+        try:
+            for event, data in streaming.chat_events(module, body.message, chat_plant_words()):
+                if event == "done":
+                    data = {
+                        **data,
+                        "response": normalize_text(data["response"]),
+                        "timestamp": str(datetime.datetime.now()),
+                        "processing_time": (datetime.datetime.now() - start_time).total_seconds(),
+                        "question": normalize_text(body.message),
+                        "mode": "discussion",
+                        "status": "success",
+                        "backend": backend_name
+                    }
+                yield event, data
+        except Exception as e:
+            logger.error(f"Erreur lors de la génération de réponse chat en flux: {str(e)}")
+            yield "error", {"detail": str(e)}
+    
+    return streaming.event_stream(events())
+
 @app.put("/admin/config/llm", response_model=ConfigResponseBody)
 async def update_llm_config(body: ConfigUpdateBody):
     """Configuration du backend LLM avec validation robuste"""
@@ -460,6 +686,8 @@ async def update_llm_config(body: ConfigUpdateBody):
                 if hasattr(new_module, 'get_recommendation'):
                     llm_module = new_module
                     logger.info(f"✅ Basculement réussi vers {current_llm_backend}")
+                    # Pré-charger l'index du nouveau backend en tâche de fond
+                    start_background_task(warm_up_llm_module(), f"warmup-{current_llm_backend}")
                     return ConfigResponseBody(
                         llm_backend=current_llm_backend,
                         status="success",
@@ -518,8 +746,35 @@ async def health_check():
         "timestamp": str(datetime.datetime.now()),
         "backend": current_llm_backend,
         "database": "supabase",
-        "data_loaded": len(df) > 0
+        "data_loaded": len(reloader.current.df if reloader.current else df) > 0
+    }
+
+@app.get("/ready")
+async def readiness_check():
+    """
+    Prête à servir: modèles, données et index chargés (503 tant que le pré-chargement n'est pas fini).
+    "degraded": pré-chargement terminé mais pas d'index vectoriel pour le backend courant (recherche
+    lexicale seule); 503 seulement si READY_REQUIRES_VECTOR_INDEX.
+    """
+    # Index de la génération servie: un rechargement réussi le rétablit
+    generation = reloader.current
+    vector_index = generation is not None and generation.vectorstore_for(llm_module) is not None
+    status = warmup_state["status"]
+    if status == "ready" and not vector_index:
+        status = "degraded"
+    body = {
+        "status": status,
+        "degraded": status == "degraded",
+        "vector_index": vector_index,
+        "backend": warmup_state["backend"],
+        "timings": warmup_state["timings"],
+        "duration": warmup_state["duration"],
+        "error": warmup_state["error"],
+        "data_loaded": len(reloader.current.df if reloader.current else df) > 0
     }
+    serving = status == "ready" or (status == "degraded" and not READY_REQUIRES_VECTOR_INDEX)
+    status_code = 200 if serving else 503
+    return JSONResponse(content=body, status_code=status_code)
 
 @app.get("/")
 @app.head("/")  # Pour les health checks de Render
@@ -530,11 +785,13 @@ async def root():
         "description": "API de recommandation de phytothérapie africaine",
         "docs": "/api/docs",
         "health": "/health",
+        "ready": "/ready",
         "version": "1.0.0"
     }
 
 app.include_router(routes.router, prefix="/api")
 app.include_router(conversation_unified_routes.router)
+app.include_router(lookup_routes.router)
 
 # Gestionnaires d'exceptions (doivent être définis avant le main)
 @app.exception_handler(RequestValidationError)
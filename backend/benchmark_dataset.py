@@ -0,0 +1,66 @@
+#!/usr/bin/env python3
+"""
+Benchmark du chargement du jeu de données au démarrage: analyse du CSV vs instantané Arrow.
+
+Le CSV est répliqué jusqu'à --rows lignes dans un répertoire temporaire pour simuler
+la croissance de la base. Pour chaque taille, on mesure (médiane de --repeat essais):
+l'analyse pandas du CSV, le calcul de l'empreinte (payé seulement si le CSV a été touché),
+la lecture de l'instantané (mmap) et le chemin complet de démarrage load_dataset()
+avec un instantané valide.
+
+Usage: python benchmark_dataset.py [--rows 118 5000 50000] [--repeat 5]
+"""
+import argparse
+import os
+import shutil
+import statistics
+import tempfile
+import time
+
+import pandas as pd
+
+import dataset
+
+
+def measure(fn, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - start)
+    return statistics.median(timings) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, nargs="+", default=[118, 5000, 50000])
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    if dataset.feather is None:
+        raise SystemExit("pyarrow n'est pas installé: pas d'instantané à comparer")
+
+    source = dataset.read_csv(dataset.DEFAULT_CSV_PATH)
+    workdir = tempfile.mkdtemp(prefix="aibotanik-dataset-")
+    try:
+        print(f"{'lignes':>8} {'taille CSV':>11} {'CSV':>10} {'empreinte':>10} {'instantané':>11} {'démarrage':>10} {'gain':>7}")
+        for rows in args.rows:
+            copies = -(-rows // len(source))
+            df = pd.concat([source] * copies, ignore_index=True).iloc[:rows]
+            csv_path = os.path.join(workdir, f"baseplante_{rows}.csv")
+            df.to_csv(csv_path, index=False, sep=";", quotechar='"', encoding="utf-8")
+            dataset.load_dataset(csv_path)  # écrit l'instantané
+
+            csv_ms = measure(lambda: dataset.read_csv(csv_path), args.repeat)
+            checksum_ms = measure(lambda: dataset.file_checksum(csv_path), args.repeat)
+            snapshot_ms = measure(lambda: dataset.read_snapshot(csv_path), args.repeat)
+            startup_ms = measure(lambda: dataset.load_dataset(csv_path), args.repeat)
+            size_mb = os.path.getsize(csv_path) / (1 << 20)
+            print(f"{rows:>8} {size_mb:>9.1f}Mo {csv_ms:>8.1f}ms {checksum_ms:>8.1f}ms "
+                  f"{snapshot_ms:>9.1f}ms {startup_ms:>8.1f}ms {csv_ms / startup_ms:>6.1f}x")
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
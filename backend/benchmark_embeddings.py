@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+"""
+Benchmark des runtimes d'embeddings all-MiniLM-L6-v2: PyTorch (sentence-transformers) vs ONNX int8.
+
+Mesure, pour chaque runtime dans un processus séparé: temps de chargement (imports compris),
+RSS après chargement, latence par requête (p50/p95) et débit en lot. Vérifie aussi que les
+vecteurs des deux runtimes restent alignés (similarité cosinus entre runtimes).
+
+Usage: python benchmark_embeddings.py [--queries 200]
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+
+SAMPLE_QUERIES = [
+    "j'ai le paludisme",
+    "fièvre et frissons depuis trois jours",
+    "diarrhée et mal de ventre",
+    "je tousse beaucoup la nuit",
+    "douleurs articulaires aux genoux",
+    "mal de tête persistant",
+    "problèmes de sommeil, insomnie",
+    "hypertension artérielle",
+    "brûlures d'estomac après les repas",
+    "démangeaisons et plaques sur la peau",
+]
+
+
+def current_rss_mb():
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    import resource
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def run_worker(runtime, n_queries):
+    """Exécuté dans un sous-processus: charge un runtime et mesure"""
+    import numpy as np
+
+    cache_dir = os.getenv("TRANSFORMERS_CACHE", "/opt/render/.cache/huggingface")
+    rss_before = current_rss_mb()
+    start = time.perf_counter()
+    if runtime == "onnx":
+        from onnx_embeddings import OnnxEmbeddings
+        model = OnnxEmbeddings("sentence-transformers/all-MiniLM-L6-v2", cache_dir)
+    else:
+        from langchain_community.embeddings import HuggingFaceEmbeddings
+        model = HuggingFaceEmbeddings(
+            model_name="sentence-transformers/all-MiniLM-L6-v2",
+            cache_folder=cache_dir,
+            model_kwargs={"device": "cpu"}
+        )
+    model.embed_query("warmup")
+    load_time = time.perf_counter() - start
+
+    latencies = []
+    for i in range(n_queries):
+        t = time.perf_counter()
+        model.embed_query(SAMPLE_QUERIES[i % len(SAMPLE_QUERIES)])
+        latencies.append((time.perf_counter() - t) * 1000)
+
+    batch = SAMPLE_QUERIES * 10
+    t = time.perf_counter()
+    model.embed_documents(batch)
+    batch_time = time.perf_counter() - t
+
+    vectors = np.asarray(model.embed_documents(SAMPLE_QUERIES), dtype="float32")
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+
+    print(json.dumps({
+        "runtime": runtime,
+        "load_time_s": round(load_time, 3),
+        "rss_mb": round(current_rss_mb(), 1),
+        "rss_delta_mb": round(current_rss_mb() - rss_before, 1),
+        "p50_ms": round(float(np.percentile(latencies, 50)), 2),
+        "p95_ms": round(float(np.percentile(latencies, 95)), 2),
+        "batch_docs_per_s": round(len(batch) / batch_time, 1),
+        "vectors": vectors.tolist(),
+    }))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--worker", choices=["torch", "onnx"], help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        run_worker(args.worker, args.queries)
+        return
+
+    import numpy as np
+
+    results = {}
+    for runtime in ("torch", "onnx"):
+        print(f"⏱️  Mesure du runtime {runtime}...")
+        proc = subprocess.run(
+            [sys.executable, __file__, "--worker", runtime, "--queries", str(args.queries)],
+            capture_output=True, text=True, cwd=os.path.dirname(os.path.abspath(__file__))
+        )
+        if proc.returncode != 0:
+            print(f"❌ Échec du runtime {runtime}:\n{proc.stderr[-2000:]}")
+            continue
+        results[runtime] = json.loads(proc.stdout.strip().splitlines()[-1])
+
+    print("\n" + "=" * 72)
+    print(f"{'runtime':<8} {'chargement':>11} {'RSS':>9} {'p50':>9} {'p95':>9} {'lot (doc/s)':>13}")
+    for runtime, r in results.items():
+        print(f"{runtime:<8} {r['load_time_s']:>10.2f}s {r['rss_mb']:>7.0f}Mo "
+              f"{r['p50_ms']:>7.2f}ms {r['p95_ms']:>7.2f}ms {r['batch_docs_per_s']:>13.1f}")
+
+    if len(results) == 2:
+        a = np.asarray(results["torch"]["vectors"])
+        b = np.asarray(results["onnx"]["vectors"])
+        agreement = (a * b).sum(axis=1)
+        print(f"\n🔗 Similarité cosinus torch/onnx: min {agreement.min():.4f}, moyenne {agreement.mean():.4f}")
+    print("=" * 72)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+#!/usr/bin/env python3
+"""
+Benchmark de la correction des fautes de frappe (fuzzy.py) sur un grand vocabulaire.
+
+Les pathologies du CSV sont répliquées jusqu'à --rows lignes; chaque copie reçoit des
+mots synthétiques (syllabes aléatoires) pour que le vocabulaire croisse avec la base,
+comme le ferait une vraie base de 100k recettes. On mesure la construction de la matrice
+creuse des trigrammes puis la latence (médiane et p95) d'une correction.
+
+Usage: python benchmark_fuzzy.py [--rows 118 10000 100000] [--queries 200]
+"""
+import argparse
+import random
+import statistics
+import time
+
+import dataset
+import fuzzy
+
+SYLLABLES = ["pa", "lu", "dis", "me", "dia", "rr", "hee", "to", "xi", "ca", "ne", "phro", "gas", "tri", "que", "os"]
+TYPOS = ["paludism", "diarhee", "hemoroide", "insomie", "tuberculos", "rougeol", "hepatit", "asthm"]
+
+
+def synthetic_pathologies(source, rows, rng):
+    values = []
+    while len(values) < rows:
+        base = source[len(values) % len(source)]
+        invented = "".join(rng.choice(SYLLABLES) for _ in range(rng.randint(3, 5)))
+        values.append(f"{base}, {invented}")
+    return values
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, nargs="+", default=[118, 10000, 100000])
+    parser.add_argument("--queries", type=int, default=200)
+    args = parser.parse_args()
+
+    if fuzzy.sparse is None:
+        raise SystemExit("scipy n'est pas installé: correction des fautes indisponible")
+
+    rng = random.Random(0)
+    source = dataset.load_dataset(dataset.DEFAULT_CSV_PATH)["maladiesoigneeparrecette"].dropna().tolist()
+    print(f"{'lignes':>8} {'mots':>8} {'trigrammes':>11} {'construction':>13} {'médiane':>9} {'p95':>9}  exemple")
+    for rows in args.rows:
+        values = source[:rows] if rows <= len(source) else synthetic_pathologies(source, rows, rng)
+        start = time.perf_counter()
+        matcher = fuzzy.FuzzyMatcher.from_values(values)
+        build_ms = (time.perf_counter() - start) * 1000
+
+        timings = []
+        for i in range(args.queries):
+            typo = TYPOS[i % len(TYPOS)]
+            start = time.perf_counter()
+            matcher.match(typo)
+            timings.append((time.perf_counter() - start) * 1000)
+        timings.sort()
+        p95 = timings[int(len(timings) * 0.95) - 1]
+        example = matcher.match(TYPOS[1])
+        print(f"{rows:>8} {len(matcher):>8} {len(matcher.trigram_ids):>11} {build_ms:>11.0f}ms "
+              f"{statistics.median(timings):>7.2f}ms {p95:>7.2f}ms  {TYPOS[1]} -> {example}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,158 @@
+"""
+Contre-indications ramenées à un vocabulaire fixe de drapeaux (data/contraindications.json).
+
+Les champs recette_contreindication et plante_contreindication ("Child under 12; pregnancy")
+sont analysés une fois à la compilation de la base (plant_store.py), par texte distinct:
+chaque recette reçoit un masque de bits uint64 (un bit par drapeau). Le profil patient
+envoyé à /recommend ("enceinte", "enfant", "ulcère") devient lui aussi un masque, et la
+recherche écarte les recettes incompatibles par un simple ET vectorisé sur toutes les
+lignes, avant le classement, au lieu de laisser le LLM expliquer une recette dangereuse.
+"""
+import json
+import logging
+import os
+import threading
+
+import numpy as np
+
+from synonyms import fold_alias
+
+logger = logging.getLogger(__name__)
+
+CONTRAINDICATIONS_PATH = os.getenv(
+    "CONTRAINDICATIONS_PATH",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "contraindications.json")
+)
+
+MAX_FLAGS = 64
+
+
+class Flag:
+    """Drapeau du vocabulaire: identifiant, bit, libellé affiché et motifs repliés"""
+    __slots__ = ("id", "bit", "label", "patterns", "aliases")
+
+    def __init__(self, id, bit, label, patterns, aliases):
+        self.id = id
+        self.bit = bit
+        self.label = label
+        self.patterns = [" " + fold_alias(p) for p in patterns if fold_alias(p)]
+        self.aliases = [fold_alias(a) for a in aliases if fold_alias(a)]
+
+    def __repr__(self):
+        return f"Flag({self.id!r}, bit={self.bit})"
+
+
+class FlagVocabulary:
+    """Drapeaux dans l'ordre du fichier (l'ordre fixe le bit de chacun)"""
+
+    def __init__(self, flags, version=None):
+        if len(flags) > MAX_FLAGS:
+            raise ValueError(f"{len(flags)} drapeaux, {MAX_FLAGS} au maximum")
+        self.flags = flags
+        self.version = version
+        self.by_alias = {}
+        for flag in flags:
+            for alias in [fold_alias(flag.id.replace("_", " "))] + flag.aliases:
+                self.by_alias.setdefault(alias, flag)
+
+    @classmethod
+    def from_file(cls, path=CONTRAINDICATIONS_PATH):
+        with open(path, encoding="utf-8") as f:
+            data = json.load(f)
+        flags = [
+            Flag(flag_id, bit, entry.get("label", flag_id), entry.get("patterns", []), entry.get("aliases", []))
+            for bit, (flag_id, entry) in enumerate(data.get("flags", {}).items())
+        ]
+        return cls(flags, version=data.get("version"))
+
+    def mask_of_text(self, text):
+        """Masque des drapeaux dont un motif apparaît en début de mot dans le texte"""
+        folded = " " + fold_alias(text)
+        mask = 0
+        for flag in self.flags:
+            if any(pattern in folded for pattern in flag.patterns):
+                mask |= 1 << flag.bit
+        return mask
+
+    def profile_mask(self, profile):
+        """
+        Masque d'un profil patient (liste de termes: identifiants ou alias, français ou anglais).
+        Lève ValueError pour un terme inconnu plutôt que d'ignorer une contre-indication.
+        """
+        mask, unknown = 0, []
+        for term in profile or ():
+            flag = self.by_alias.get(fold_alias(term))
+            if flag is None:
+                unknown.append(term)
+            else:
+                mask |= 1 << flag.bit
+        if unknown:
+            raise ValueError(f"Termes du profil patient non reconnus: {', '.join(unknown)}")
+        return mask
+
+    def labels(self, mask):
+        return [flag.label for flag in self.flags if mask >> flag.bit & 1]
+
+    def describe(self):
+        return {flag.id: {"label": flag.label, "aliases": flag.aliases} for flag in self.flags}
+
+
+def row_masks(text_codes, texts, vocabulary=None):
+    """
+    Masques uint64 par ligne à partir des codes d'une colonne texte encodée: chaque texte
+    distinct n'est analysé qu'une fois, puis le résultat est diffusé par indexation.
+    """
+    vocabulary = vocabulary or get_vocabulary()
+    distinct, inverse = np.unique(text_codes, return_inverse=True)
+    masks = np.fromiter((vocabulary.mask_of_text(texts[code]) for code in distinct), dtype="uint64", count=len(distinct))
+    return masks[inverse] if len(text_codes) else np.zeros(0, dtype="uint64")
+
+
+def excluded_rows(row_flags, mask):
+    """Lignes incompatibles avec le masque du profil (tableau booléen), None sans profil"""
+    if not mask or row_flags is None:
+        return None
+    return (row_flags & np.uint64(mask)) != 0
+
+
+def profile_excluded_response(mask, vocabulary=None):
+    """Réponse de /recommend quand toutes les recettes pertinentes sont contre-indiquées pour le patient"""
+    labels = ", ".join((vocabulary or get_vocabulary()).labels(mask))
+    return {
+        "plant": "Consultation recommandée",
+        "explanation": f"""Les recettes de notre base qui correspondent à vos symptômes sont contre-indiquées dans votre situation ({labels}).
+
+Par précaution, aucune d'entre elles ne vous est proposée. Je vous recommande de :
+
+**🌿 Consulter un thérapeute en phytothérapie :**
+Vous pouvez trouver des contacts qualifiés sur notre page d'accueil grâce à la fonctionnalité « Contacter un thérapeute ».
+
+**🩺 Consulter un médecin :**
+Pour obtenir un traitement adapté à votre situation.""",
+        "dosage": "Consultation professionnelle requise",
+        "prep": "Consultation professionnelle requise",
+        "image_url": "",
+        "contre_indications": f"Recettes écartées: contre-indiquées pour {labels}",
+        "partie_utilisee": "Consultation professionnelle requise",
+        "composants": "Consultation professionnelle requise",
+        "nom_local": "",
+        "requires_consultation": True
+    }
+
+
+_vocabulary = None
+_vocabulary_lock = threading.Lock()
+
+
+def get_vocabulary():
+    """Vocabulaire chargé au premier appel (vide si le fichier est illisible)"""
+    global _vocabulary
+    with _vocabulary_lock:
+        if _vocabulary is None:
+            try:
+                _vocabulary = FlagVocabulary.from_file()
+                logger.info(f"Contre-indications v{_vocabulary.version}: {len(_vocabulary.flags)} drapeaux")
+            except (OSError, ValueError) as e:
+                logger.error(f"❌ Vocabulaire des contre-indications illisible ({CONTRAINDICATIONS_PATH}): {e}")
+                _vocabulary = FlagVocabulary([])
+        return _vocabulary
@@ -0,0 +1,188 @@
+"""
+Chargement du jeu de données des recettes (baseplante.csv) via un instantané colonnaire.
+
+Le CSV (champs multi-valués longs et entre guillemets) n'est analysé que lorsqu'il change:
+son contenu est alors écrit en Arrow/Feather non compressé, accompagné d'un fichier de
+métadonnées contenant l'empreinte du CSV source. Au démarrage, si l'empreinte du CSV
+correspond, l'instantané est lu en mmap au lieu de ré-analyser le CSV. Comme pour
+l'index git, la taille et la date de modification du CSV évitent de recalculer
+l'empreinte tant que le fichier n'a pas été touché.
+
+    data/baseplante.feather        -> instantané Arrow (Feather v2, non compressé)
+    data/baseplante.snapshot.json  -> empreinte du CSV, lignes, colonnes, version
+
+pyarrow est optionnel: sans lui, le CSV est simplement analysé à chaque démarrage.
+
+En service, le DataFrame complet n'est gardé que le temps de compiler la base des recettes
+(compact_for_serving): seules les colonnes relues ensuite restent en mémoire.
+
+Usage (étape de build): python dataset.py
+"""
+import hashlib
+import json
+import logging
+import os
+import time
+
+import pandas as pd
+
+import plant_store
+
+logger = logging.getLogger(__name__)
+
+SNAPSHOT_FORMAT_VERSION = 1
+CSV_OPTIONS = {"sep": ";", "quotechar": '"', "encoding": "utf-8"}
+DEFAULT_CSV_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "baseplante.csv")
+EXPECTED_COLUMNS = ["plante_recette", "maladiesoigneeparrecette", "plante_quantite_recette", "recette"]
+# Colonnes encore lues dans le DataFrame après compilation de la base: index BM25
+# (retrieval.RETRIEVAL_FIELDS), documents vectorisés par couple pathologie/plante et
+# correction des fautes. Les autres champs sont servis par plant_store.
+SERVING_COLUMNS = ["plante_recette", "maladiesoigneeparrecette", "recette"]
+
+try:
+    import pyarrow.feather as feather
+except ImportError:
+    feather = None
+
+
+def snapshot_paths(csv_path):
+    base, _ = os.path.splitext(csv_path)
+    return base + ".feather", base + ".snapshot.json"
+
+
+def file_checksum(path, chunk_size=1 << 20):
+    """Empreinte BLAKE2b du fichier source, lue par blocs"""
+    digest = hashlib.blake2b(digest_size=16)
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def file_signature(path):
+    stat = os.stat(path)
+    return {"csv_size": stat.st_size, "csv_mtime_ns": stat.st_mtime_ns}
+
+
+def read_csv(csv_path):
+    return pd.read_csv(csv_path, **CSV_OPTIONS)
+
+
+def write_snapshot(df, csv_path, checksum=None):
+    """Écrit l'instantané puis ses métadonnées (remplacements atomiques, métadonnées en dernier)"""
+    if feather is None:
+        return None
+    snapshot_path, meta_path = snapshot_paths(csv_path)
+    checksum = checksum or file_checksum(csv_path)
+
+    tmp_path = snapshot_path + ".tmp"
+    feather.write_feather(df.reset_index(drop=True), tmp_path, compression="uncompressed")
+    os.replace(tmp_path, snapshot_path)
+
+    meta = {
+        "format_version": SNAPSHOT_FORMAT_VERSION,
+        "csv_checksum": checksum,
+        **file_signature(csv_path),
+        "rows": len(df),
+        "columns": list(df.columns),
+        "created_at": time.time(),
+    }
+    with open(meta_path + ".tmp", "w", encoding="utf-8") as f:
+        json.dump(meta, f, ensure_ascii=False, indent=2)
+    os.replace(meta_path + ".tmp", meta_path)
+    logger.info(f"💾 Instantané du jeu de données écrit: {snapshot_path} ({len(df)} lignes)")
+    return meta
+
+
+def _refresh_signature(meta_path, meta, signature):
+    """Contenu inchangé malgré une nouvelle date: mémoriser la signature pour les prochains démarrages"""
+    try:
+        meta.update(signature)
+        with open(meta_path + ".tmp", "w", encoding="utf-8") as f:
+            json.dump(meta, f, ensure_ascii=False, indent=2)
+        os.replace(meta_path + ".tmp", meta_path)
+    except OSError:
+        pass
+
+
+def read_snapshot(csv_path):
+    """Retourne le DataFrame de l'instantané s'il est valide pour ce CSV, sinon None"""
+    if feather is None:
+        return None
+    snapshot_path, meta_path = snapshot_paths(csv_path)
+    try:
+        with open(meta_path, encoding="utf-8") as f:
+            meta = json.load(f)
+    except (OSError, ValueError):
+        return None
+
+    if meta.get("format_version") != SNAPSHOT_FORMAT_VERSION:
+        return None
+    signature = file_signature(csv_path)
+    if any(meta.get(key) != value for key, value in signature.items()):
+        # CSV touché: seule l'empreinte du contenu fait foi
+        if meta.get("csv_checksum") != file_checksum(csv_path):
+            return None
+        _refresh_signature(meta_path, meta, signature)
+
+    try:
+        table = feather.read_table(snapshot_path, memory_map=True)
+    except Exception as e:
+        logger.warning(f"⚠️ Instantané illisible ({e}), relecture du CSV")
+        return None
+
+    if table.num_rows != meta.get("rows") or table.column_names != meta.get("columns"):
+        logger.warning("⚠️ Instantané incohérent avec ses métadonnées, relecture du CSV")
+        return None
+    return table.to_pandas()
+
+
+def load_dataset(csv_path=DEFAULT_CSV_PATH):
+    """
+    Charge les recettes: instantané colonnaire si le CSV n'a pas changé,
+    sinon analyse du CSV puis (ré)écriture de l'instantané.
+    """
+    if not os.path.exists(csv_path):
+        raise FileNotFoundError(f"Fichier CSV introuvable: {csv_path}")
+
+    start_time = time.time()
+    df = read_snapshot(csv_path)
+    if df is not None:
+        logger.info(f"⚡ Jeu de données chargé depuis l'instantané en {time.time() - start_time:.3f}s ({len(df)} lignes)")
+        return df
+
+    df = read_csv(csv_path)
+    logger.info(f"📄 CSV analysé en {time.time() - start_time:.3f}s ({len(df)} lignes)")
+    missing = [column for column in EXPECTED_COLUMNS if column not in df.columns]
+    if missing:
+        logger.warning(f"⚠️ Colonnes manquantes dans le CSV: {missing}, instantané non écrit")
+        return df
+
+    try:
+        write_snapshot(df, csv_path)
+    except Exception as e:
+        logger.warning(f"⚠️ Impossible d'écrire l'instantané: {e}")
+    return df
+
+
+def compact_for_serving(df):
+    """
+    Compile la base des recettes (plant_store, colonnes encodées par dictionnaire) à partir
+    du DataFrame complet, puis retourne un DataFrame réduit aux colonnes de service, elles
+    aussi encodées par dictionnaire (category). La base compilée reste rattachée au
+    DataFrame réduit, qui sert de clé à toutes les tables dérivées de la génération.
+    """
+    store = plant_store.PlantStore.from_dataframe(df)
+    compact = pd.DataFrame({
+        column: (df[column] if column in df else pd.Series([""] * len(df), index=df.index)).fillna("").astype("category")
+        for column in SERVING_COLUMNS
+    })
+    plant_store.attach(compact, store)
+    return compact
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    if feather is None:
+        raise SystemExit("pyarrow n'est pas installé: instantané non généré")
+    load_dataset()
@@ -0,0 +1,200 @@
+"""
+Cache persistant des embeddings, partagé entre les backends et les reconstructions d'index.
+
+Les vecteurs sont stockés dans SQLite, indexés par (identifiant du modèle, empreinte
+du texte normalisé). L'éviction est de type LRU, bornée en nombre d'entrées.
+Un hit n'écrit rien: les dates d'accès sont gardées en mémoire et écrites par lots
+(tampon plein, intervalle écoulé, et toujours avant une éviction).
+"""
+import hashlib
+import logging
+import os
+import sqlite3
+import threading
+import time
+import unicodedata
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+EMBEDDING_CACHE_PATH = os.getenv("EMBEDDING_CACHE_PATH", os.path.join("data", "embedding_cache.sqlite"))
+EMBEDDING_CACHE_MAX_ENTRIES = int(os.getenv("EMBEDDING_CACHE_MAX_ENTRIES", "200000"))
+# Écriture groupée des dates d'accès: nombre de clés en tampon / délai maximal (secondes)
+EMBEDDING_CACHE_ACCESS_BATCH = int(os.getenv("EMBEDDING_CACHE_ACCESS_BATCH", "512"))
+EMBEDDING_CACHE_ACCESS_INTERVAL = float(os.getenv("EMBEDDING_CACHE_ACCESS_INTERVAL", "30"))
+
+
+def normalize_for_embedding(text):
+    """Normalisation qui ne change pas le sens du texte (Unicode NFC, espaces)"""
+    return " ".join(unicodedata.normalize("NFC", text or "").split())
+
+
+def text_key(text):
+    return hashlib.sha256(normalize_for_embedding(text).encode("utf-8")).hexdigest()
+
+
+class EmbeddingStore:
+    """Stockage SQLite des vecteurs avec éviction LRU et compteurs de hits/misses"""
+
+    def __init__(self, path=EMBEDDING_CACHE_PATH, max_entries=EMBEDDING_CACHE_MAX_ENTRIES,
+                 access_batch=EMBEDDING_CACHE_ACCESS_BATCH, access_interval=EMBEDDING_CACHE_ACCESS_INTERVAL):
+        self.path = path
+        self.max_entries = max_entries
+        self.access_batch = access_batch
+        self.access_interval = access_interval
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+        self._accessed = {}  # (modèle, clé) -> date du dernier accès pas encore écrite
+        self._last_flush = time.monotonic()
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            """CREATE TABLE IF NOT EXISTS embeddings (
+                model_id TEXT NOT NULL,
+                text_hash TEXT NOT NULL,
+                vector BLOB NOT NULL,
+                last_access REAL NOT NULL,
+                PRIMARY KEY (model_id, text_hash)
+            )"""
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_embeddings_access ON embeddings(last_access)")
+        self._conn.commit()
+
+    def get_many(self, model_id, keys):
+        """Retourne {clé: vecteur} pour les clés présentes dans le cache"""
+        found = {}
+        if not keys:
+            return found
+        unique_keys = list(dict.fromkeys(keys))
+        with self._lock:
+            for start in range(0, len(unique_keys), 500):
+                chunk = unique_keys[start:start + 500]
+                placeholders = ",".join("?" * len(chunk))
+                rows = self._conn.execute(
+                    f"SELECT text_hash, vector FROM embeddings WHERE model_id = ? AND text_hash IN ({placeholders})",
+                    [model_id, *chunk]
+                ).fetchall()
+                for key, blob in rows:
+                    found[key] = np.frombuffer(blob, dtype="float32").tolist()
+            if found:
+                now = time.time()
+                for key in found:
+                    self._accessed[(model_id, key)] = now
+                if (len(self._accessed) >= self.access_batch
+                        or time.monotonic() - self._last_flush >= self.access_interval):
+                    self._write_access()
+                    self._conn.commit()
+            hits = sum(1 for key in keys if key in found)
+            self.hits += hits
+            self.misses += len(keys) - hits
+        return found
+
+    def put_many(self, model_id, items):
+        """Ajoute des paires (clé, vecteur) puis applique l'éviction"""
+        if not items:
+            return
+        now = time.time()
+        with self._lock:
+            # Dates d'accès à jour avant l'éviction: une entrée lue récemment n'est pas évincée
+            self._write_access()
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO embeddings (model_id, text_hash, vector, last_access) VALUES (?, ?, ?, ?)",
+                [(model_id, key, np.asarray(vector, dtype="float32").tobytes(), now) for key, vector in items]
+            )
+            self._evict()
+            self._conn.commit()
+
+    def flush(self):
+        """Écrit les dates d'accès en tampon"""
+        with self._lock:
+            self._write_access()
+            self._conn.commit()
+
+    def _write_access(self):
+        if self._accessed:
+            self._conn.executemany(
+                "UPDATE embeddings SET last_access = ? WHERE model_id = ? AND text_hash = ?",
+                [(accessed_at, model_id, key) for (model_id, key), accessed_at in self._accessed.items()]
+            )
+            self._accessed.clear()
+        self._last_flush = time.monotonic()
+
+    def _evict(self):
+        count = self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+        excess = count - self.max_entries
+        if excess > 0:
+            self._conn.execute(
+                "DELETE FROM embeddings WHERE rowid IN (SELECT rowid FROM embeddings ORDER BY last_access LIMIT ?)",
+                (excess,)
+            )
+            self.evictions += excess
+
+    def stats(self):
+        with self._lock:
+            entries = self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+        total = self.hits + self.misses
+        return {
+            "path": self.path,
+            "entries": entries,
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / total, 4) if total else 0.0,
+            "evictions": self.evictions,
+        }
+
+
+class CachedEmbeddings:
+    """Enveloppe un modèle d'embeddings LangChain et lit/écrit à travers le cache persistant"""
+
+    def __init__(self, embeddings, model_id, store=None):
+        self.embeddings = embeddings
+        self.model_id = model_id
+        self.store = store or get_embedding_store()
+
+    def embed_documents(self, texts):
+        keys = [text_key(t) for t in texts]
+        cached = self.store.get_many(self.model_id, keys)
+
+        missing = {}
+        for key, text in zip(keys, texts):
+            if key not in cached and key not in missing:
+                missing[key] = text
+        if missing:
+            vectors = self.embeddings.embed_documents(list(missing.values()))
+            computed = list(zip(missing.keys(), vectors))
+            self.store.put_many(self.model_id, computed)
+            cached.update(computed)
+
+        return [cached[key] for key in keys]
+
+    def embed_query(self, text):
+        key = text_key(text)
+        cached = self.store.get_many(self.model_id, [key])
+        if key in cached:
+            return cached[key]
+        vector = self.embeddings.embed_query(text)
+        self.store.put_many(self.model_id, [(key, vector)])
+        return vector
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_embedding_store():
+    """Instance partagée du cache (un seul fichier SQLite pour tous les backends)"""
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = EmbeddingStore()
+            logger.info(f"Cache d'embeddings ouvert: {_store.path}")
+        return _store
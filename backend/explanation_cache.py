@@ -0,0 +1,371 @@
+"""
+Cache des explications générées par le LLM pour /recommend.
+
+L'explication en huit sections dépend presque entièrement de la recette retenue (plante,
+pathologie, préparation, dosage, contre-indications, composants); seuls les symptômes
+varient, et peu. La clé est donc:
+    (backend, modèle, version du prompt, empreinte de la recette, groupe de symptômes)
+    - version du prompt: empreinte du gabarit, une modification du prompt invalide tout
+    - empreinte de la recette: champs envoyés au prompt, une recette corrigée dans le CSV
+      change de clé (l'indice de ligne, lui, n'est pas stable entre deux générations)
+    - groupe de symptômes: concepts du vocabulaire détectés ("palu" et "paludisme"
+      tombent dans le même groupe), à défaut radicaux des mots de la requête
+
+Deux niveaux: LRU en mémoire par worker, puis SQLite partagé entre workers et redémarrages.
+Les entrées sont conservées EXPLANATION_CACHE_TTL secondes; au-delà de
+EXPLANATION_CACHE_STALE_AFTER, l'entrée est encore servie mais régénérée en arrière-plan
+(stale-while-revalidate). Les sections sont stockées déjà extraites: un hit ne repasse
+pas par extract_sections_from_explanation. Un hit n'écrit rien non plus: les dates
+d'accès sont gardées en mémoire et écrites par lots (et toujours avant une éviction).
+"""
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import synonyms
+from query_cache import LRUCache
+from text_utils import normalize_symptoms, stem
+
+logger = logging.getLogger(__name__)
+
+EXPLANATION_CACHE_PATH = os.getenv("EXPLANATION_CACHE_PATH", os.path.join("data", "explanation_cache.sqlite"))
+EXPLANATION_CACHE_SIZE = int(os.getenv("EXPLANATION_CACHE_SIZE", "1024"))
+EXPLANATION_CACHE_MAX_ENTRIES = int(os.getenv("EXPLANATION_CACHE_MAX_ENTRIES", "50000"))
+EXPLANATION_CACHE_TTL = float(os.getenv("EXPLANATION_CACHE_TTL", str(30 * 24 * 3600)))
+EXPLANATION_CACHE_STALE_AFTER = float(os.getenv("EXPLANATION_CACHE_STALE_AFTER", str(7 * 24 * 3600)))
+# Écriture groupée des dates d'accès: nombre de clés en tampon / délai maximal (secondes)
+EXPLANATION_CACHE_ACCESS_BATCH = int(os.getenv("EXPLANATION_CACHE_ACCESS_BATCH", "64"))
+EXPLANATION_CACHE_ACCESS_INTERVAL = float(os.getenv("EXPLANATION_CACHE_ACCESS_INTERVAL", "30"))
+EXPLANATION_CACHE_ENABLED = os.getenv("EXPLANATION_CACHE_ENABLED", "true").lower() in ("true", "1", "t")
+
+
+def prompt_version(template):
+    """Version d'un gabarit de prompt: empreinte courte de son texte"""
+    return hashlib.sha256(template.encode("utf-8")).hexdigest()[:12]
+
+
+def recipe_fingerprint(prompt_inputs):
+    """Empreinte des champs de la recette envoyés au prompt (hors symptômes)"""
+    payload = json.dumps(prompt_inputs, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()[:24]
+
+
+def symptom_bucket(symptoms):
+    """Groupe de symptômes: concepts détectés, sinon radicaux distincts des mots de la requête"""
+    concepts = synonyms.get_matcher().concepts_in(symptoms, kinds={"symptom"})
+    if concepts:
+        return "concepts:" + "+".join(sorted(concepts))
+    return "terms:" + " ".join(sorted({stem(word) for word in normalize_symptoms(symptoms).split()}))
+
+
+def cache_key(backend, model, version, fingerprint, bucket):
+    return hashlib.sha256("\x1f".join((backend, model, version, fingerprint, bucket)).encode("utf-8")).hexdigest()
+
+
+class ExplanationStore:
+    """Niveau persistant (SQLite): explication et sections, horodatées, avec éviction LRU"""
+
+    def __init__(self, path=EXPLANATION_CACHE_PATH, max_entries=EXPLANATION_CACHE_MAX_ENTRIES,
+                 access_batch=EXPLANATION_CACHE_ACCESS_BATCH, access_interval=EXPLANATION_CACHE_ACCESS_INTERVAL):
+        self.path = path
+        self.max_entries = max_entries
+        self.access_batch = access_batch
+        self.access_interval = access_interval
+        self.evictions = 0
+        self._lock = threading.Lock()
+        self._accessed = {}  # clé -> date du dernier accès pas encore écrite
+        self._last_flush = time.monotonic()
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            """CREATE TABLE IF NOT EXISTS explanations (
+                cache_key TEXT PRIMARY KEY,
+                backend TEXT NOT NULL,
+                prompt_version TEXT NOT NULL,
+                explanation TEXT NOT NULL,
+                sections TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                last_access REAL NOT NULL
+            )"""
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_explanations_access ON explanations(last_access)")
+        self._conn.commit()
+
+    def get(self, key):
+        """(explication, sections, date de création) ou None"""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT explanation, sections, created_at FROM explanations WHERE cache_key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            self._accessed[key] = time.time()
+            if len(self._accessed) >= self.access_batch or time.monotonic() - self._last_flush >= self.access_interval:
+                self._write_access()
+                self._conn.commit()
+        return row[0], json.loads(row[1]), row[2]
+
+    def put(self, key, backend, version, explanation, sections, created_at):
+        with self._lock:
+            # Dates d'accès à jour avant l'éviction: une entrée lue récemment n'est pas évincée
+            self._write_access()
+            self._conn.execute(
+                "INSERT OR REPLACE INTO explanations VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (key, backend, version, explanation, json.dumps(sections, ensure_ascii=False), created_at, time.time())
+            )
+            self._evict()
+            self._conn.commit()
+
+    def purge(self, backend, current_version, ttl=EXPLANATION_CACHE_TTL):
+        """Supprime les entrées expirées et celles d'une autre version du prompt de ce backend"""
+        with self._lock:
+            cursor = self._conn.execute(
+                "DELETE FROM explanations WHERE (backend = ? AND prompt_version != ?) OR created_at < ?",
+                (backend, current_version, time.time() - ttl)
+            )
+            self._conn.commit()
+            return cursor.rowcount
+
+    def flush(self):
+        """Écrit les dates d'accès en tampon"""
+        with self._lock:
+            self._write_access()
+            self._conn.commit()
+
+    def _write_access(self):
+        if self._accessed:
+            self._conn.executemany(
+                "UPDATE explanations SET last_access = ? WHERE cache_key = ?",
+                [(accessed_at, key) for key, accessed_at in self._accessed.items()]
+            )
+            self._accessed.clear()
+        self._last_flush = time.monotonic()
+
+    def _evict(self):
+        count = self._conn.execute("SELECT COUNT(*) FROM explanations").fetchone()[0]
+        excess = count - self.max_entries
+        if excess > 0:
+            self._conn.execute(
+                "DELETE FROM explanations WHERE rowid IN (SELECT rowid FROM explanations ORDER BY last_access LIMIT ?)",
+                (excess,)
+            )
+            self.evictions += excess
+
+    def __len__(self):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM explanations").fetchone()[0]
+
+
+class ExplanationCache:
+    """LRU en mémoire devant le niveau SQLite, avec régénération en arrière-plan des entrées anciennes"""
+
+    def __init__(self, store=None, maxsize=EXPLANATION_CACHE_SIZE, ttl=EXPLANATION_CACHE_TTL,
+                 stale_after=EXPLANATION_CACHE_STALE_AFTER):
+        self.store = store
+        self.memory = LRUCache(maxsize=maxsize, ttl=ttl)
+        self.ttl = ttl
+        self.stale_after = stale_after
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+        self.refreshes = 0
+        self.refresh_failures = 0
+        self._purged = set()
+        self._refreshing = set()
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="explanation-refresh")
+
+    def get_or_generate(self, backend, model, template, prompt_inputs, symptoms, generate):
+        """
+        (explication, sections) pour cette recette et ce groupe de symptômes.
+        generate() -> (explication, sections) n'est appelé qu'en cas d'absence (ou en
+        arrière-plan pour une entrée ancienne); ses exceptions remontent à l'appelant et
+        rien n'est mis en cache.
+        """
+        cached, key = self.lookup(backend, model, template, prompt_inputs, symptoms, refresh=generate)
+        if cached is not None:
+            return cached
+        explanation, sections = generate()
+        self.save(key, explanation, sections)
+        return explanation, sections
+
+    def lookup(self, backend, model, template, prompt_inputs, symptoms, refresh=None):
+        """
+        ((explication, sections) ou None, clé à passer à save()). Une entrée ancienne est
+        servie et régénérée en arrière-plan par refresh() s'il est fourni.
+        """
+        version = prompt_version(template)
+        key = (backend, version,
+               cache_key(backend, model, version, recipe_fingerprint(prompt_inputs), symptom_bucket(symptoms)))
+        self._purge_once(backend, version)
+
+        entry = self._lookup(key[2])
+        if entry is None:
+            with self._lock:
+                self.misses += 1
+            return None, key
+        explanation, sections, created_at = entry
+        if time.time() - created_at > self.stale_after and refresh is not None:
+            with self._lock:
+                self.stale_hits += 1
+            self._refresh(key, refresh)
+        else:
+            with self._lock:
+                self.hits += 1
+        return (explanation, sections), key
+
+    def save(self, key, explanation, sections):
+        backend, version, digest = key
+        self._store(digest, backend, version, explanation, sections)
+
+    def _lookup(self, key):
+        entry = self.memory.get(key)
+        if entry is None and self.store is not None:
+            try:
+                entry = self.store.get(key)
+            except sqlite3.Error as e:
+                logger.warning(f"Cache des explications (SQLite) indisponible: {e}")
+                entry = None
+            if entry is not None:
+                self.memory.put(key, entry)
+        if entry is not None and time.time() - entry[2] > self.ttl:
+            return None
+        return entry
+
+    def _store(self, key, backend, version, explanation, sections):
+        created_at = time.time()
+        self.memory.put(key, (explanation, sections, created_at))
+        if self.store is not None:
+            try:
+                self.store.put(key, backend, version, explanation, sections, created_at)
+            except sqlite3.Error as e:
+                logger.warning(f"Écriture du cache des explications impossible: {e}")
+
+    def _refresh(self, key, generate):
+        with self._lock:
+            if key in self._refreshing:
+                return
+            self._refreshing.add(key)
+
+        def run():
+            try:
+                explanation, sections = generate()
+                self.save(key, explanation, sections)
+                with self._lock:
+                    self.refreshes += 1
+            except Exception as e:
+                with self._lock:
+                    self.refresh_failures += 1
+                logger.warning(f"Régénération de l'explication en arrière-plan échouée, entrée conservée: {e}")
+            finally:
+                with self._lock:
+                    self._refreshing.discard(key)
+
+        self._executor.submit(run)
+
+    def _purge_once(self, backend, version):
+        """Au premier passage d'une version du prompt, retire du disque les entrées des autres versions"""
+        if self.store is None or (backend, version) in self._purged:
+            return
+        with self._lock:
+            if (backend, version) in self._purged:
+                return
+            self._purged.add((backend, version))
+        try:
+            removed = self.store.purge(backend, version, self.ttl)
+            if removed:
+                logger.info(f"Cache des explications: {removed} entrées obsolètes supprimées ({backend}, prompt {version})")
+        except sqlite3.Error as e:
+            logger.warning(f"Purge du cache des explications impossible: {e}")
+
+    def stats(self):
+        with self._lock:
+            total = self.hits + self.stale_hits + self.misses
+            stats = {
+                "hits": self.hits,
+                "stale_hits": self.stale_hits,
+                "misses": self.misses,
+                "hit_rate": round((self.hits + self.stale_hits) / total, 4) if total else 0.0,
+                "refreshes": self.refreshes,
+                "refresh_failures": self.refresh_failures,
+                "refreshing": len(self._refreshing),
+                "ttl": self.ttl,
+                "stale_after": self.stale_after,
+            }
+        stats["memory"] = self.memory.stats()
+        if self.store is not None:
+            stats["disk"] = {"path": self.store.path, "entries": len(self.store),
+                             "max_entries": self.store.max_entries, "evictions": self.store.evictions}
+        return stats
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_explanation_cache():
+    """Instance partagée (un fichier SQLite pour tous les backends), None si le cache est désactivé"""
+    global _cache
+    if not EXPLANATION_CACHE_ENABLED:
+        return None
+    with _cache_lock:
+        if _cache is None:
+            try:
+                store = ExplanationStore()
+            except sqlite3.Error as e:
+                logger.warning(f"Cache des explications sur disque indisponible, mémoire seule: {e}")
+                store = None
+            _cache = ExplanationCache(store)
+            logger.info(f"Cache des explications ouvert: {store.path if store else 'mémoire seule'}")
+        return _cache
+
+
+def cached_explanation(backend, model, template, prompt_inputs, symptoms, generate):
+    """get_or_generate() sur le cache partagé, ou generate() directement s'il est désactivé"""
+    cache = get_explanation_cache()
+    if cache is None:
+        return generate()
+    return cache.get_or_generate(backend, model, template, prompt_inputs, symptoms, generate)
+
+
+async def cached_explanation_async(backend, model, template, prompt_inputs, symptoms, agenerate, refresh=None):
+    """
+    Variante asynchrone de cached_explanation(): agenerate() est une coroutine, les accès au
+    stockage SQLite passent par un thread. refresh: génération synchrone des entrées périmées.
+    """
+    cached, key = await asyncio.to_thread(lookup_explanation, backend, model, template, prompt_inputs, symptoms, refresh)
+    if cached is not None:
+        return cached
+    explanation, sections = await agenerate()
+    await asyncio.to_thread(store_explanation, key, explanation, sections)
+    return explanation, sections
+
+
+def lookup_explanation(backend, model, template, prompt_inputs, symptoms, refresh=None):
+    """((explication, sections) ou None, clé) sur le cache partagé; (None, None) s'il est désactivé"""
+    cache = get_explanation_cache()
+    if cache is None:
+        return None, None
+    return cache.lookup(backend, model, template, prompt_inputs, symptoms, refresh)
+
+
+def store_explanation(key, explanation, sections):
+    cache = get_explanation_cache()
+    if cache is not None and key is not None:
+        cache.save(key, explanation, sections)
+
+
+def stats():
+    cache = _cache
+    return cache.stats() if cache is not None else {"enabled": EXPLANATION_CACHE_ENABLED}
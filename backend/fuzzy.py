@@ -0,0 +1,109 @@
+"""
+Correspondance approximative des pathologies (fautes de frappe: "diarhee", "paludism").
+
+Le vocabulaire est l'ensemble des mots de la colonne maladiesoigneeparrecette, repliés
+(minuscules, sans accents). Chaque mot est représenté par ses trigrammes de caractères
+pondérés TF-IDF dans une matrice creuse (scipy.sparse) construite une fois. Pour un mot
+de la requête, les candidats sont obtenus par un seul produit creux (similarité cosinus
+des trigrammes), puis les meilleurs sont re-classés par distance d'édition.
+"""
+import heapq
+import math
+import os
+
+import numpy as np
+
+from text_utils import tokenize
+
+try:
+    from scipy import sparse
+except ImportError:  # correction des fautes désactivée sans scipy
+    sparse = None
+
+FUZZY_CANDIDATES = int(os.getenv("FUZZY_CANDIDATES", "10"))
+FUZZY_MIN_SIMILARITY = float(os.getenv("FUZZY_MIN_SIMILARITY", "0.75"))
+FUZZY_MIN_LENGTH = 4
+
+
+def trigrams(word):
+    padded = f" {word} "
+    return [padded[i:i + 3] for i in range(len(padded) - 2)]
+
+
+def edit_distance(a, b):
+    """Distance de Levenshtein (programmation dynamique sur deux lignes)"""
+    if len(a) < len(b):
+        a, b = b, a
+    previous = list(range(len(b) + 1))
+    for i, char_a in enumerate(a, start=1):
+        current = [i]
+        for j, char_b in enumerate(b, start=1):
+            current.append(min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (char_a != char_b)))
+        previous = current
+    return previous[-1]
+
+
+def edit_similarity(a, b):
+    longest = max(len(a), len(b))
+    return 1.0 - edit_distance(a, b) / longest if longest else 1.0
+
+
+class FuzzyMatcher:
+    """Matrice creuse mots x trigrammes (TF-IDF, lignes normalisées L2)"""
+
+    def __init__(self, words):
+        self.words = list(words)
+        self.trigram_ids = {}
+        rows, cols = [], []
+        for row, word in enumerate(self.words):
+            for gram in set(trigrams(word)):
+                rows.append(row)
+                cols.append(self.trigram_ids.setdefault(gram, len(self.trigram_ids)))
+
+        shape = (len(self.words), len(self.trigram_ids))
+        matrix = sparse.csr_matrix((np.ones(len(rows), dtype="float32"), (rows, cols)), shape=shape)
+        document_frequency = np.bincount(cols, minlength=shape[1]) if cols else np.zeros(0)
+        self.idf = (np.log((1 + shape[0]) / (1 + document_frequency)) + 1).astype("float32")
+        matrix = matrix.multiply(self.idf).tocsr()
+        norms = np.sqrt(matrix.multiply(matrix).sum(axis=1)).A.ravel()
+        norms[norms == 0] = 1.0
+        # Stockage par colonnes: une requête ne lit que les colonnes de ses trigrammes
+        self.matrix = sparse.diags(1.0 / norms).dot(matrix).tocsc().astype("float32")
+
+    @classmethod
+    def from_values(cls, values):
+        """Vocabulaire des mots (repliés, d'au moins FUZZY_MIN_LENGTH lettres) d'une colonne texte"""
+        words = sorted({
+            token for value in values if isinstance(value, str)
+            for token in tokenize(value) if len(token) >= FUZZY_MIN_LENGTH and token.isalpha()
+        })
+        return cls(words)
+
+    def __len__(self):
+        return len(self.words)
+
+    def candidates(self, word, k=FUZZY_CANDIDATES):
+        """[(mot, similarité cosinus des trigrammes)] par un seul produit matrice creuse x vecteur"""
+        grams = set(trigrams(word))
+        cols = [self.trigram_ids[gram] for gram in grams if gram in self.trigram_ids]
+        if not cols:
+            return []
+        weights = self.idf[cols]
+        # Les trigrammes absents du vocabulaire comptent dans la norme de la requête (IDF maximal)
+        unknown = len(grams) - len(cols)
+        query_norm = math.sqrt(float(np.dot(weights, weights)) + unknown * float(self.idf.max()) ** 2)
+        scores = self.matrix[:, cols].dot(weights) / query_norm
+        if len(scores) > k:
+            top = np.argpartition(-scores, k)[:k]
+        else:
+            top = np.arange(len(scores))
+        return [(self.words[i], float(scores[i])) for i in top if scores[i] > 0]
+
+    def match(self, word, k=3, min_similarity=FUZZY_MIN_SIMILARITY):
+        """Meilleurs mots du vocabulaire, re-classés par distance d'édition: [(mot, similarité)]"""
+        ranked = [
+            (edit_similarity(word, candidate), cosine, candidate)
+            for candidate, cosine in self.candidates(word)
+        ]
+        best = heapq.nlargest(k, ranked)
+        return [(candidate, round(similarity, 3)) for similarity, _, candidate in best if similarity >= min_similarity]
@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+"""
+Générateur de CSV synthétiques au format baseplante.csv (tests de montée en charge).
+
+Chaque ligne reprend une recette réelle tirée au hasard, avec une combinaison aléatoire
+de 1 à 3 pathologies du jeu réel et, selon --novel-ratio, une pathologie inventée: les
+documents produits sont variés et le vocabulaire croît avec la taille du fichier.
+Les lignes sont écrites par blocs, la mémoire reste constante quel que soit --rows.
+
+Usage: python generate_dataset.py --rows 1000000 --output /tmp/baseplante_1m.csv [--seed 0]
+"""
+import argparse
+import csv
+import random
+import time
+
+import dataset
+import retrieval
+
+SYLLABLES = ["pa", "lu", "dis", "me", "dia", "rr", "hee", "to", "xi", "ca", "ne", "phro", "gas", "tri", "que", "os"]
+WRITE_BLOCK_ROWS = 10000
+
+
+def invented_pathology(rng):
+    return "".join(rng.choice(SYLLABLES) for _ in range(rng.randint(3, 5))) + rng.choice(["ite", "ose", "ie", "algie"])
+
+
+def generate_rows(source, rows, rng, novel_ratio=0.3):
+    """Génère `rows` lignes (listes de valeurs, dans l'ordre des colonnes de `source`)"""
+    records = source.fillna("").astype(str).values.tolist()
+    pathology_column = list(source.columns).index("maladiesoigneeparrecette")
+    pathologies = sorted({p for value in source["maladiesoigneeparrecette"] for p in retrieval.split_field(value)})
+    for _ in range(rows):
+        record = list(rng.choice(records))
+        chosen = rng.sample(pathologies, rng.randint(1, min(3, len(pathologies))))
+        if rng.random() < novel_ratio:
+            chosen.append(invented_pathology(rng))
+        record[pathology_column] = ", ".join(chosen)
+        yield record
+
+
+def write_dataset(output, rows, seed=0, novel_ratio=0.3, source_path=dataset.DEFAULT_CSV_PATH):
+    source = dataset.read_csv(source_path)
+    rng = random.Random(seed)
+    with open(output, "w", newline="", encoding=dataset.CSV_OPTIONS["encoding"]) as f:
+        writer = csv.writer(f, delimiter=dataset.CSV_OPTIONS["sep"], quotechar=dataset.CSV_OPTIONS["quotechar"],
+                            quoting=csv.QUOTE_ALL)
+        writer.writerow(source.columns)
+        block = []
+        for record in generate_rows(source, rows, rng, novel_ratio):
+            block.append(record)
+            if len(block) >= WRITE_BLOCK_ROWS:
+                writer.writerows(block)
+                block = []
+        writer.writerows(block)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, required=True)
+    parser.add_argument("--output", required=True)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--novel-ratio", type=float, default=0.3,
+                        help="part des lignes qui reçoivent une pathologie inventée")
+    args = parser.parse_args()
+
+    start_time = time.time()
+    write_dataset(args.output, args.rows, seed=args.seed, novel_ratio=args.novel_ratio)
+    print(f"{args.rows} lignes écrites dans {args.output} en {time.time() - start_time:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
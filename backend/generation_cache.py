@@ -0,0 +1,68 @@
+"""
+Objets dérivés d'un DataFrame (base compilée, index secondaires, moteur de recherche,
+trie d'autocomplétion), gardés pour les deux dernières générations du jeu de données
+(double tampon du rechargement).
+
+La construction se fait hors du verrou du cache: pendant que le rechargement construit
+la génération suivante, les requêtes sur la génération courante sont servies sans
+attendre. Un verrou par DataFrame évite seulement de construire deux fois le même objet;
+le résultat est publié sous le verrou du cache.
+"""
+import threading
+from collections import OrderedDict
+
+KEPT_GENERATIONS = 2
+
+
+class GenerationCache:
+    """{id(df): (df, objet construit par build(df))} pour les KEPT_GENERATIONS derniers DataFrames"""
+
+    def __init__(self, build, kept=KEPT_GENERATIONS):
+        self.build = build
+        self.kept = kept
+        self._entries = OrderedDict()
+        self._building = {}  # id(df) -> verrou de la construction en cours
+        self._lock = threading.Lock()
+
+    def _cached(self, df):
+        entry = self._entries.get(id(df))
+        if entry is None or entry[0] is not df:
+            return None
+        self._entries.move_to_end(id(df))
+        return entry[1]
+
+    def get(self, df):
+        """Objet de ce DataFrame, construit au premier appel"""
+        with self._lock:
+            value = self._cached(df)
+            if value is not None:
+                return value
+            build_lock = self._building.setdefault(id(df), threading.Lock())
+
+        with build_lock:
+            # Construit entre-temps par le thread qui tenait le verrou de construction
+            with self._lock:
+                value = self._cached(df)
+            if value is not None:
+                return value
+            try:
+                value = self.build(df)
+            except BaseException:
+                with self._lock:
+                    self._release(df, build_lock)
+                raise
+            with self._lock:
+                self._entries[id(df)] = (df, value)
+                self._entries.move_to_end(id(df))
+                while len(self._entries) > self.kept:
+                    self._entries.popitem(last=False)
+                self._release(df, build_lock)
+        return value
+
+    def _release(self, df, build_lock):
+        if self._building.get(id(df)) is build_lock:
+            del self._building[id(df)]
+
+    def __len__(self):
+        with self._lock:
+            return len(self._entries)
@@ -0,0 +1,107 @@
+"""
+Clients HTTP partagés pour les appels sortants (API HuggingFace Inference, Unsplash).
+
+Asynchrone: un httpx.AsyncClient par boucle d'événements, utilisé par les chemins async de
+/recommend et /chat. Un appel lent vers l'amont n'occupe que sa coroutine, les autres
+requêtes continuent d'être servies. Synchrone: une requests.Session pour les chemins qui
+tournent déjà dans un thread (flux SSE, rafraîchissement du cache des explications).
+
+Dans les deux cas, les connexions sont réutilisées par hôte (keep-alive) et chaque appel a
+des délais stricts de connexion et de lecture. HTTP/2 est activé quand le paquet h2 est
+installé (httpx[http2]).
+"""
+import asyncio
+import logging
+import os
+import threading
+import weakref
+
+import httpx
+import requests
+from requests.adapters import HTTPAdapter
+
+logger = logging.getLogger(__name__)
+
+HTTP_CONNECT_TIMEOUT = float(os.getenv("HTTP_CONNECT_TIMEOUT", "5"))
+HTTP_READ_TIMEOUT = float(os.getenv("HTTP_READ_TIMEOUT", "30"))
+# Connexions par hôte conservées ouvertes / ouvertes au plus en même temps
+HTTP_POOL_KEEPALIVE = int(os.getenv("HTTP_POOL_KEEPALIVE", "10"))
+HTTP_POOL_MAXSIZE = int(os.getenv("HTTP_POOL_MAXSIZE", "20"))
+HTTP2_ENABLED = os.getenv("HTTP2_ENABLED", "true").lower() in ("true", "1", "t")
+
+try:
+    import h2  # noqa: F401
+    HTTP2_AVAILABLE = True
+except ImportError:
+    HTTP2_AVAILABLE = False
+
+
+def timeout(read=None):
+    """Délais (connexion, lecture); read remplace le délai de lecture par défaut (génération longue)"""
+    return (HTTP_CONNECT_TIMEOUT, read or HTTP_READ_TIMEOUT)
+
+
+# Un client par boucle: un AsyncClient ne peut pas être partagé entre boucles d'événements
+_async_clients = weakref.WeakKeyDictionary()
+_async_clients_lock = threading.Lock()
+
+
+def get_async_client():
+    """Client asynchrone de la boucle courante, créé au premier appel"""
+    loop = asyncio.get_running_loop()
+    with _async_clients_lock:
+        client = _async_clients.get(loop)
+        if client is None or client.is_closed:
+            http2 = HTTP2_ENABLED and HTTP2_AVAILABLE
+            client = httpx.AsyncClient(
+                http2=http2,
+                timeout=httpx.Timeout(HTTP_READ_TIMEOUT, connect=HTTP_CONNECT_TIMEOUT),
+                limits=httpx.Limits(max_connections=HTTP_POOL_MAXSIZE, max_keepalive_connections=HTTP_POOL_KEEPALIVE),
+            )
+            _async_clients[loop] = client
+            logger.info(f"Client HTTP asynchrone créé (HTTP/2: {http2})")
+        return client
+
+
+async def aclose():
+    """Ferme le client de la boucle courante (arrêt de l'application)"""
+    with _async_clients_lock:
+        client = _async_clients.pop(asyncio.get_running_loop(), None)
+    if client is not None:
+        await client.aclose()
+
+
+async def aget(url, read_timeout=None, **kwargs):
+    return await get_async_client().get(url, timeout=_async_timeout(read_timeout), **kwargs)
+
+
+async def apost(url, read_timeout=None, **kwargs):
+    return await get_async_client().post(url, timeout=_async_timeout(read_timeout), **kwargs)
+
+
+def _async_timeout(read_timeout):
+    return httpx.Timeout(read_timeout or HTTP_READ_TIMEOUT, connect=HTTP_CONNECT_TIMEOUT)
+
+
+_session = None
+_session_lock = threading.Lock()
+
+
+def get_session():
+    """Session synchrone partagée entre threads (pool de connexions par hôte)"""
+    global _session
+    with _session_lock:
+        if _session is None:
+            _session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=HTTP_POOL_KEEPALIVE, pool_maxsize=HTTP_POOL_MAXSIZE)
+            _session.mount("https://", adapter)
+            _session.mount("http://", adapter)
+        return _session
+
+
+def get(url, read_timeout=None, **kwargs):
+    return get_session().get(url, timeout=timeout(read_timeout), **kwargs)
+
+
+def post(url, read_timeout=None, **kwargs):
+    return get_session().post(url, timeout=timeout(read_timeout), **kwargs)
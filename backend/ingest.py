@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+"""
+Ingestion en flux d'un grand CSV de recettes dans l'index vectoriel.
+
+Le CSV n'est jamais chargé en entier: il est lu par blocs de --chunk-rows lignes, chaque
+bloc est découpé en documents (même granularité que l'application), vectorisé par lots
+de --batch-size textes et ajouté au build en cours (vector_index.IndexWriter). Les
+vecteurs des documents déjà présents dans l'index publié sont réutilisés, sauf avec --full.
+La mémoire crête est bornée par la taille d'un bloc plus les vecteurs de l'index.
+
+Usage: python ingest.py [--csv data/baseplante.csv] [--backend hf|openai] [--index-dir DIR]
+                        [--chunk-rows 5000] [--batch-size 256] [--full]
+"""
+import argparse
+import importlib
+import logging
+import os
+import resource
+import time
+
+import pandas as pd
+
+import dataset
+import retrieval
+import vector_index
+
+logger = logging.getLogger(__name__)
+
+INGEST_CHUNK_ROWS = int(os.getenv("INGEST_CHUNK_ROWS", "5000"))
+
+BACKEND_MODULES = {
+    "hf": "langchain_chains",
+    "openai": "langchain_chains_openai",
+}
+
+
+def iter_csv_chunks(csv_path, chunk_rows=INGEST_CHUNK_ROWS):
+    """Génère (position de la première ligne, DataFrame du bloc)"""
+    start_row = 0
+    with pd.read_csv(csv_path, chunksize=chunk_rows, **dataset.CSV_OPTIONS) as reader:
+        for chunk in reader:
+            yield start_row, chunk
+            start_row += len(chunk)
+
+
+def iter_document_batches(csv_path, chunk_rows=INGEST_CHUNK_ROWS, granularity=None):
+    """Un lot de documents par bloc du CSV; metadata["index"] reste la ligne du CSV complet"""
+    for start_row, chunk in iter_csv_chunks(csv_path, chunk_rows):
+        yield retrieval.create_recipe_documents(chunk, granularity, start_row=start_row)
+
+
+def ingest_csv(csv_path, embeddings, index_dir, manifest=None, chunk_rows=INGEST_CHUNK_ROWS,
+               batch_size=vector_index.EMBED_BATCH_SIZE, reuse=True, progress=None):
+    """Construit l'index de csv_path bloc par bloc et le retourne chargé en mmap"""
+    manifest = dict(manifest or {})
+    manifest.setdefault("granularity", retrieval.INDEX_GRANULARITY)
+    return vector_index.stream_vector_index(
+        iter_document_batches(csv_path, chunk_rows, manifest["granularity"]),
+        embeddings, index_dir, manifest, reuse=reuse, batch_size=batch_size, progress=progress,
+    )
+
+
+def peak_rss_mb():
+    # ru_maxrss est en Ko sous Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--csv", default=dataset.DEFAULT_CSV_PATH)
+    parser.add_argument("--backend", choices=sorted(BACKEND_MODULES), default="hf")
+    parser.add_argument("--index-dir", help="répertoire de l'index (par défaut: celui du backend)")
+    parser.add_argument("--chunk-rows", type=int, default=INGEST_CHUNK_ROWS)
+    parser.add_argument("--batch-size", type=int, default=vector_index.EMBED_BATCH_SIZE)
+    parser.add_argument("--full", action="store_true", help="re-vectoriser tous les documents")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+    module = importlib.import_module(BACKEND_MODULES[args.backend])
+    embeddings = module.get_embeddings_model()
+    index_dir = args.index_dir or module.VECTORSTORE_PATH
+    start_time = time.time()
+
+    def progress(count, stats):
+        elapsed = time.time() - start_time
+        logger.info(f"📥 {count} documents ({stats['added']} vectorisés, {stats['reused']} réutilisés), "
+                    f"{count / max(elapsed, 1e-9):.0f} docs/s, RSS crête {peak_rss_mb():.0f} Mo")
+
+    vs = ingest_csv(
+        args.csv, embeddings, index_dir,
+        manifest={"embedding_model": embeddings.model_id, "last_modified": module.get_csv_last_modified(args.csv)},
+        chunk_rows=args.chunk_rows, batch_size=args.batch_size, reuse=not args.full, progress=progress,
+    )
+    logger.info(f"✅ Index {vs.build_id} publié dans {index_dir}: {len(vs)} documents "
+                f"en {time.time() - start_time:.1f}s, RSS crête {peak_rss_mb():.0f} Mo")
+
+
+if __name__ == "__main__":
+    main()
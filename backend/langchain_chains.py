@@ -1,31 +1,31 @@
+import asyncio
+import json
 import os
 import time
-import pickle
-import requests
-import traceback
 import logging
 import random
-import pandas as pd
+import sys
 
 from langchain_core.prompts import PromptTemplate
 from langchain.chains import LLMChain
-from langchain.docstore.document import Document
-from langchain_community.vectorstores import FAISS
 from langchain_community.embeddings import HuggingFaceEmbeddings
 from dotenv import load_dotenv
 
+import http_client
+import recommendation
+import retrieval
+import semantic_cache
+import synonyms
+from embedding_cache import CachedEmbeddings
+from vector_index import build_vector_index, load_vector_index, read_manifest, update_vector_index
+
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
-def generate_huggingface_response(prompt: str, api_key: str, model_id: str = "google/flan-t5-base", 
-                                  max_length: int = 200, temperature: float = 0.7) -> str:
-    """Génère une réponse via l'API HuggingFace Inference"""
-    api_url = f"https://api-inference.huggingface.co/models/{model_id}"
-    headers = {
-        "Authorization": f"Bearer {api_key}",
-        "Content-Type": "application/json"
-    }
-    
+# Délai de lecture des générations HuggingFace (le modèle distant peut devoir démarrer)
+HF_READ_TIMEOUT = float(os.getenv("HF_READ_TIMEOUT", "60"))
+
+def _huggingface_payload(prompt, max_length, temperature, stream=False):
     payload = {
         "inputs": prompt,
         "parameters": {
@@ -38,30 +38,97 @@ def generate_huggingface_response(prompt: str, api_key: str, model_id: str = "go
             "use_cache": True
         }
     }
+    if stream:
+        payload["parameters"]["max_new_tokens"] = payload["parameters"].pop("max_length")
+        payload["stream"] = True
+    return payload
+
+def _huggingface_request(api_key, model_id):
+    api_url = f"https://api-inference.huggingface.co/models/{model_id}"
+    headers = {
+        "Authorization": f"Bearer {api_key}",
+        "Content-Type": "application/json"
+    }
+    return api_url, headers
+
+def _generated_text(result):
+    """Texte généré d'une réponse JSON de l'API Inference (liste ou objet selon le modèle)"""
+    if isinstance(result, list) and len(result) > 0:
+        if "generated_text" in result[0]:
+            return result[0]["generated_text"].strip()
+        else:
+            return str(result[0]).strip()
+    elif isinstance(result, dict):
+        if "generated_text" in result:
+            return result["generated_text"].strip()
+        else:
+            return str(result.get("text", result)).strip()
+    else:
+        return str(result).strip()
+
+def generate_huggingface_response(prompt: str, api_key: str, model_id: str = "google/flan-t5-base", 
+                                  max_length: int = 200, temperature: float = 0.7) -> str:
+    """Génère une réponse via l'API HuggingFace Inference"""
+    api_url, headers = _huggingface_request(api_key, model_id)
     
     try:
-        response = requests.post(api_url, headers=headers, json=payload)
+        response = http_client.post(api_url, headers=headers, json=_huggingface_payload(prompt, max_length, temperature),
+                                    read_timeout=HF_READ_TIMEOUT)
         
         if response.status_code == 200:
-            result = response.json()
-            
-            if isinstance(result, list) and len(result) > 0:
-                if "generated_text" in result[0]:
-                    return result[0]["generated_text"].strip()
-                else:
-                    return str(result[0]).strip()
-            elif isinstance(result, dict):
-                if "generated_text" in result:
-                    return result["generated_text"].strip()
-                else:
-                    return str(result.get("text", result)).strip()
-            else:
-                return str(result).strip()
+            return _generated_text(response.json())
         else:
             return ""
     except Exception:
         return ""
 
+async def generate_huggingface_response_async(prompt: str, api_key: str, model_id: str = "google/flan-t5-base",
+                                              max_length: int = 200, temperature: float = 0.7) -> str:
+    """Variante asynchrone de generate_huggingface_response (client HTTP partagé, sans bloquer la boucle)"""
+    api_url, headers = _huggingface_request(api_key, model_id)
+    
+    try:
+        response = await http_client.apost(api_url, headers=headers, json=_huggingface_payload(prompt, max_length, temperature),
+                                           read_timeout=HF_READ_TIMEOUT)
+        
+        if response.status_code == 200:
+            return _generated_text(response.json())
+        else:
+            return ""
+    except Exception:
+        return ""
+
+def stream_huggingface_response(prompt: str, api_key: str, model_id: str = "google/flan-t5-base",
+                                max_length: int = 200, temperature: float = 0.7):
+    """
+    Génère une réponse token par token via l'API HuggingFace Inference (flux text-generation).
+    Les modèles servis sans flux renvoient un JSON complet, transmis en un seul morceau.
+    Lève une exception si l'API ne répond pas ou ne renvoie rien.
+    """
+    api_url, headers = _huggingface_request(api_key, model_id)
+    payload = _huggingface_payload(prompt, max_length, temperature, stream=True)
+    
+    with http_client.post(api_url, headers=headers, json=payload, stream=True, read_timeout=HF_READ_TIMEOUT) as response:
+        if response.status_code != 200:
+            raise ValueError(f"API HuggingFace: statut {response.status_code}")
+        
+        if "text/event-stream" not in response.headers.get("Content-Type", ""):
+            text = _generated_text(response.json())
+            if not text:
+                raise ValueError("Réponse vide du modèle HuggingFace distant")
+            yield text
+            return
+        
+        for line in response.iter_lines(decode_unicode=True):
+            if not line or not line.startswith("data:"):
+                continue
+            event = json.loads(line[len("data:"):])
+            if "error" in event:
+                raise ValueError(f"API HuggingFace: {event['error']}")
+            token = event.get("token") or {}
+            if not token.get("special"):
+                yield token.get("text", "")
+
 load_dotenv()
 UNSPLASH_KEY = os.getenv("UNSPLASH_KEY")
 HF_API_KEY = os.getenv("HUGGINGFACEHUB_API_TOKEN", os.getenv("HF_API_KEY"))
@@ -72,30 +139,59 @@ else:
     logger.warning("Clé API HuggingFace non trouvée")
 
 # Index séparés par type d'embedding pour éviter les conflits
-VECTORSTORE_PATH = os.path.join("data", "faiss_index_hf.pkl") 
-METADATA_PATH = os.path.join("data", "vector_metadata_hf.pkl")
+VECTORSTORE_PATH = os.path.join("data", "index_hf")
+EMBEDDING_MODEL_ID = "sentence-transformers/all-MiniLM-L6-v2"
+# Modèle distant des explications de /recommend (clé du cache des explications)
+LLM_MODEL_ID = "google/flan-t5-base"
+# Backend des clés du cache des explications
+BACKEND_NAME = "huggingface"
+# Plage de similarité cosinus utile de all-MiniLM-L6-v2 (bruit -> correspondance nette)
+SIMILARITY_RANGE = (0.2, 0.7)
+# Similarité cosinus (all-MiniLM-L6-v2) au-delà de laquelle deux questions du chat sont équivalentes:
+# 0.85 réglé pour ce modèle, remplaçable par CHAT_CACHE_THRESHOLD_HF (ou CHAT_CACHE_THRESHOLD pour tous les backends)
+CHAT_CACHE_THRESHOLD = semantic_cache.chat_cache_threshold("CHAT_CACHE_THRESHOLD_HF", default=0.85)
+
+# Runtime des embeddings: "torch" (sentence-transformers) ou "onnx" (int8, sans PyTorch)
+EMBEDDINGS_RUNTIME = os.getenv("EMBEDDINGS_RUNTIME", "torch").lower()
 
 # Lazy loading du modèle d'embeddings (ne charge qu'à la première utilisation)
 _emb = None
 
+def _load_onnx_embeddings(cache_dir):
+    """Modèle ONNX int8, ou None si onnxruntime n'est pas disponible"""
+    try:
+        from onnx_embeddings import OnnxEmbeddings
+        return OnnxEmbeddings(EMBEDDING_MODEL_ID, cache_dir)
+    except Exception as e:
+        logger.warning(f"Runtime ONNX indisponible ({e}), utilisation de PyTorch")
+        return None
+
 def get_embeddings_model():
     """Charge le modèle d'embeddings seulement quand nécessaire (lazy loading)"""
     global _emb
     if _emb is None:
-        logger.info("Chargement du modèle all-MiniLM-L6-v2...")
+        logger.info(f"Chargement du modèle all-MiniLM-L6-v2 (runtime: {EMBEDDINGS_RUNTIME})...")
         start_time = time.time()
         
         # Optimisation pour Render : cache local
         cache_dir = os.getenv("TRANSFORMERS_CACHE", "/opt/render/.cache/huggingface")
         
-        _emb = HuggingFaceEmbeddings(
-            model_name="sentence-transformers/all-MiniLM-L6-v2",
-            cache_folder=cache_dir,
-            model_kwargs={
-                'device': 'cpu',  # Forcer CPU sur Render
-                'trust_remote_code': True
-            }
-        )
+        base_emb = _load_onnx_embeddings(cache_dir) if EMBEDDINGS_RUNTIME == "onnx" else None
+        # Les vecteurs int8 diffèrent légèrement de ceux de PyTorch: identifiant distinct,
+        # ce qui sépare leurs entrées de cache et force la reconstruction de l'index
+        model_id = EMBEDDING_MODEL_ID + ":onnx-int8" if base_emb is not None else EMBEDDING_MODEL_ID
+        if base_emb is None:
+            base_emb = HuggingFaceEmbeddings(
+                model_name=EMBEDDING_MODEL_ID,
+                cache_folder=cache_dir,
+                model_kwargs={
+                    'device': 'cpu',  # Forcer CPU sur Render
+                    'trust_remote_code': True
+                }
+            )
+        
+        # Les vecteurs déjà calculés (reconstructions, requêtes répétées) sont lus depuis le cache disque
+        _emb = CachedEmbeddings(base_emb, model_id=model_id)
         
         load_time = time.time() - start_time
         logger.info(f"Modèle chargé en {load_time:.2f}s")
@@ -179,7 +275,17 @@ class HuggingFaceAPIWrapper:
         )
         return response or "[Erreur: aucune réponse du modèle HuggingFace distant]"
 
-def init_llm_model(*, use_local=False, model_id="google/flan-t5-base"):
+    async def arun(self, prompt, **kwargs):
+        response = await generate_huggingface_response_async(
+            prompt=prompt,
+            api_key=self.api_key,
+            model_id=self.model_id,
+            max_length=self.max_length,
+            temperature=self.temperature
+        )
+        return response or "[Erreur: aucune réponse du modèle HuggingFace distant]"
+
+def init_llm_model(*, use_local=False, model_id=LLM_MODEL_ID):
     """
     Initialise le LLM pour les consultations (API HuggingFace Inference UNIQUEMENT)
     """
@@ -213,6 +319,9 @@ def get_llm_chain():
             def run(self, **kwargs):
                 prompt_text = self.prompt.format(**kwargs)
                 return self.llm.run(prompt_text)
+            async def arun(self, **kwargs):
+                prompt_text = self.prompt.format(**kwargs)
+                return await self.llm.arun(prompt_text)
         chain = SimpleLLMChain(llm=llm, prompt=prompt)
         return chain
     except Exception as e:
@@ -221,10 +330,18 @@ def get_llm_chain():
 
 llm = None
 chain = None
+llm_chat = None
+
+UNSPLASH_SEARCH_URL = "https://api.unsplash.com/search/photos"
 
 def fetch_image(plant_name: str) -> str:
-    url = f"https://api.unsplash.com/search/photos?query={plant_name}&client_id={UNSPLASH_KEY}&per_page=1"
-    resp = requests.get(url).json()
+    params = {"query": plant_name, "client_id": UNSPLASH_KEY, "per_page": 1}
+    resp = http_client.get(UNSPLASH_SEARCH_URL, params=params).json()
+    return resp["results"][0]["urls"]["small"] if resp["results"] else ""
+
+async def fetch_image_async(plant_name: str) -> str:
+    params = {"query": plant_name, "client_id": UNSPLASH_KEY, "per_page": 1}
+    resp = (await http_client.aget(UNSPLASH_SEARCH_URL, params=params)).json()
     return resp["results"][0]["urls"]["small"] if resp["results"] else ""
 
 def get_csv_last_modified(csv_path):
@@ -237,371 +354,145 @@ def get_csv_last_modified(csv_path):
         return 0
 
 def create_documents_from_df(df):
-    """Crée les documents vectoriels à partir du DataFrame"""
-    documents = []
-    for idx, row in df.iterrows():
-        content = f"Symptômes: {row.get('maladiesoigneeparrecette', '')}\n"
-        content += f"Plante: {row.get('plante_recette', '')}\n"
-        content += f"Dosage: {row.get('plante_quantite_recette', '')}\n"
-        content += f"Préparation: {row.get('recette', '')}"
-        
-        metadata = {
-            "plant_name": str(row.get('plante_recette', '')).split(';')[0].strip(),
-            "index": idx
-        }
-        documents.append(Document(page_content=content, metadata=metadata))
-    return documents
+    """Crée les documents vectoriels à partir du DataFrame (un par couple pathologie/plante par défaut)"""
+    return retrieval.create_recipe_documents(df)
 
-def build_and_save_vectorstore(df, csv_path):
-    """Construit et sauvegarde l'index vectoriel"""
+def build_and_save_vectorstore(df, csv_path, incremental=True):
+    """
+    Construit et sauvegarde l'index vectoriel.
+    En mode incrémental, seules les lignes ajoutées ou modifiées du CSV sont re-vectorisées.
+    """
     try:
         documents = create_documents_from_df(df)
         emb = get_embeddings_model()  # Lazy loading
-        vs = FAISS.from_documents(documents, emb)
-        
-        os.makedirs(os.path.dirname(VECTORSTORE_PATH), exist_ok=True)
-        
-        with open(VECTORSTORE_PATH, "wb") as f:
-            pickle.dump(vs, f)
-        
-        metadata = {
+        build = update_vector_index if incremental else build_vector_index
+        return build(documents, emb, VECTORSTORE_PATH, manifest={
+            "embedding_model": emb.model_id,
             "last_modified": get_csv_last_modified(csv_path),
-            "document_count": len(documents),
-            "created_at": time.time()
-        }
-        with open(METADATA_PATH, "wb") as f:
-            pickle.dump(metadata, f)
-        
-        return vs
-    except Exception:
+            "granularity": retrieval.INDEX_GRANULARITY,
+        })
+    except Exception as e:
+        logger.error(f"Erreur lors de la construction de l'index vectoriel: {e}")
         return None
 
 def should_rebuild_index(csv_path):
     """Détermine si l'index doit être reconstruit"""
-    if not os.path.exists(VECTORSTORE_PATH) or not os.path.exists(METADATA_PATH):
+    manifest = read_manifest(VECTORSTORE_PATH)
+    if manifest is None:
         return True
     
-    try:
-        with open(METADATA_PATH, "rb") as f:
-            metadata = pickle.load(f)
-        
-        current_mtime = get_csv_last_modified(csv_path)
-        last_indexed_mtime = metadata.get("last_modified", 0)
-        
-        return current_mtime > last_indexed_mtime
-    except Exception:
+    if manifest.get("embedding_model") != get_embeddings_model().model_id:
+        return True
+
+    # Changement de granularité des documents (INDEX_GRANULARITY)
+    if manifest.get("granularity", "row") != retrieval.INDEX_GRANULARITY:
         return True
+    
+    current_mtime = get_csv_last_modified(csv_path)
+    last_indexed_mtime = manifest.get("last_modified", 0)
+    
+    return current_mtime > last_indexed_mtime
 
 def load_or_build_vectorstore(df, csv_path):
     """Charge l'index vectoriel existant ou en crée un nouveau seulement si nécessaire"""
     
-    # 1. Si les fichiers n'existent pas, créer l'index
-    if not os.path.exists(VECTORSTORE_PATH) or not os.path.exists(METADATA_PATH):
-        logger.info("Index vectoriel introuvable, création d'un nouvel index...")
+    # 1. Si l'index n'existe pas, ou si le CSV a changé depuis la dernière vectorisation, le (re)créer
+    if should_rebuild_index(csv_path):
+        logger.info("Index vectoriel introuvable ou obsolète, création d'un nouvel index...")
         return build_and_save_vectorstore(df, csv_path)
     
-    # 2. Vérifier si le CSV a changé depuis la dernière vectorisation
+    # 2. CSV inchangé, charger l'index existant (mmap, partagé entre workers)
     try:
-        with open(METADATA_PATH, "rb") as f:
-            metadata = pickle.load(f)
-        
-        current_csv_mtime = get_csv_last_modified(csv_path)
-        last_indexed_mtime = metadata.get("last_modified", 0)
-        
-        # Si le CSV est plus récent que l'index, re-vectoriser
-        if current_csv_mtime > last_indexed_mtime:
-            logger.info(f"CSV modifié (mtime: {current_csv_mtime} > {last_indexed_mtime}), re-vectorisation...")
-            return build_and_save_vectorstore(df, csv_path)
-        
-        # 3. CSV inchangé, charger l'index existant
         logger.info("Index vectoriel existant et à jour, chargement...")
         start_time = time.time()
-        with open(VECTORSTORE_PATH, "rb") as f:
-            vs = pickle.load(f)
+        vs = load_vector_index(VECTORSTORE_PATH, get_embeddings_model())
         load_time = time.time() - start_time
         logger.info(f"✅ Index vectoriel chargé en {load_time:.2f}s")
         return vs
         
     except Exception as e:
-        logger.warning(f"Erreur lors du chargement des métadonnées: {e}, re-création de l'index...")
+        logger.warning(f"Erreur lors du chargement de l'index: {e}, re-création de l'index...")
         return build_and_save_vectorstore(df, csv_path)
 
-# Fonction principale pour obtenir des recommandations
-def get_recommendation(symptoms: str, df, csv_path="data/baseplante.csv", attempt_count=1):
-    
-    global vectorstore
-    
-    if 'vectorstore' not in globals() or vectorstore is None:
-        vectorstore = load_or_build_vectorstore(df, csv_path)
-    
-    vectorstore_initialized = vectorstore is not None
-    matches = None
-    if vectorstore_initialized:
-        try:
-            similar_docs = vectorstore.similarity_search(symptoms, k=3)
-            
-            if similar_docs:
-                most_similar_doc = similar_docs[0]
-                doc_index = most_similar_doc.metadata.get('index')
-                
-                if doc_index is not None:
-                    plant_data = df.iloc[doc_index].to_dict()
-                    matches = pd.DataFrame([plant_data])
-        except Exception:
-            pass
-    
-    if matches is None or len(matches) == 0:
-        clean_symptoms = symptoms.lower()
-        
-        for phrase in ["je pense que j'ai", "j'ai", "je souffre de", "je crois que", "traitement pour", "soigner", "guérir"]:
-            clean_symptoms = clean_symptoms.replace(phrase, "")
-        clean_symptoms = clean_symptoms.strip()
-        
-        symptom_mapping = {
-            "palud": ["malaria", "palu", "fièvre", "frissons"],
-            "malaria": ["paludisme", "palu", "fièvre", "frissons"],
-            "diarrhée": ["ventre", "intestin", "selles", "liquide"],
-            "constipation": ["intestin", "selles", "difficile"],
-            "fièvre": ["température", "chaud", "corps"],
-            "toux": ["respiration", "poumon", "gorge"],
-            "mal de tête": ["tête", "migraine", "céphalée"],
-            "douleur": ["mal", "souffrance"]
-        }        
-        for keyword, synonyms in symptom_mapping.items():
-            if keyword in clean_symptoms or any(syn in clean_symptoms for syn in synonyms):
-                search_term = keyword
-                matches = df[df["maladiesoigneeparrecette"].str.contains(search_term, case=False, na=False, regex=True)]
-                if not matches.empty:                    break
-        
-        if matches is None or len(matches) == 0:
-            matches = df[df["maladiesoigneeparrecette"].str.contains(clean_symptoms, case=False, na=False)]
-    
-    if matches.empty:
-        if "palud" in clean_symptoms or "malaria" in clean_symptoms:
-            matches = df[df["maladiesoigneeparrecette"].str.contains("malaria|paludisme", case=False, na=False, regex=True)]
-    
-    if matches.empty:
-        # Gestion intelligente des cas sans correspondance avec système de 2 tentatives basé sur attempt_count
-        if attempt_count == 1:
-            # Première tentative - demander plus de détails gentiment
-            return {
-                "plant": "Demande de précisions",
-                "explanation": """Je n'ai pas pu identifier une pathologie spécifique correspondant à vos symptômes dans notre base de données actuelle.
-
-Pourriez-vous m'aider en me donnant plus de détails sur ce que vous ressentez ? Par exemple :
-• Depuis quand avez-vous ces symptômes ?
-• À quel moment de la journée sont-ils plus intenses ?
-• Y a-t-il d'autres signes qui les accompagnent ?
-• Avez-vous des douleurs particulières ou des zones précises touchées ?
-
-Ces informations supplémentaires m'aideront à mieux vous orienter vers un traitement adapté.""",
-                "dosage": "Informations supplémentaires requises",
-                "preparation": "Informations supplémentaires requises", 
-                "image_url": "",
-                "contre_indications": "Veuillez fournir plus de détails sur vos symptômes",
-                "partie_utilisee": "Informations supplémentaires requises",
-                "composants": "Informations supplémentaires requises",
-                "nom_local": "",
-                "needs_more_details": True  # Indicateur pour le frontend
-            }
-        else:
-            # Deuxième tentative ou plus - orienter vers un professionnel
-            return {
-                "plant": "Consultation recommandée",
-                "explanation": """Malgré les détails supplémentaires que vous avez fournis, notre base de données actuelle ne nous permet pas de vous proposer une recommandation de traitement spécifique pour vos symptômes.
-
-Dans ce cas, je vous recommande vivement de :
-
-**🌿 Consulter un thérapeute en phytothérapie :**
-Vous pouvez trouver des contacts qualifiés sur notre page d'accueil grâce à la fonctionnalité « Contacter un thérapeute ».
-
-**🩺 Consulter un médecin :**
-Pour obtenir un diagnostic médical précis et un traitement approprié.
-
-Votre santé est précieuse, et il est important d'obtenir l'avis d'un professionnel de santé qualifié lorsque nos ressources actuelles ne suffisent pas à vous orienter correctement.""",
-                "dosage": "Consultation professionnelle requise",
-                "preparation": "Consultation professionnelle requise",
-                "image_url": "",
-                "contre_indications": "Consultez un professionnel de santé",
-                "partie_utilisee": "Consultation professionnelle requise", 
-                "composants": "Consultation professionnelle requise",
-                "nom_local": "",
-                "requires_consultation": True  # Indicateur pour le frontend
-            }
-    
-    plant = matches.iloc[0].to_dict()
-    plant_data = plant
-    
-    plant_names = plant.get("plante_recette", "").split(";")[0].strip() if plant.get("plante_recette") else "Plante inconnue"
-    
-    try:
-        image_url = plant.get("image_url") or fetch_image(plant_names)
-    except Exception:
-        image_url = ""
-    
-    dosage = plant.get("plante_quantite_recette", "Dosage non spécifié")
-    preparation = plant.get("recette", "Préparation non spécifiée")
-    contre_indications = plant.get("recette_contreindication", "") or plant.get("plante_contreindication", "Aucune contre-indication spécifiée")
-    partie_utilisee = plant.get("plante_partie_recette", "Partie non spécifiée")
-    composants = plant.get("plante_composantechimique", "Composants chimiques non spécifiés")
-    nom_local = plant.get("plante_nomlocal", "")
-    langue = plant.get("nomlocal_danslalangue", "")
-    pays = plant.get("danslalangue_dupays", "")    
-    if composants and ";" in composants:
-        composants_par_plante = {}
-        composants_parts = composants.split(";")
-        
-        for part in composants_parts:
-            if ":" in part:
-                plante, composant = part.split(":", 1)
-                plante = plante.strip()
-                composant = composant.strip()
-                
-                if "NULL" not in composant.upper():
-                    if plante not in composants_par_plante:
-                        composants_par_plante[plante] = []
-                    
-                    composants_par_plante[plante].append(composant)
-        
-        composants_lignes = []
-        for plante, comps in composants_par_plante.items():
-            if comps:
-                composants_lignes.append(f"{plante}: {', '.join(comps)}")
-        
-        if composants_lignes:
-            composants = "\n".join(composants_lignes)
-        else:
-            composants = "Composants chimiques spécifiques non disponibles actuellement"
-    elif "NULL" in composants.upper():
-        composants = "Composants chimiques spécifiques non disponibles actuellement"    
-    nom_local_info = ""
-    if nom_local and langue and pays:
-        noms_locaux_simplifies = {}
-        
-        if ";" in nom_local:
-            noms_plantes_raw = nom_local.split(";")
-            langues_raw = langue.split(";") if ";" in langue else [langue] * len(noms_plantes_raw)
-            pays_raw = pays.split(";") if ";" in pays else [pays] * len(noms_plantes_raw)
-            
-            plant_counts = {}
-            for nom in noms_plantes_raw:
-                if ":" in nom:
-                    plant_name, local_name = nom.split(":", 1)
-                    plant_name = plant_name.strip()
-                    if plant_name not in plant_counts:
-                        plant_counts[plant_name] = 0
-                    plant_counts[plant_name] += 1
-            
-            main_plants = sorted(plant_counts.keys(), key=lambda x: plant_counts[x], reverse=True)[:3]
-            
-            for plant_name in main_plants:
-                noms_locaux_simplifies[plant_name] = []
-                
-            for i, nom in enumerate(noms_plantes_raw):
-                if i >= len(langues_raw) or i >= len(pays_raw):
-                    break
-                    
-                if ":" in nom:
-                    plant_name, local_name = nom.split(":", 1)
-                    plant_name = plant_name.strip()
-                    local_name = local_name.strip()
-                    
-                    if plant_name in main_plants:
-                        langue_nom = langues_raw[i].strip() if i < len(langues_raw) else ""
-                        pays_nom = pays_raw[i].strip() if i < len(pays_raw) else ""
-                        
-                        if len(noms_locaux_simplifies[plant_name]) < 5:
-                            if langue_nom and pays_nom:
-                                noms_locaux_simplifies[plant_name].append(f"{local_name} ({langue_nom}, {pays_nom})")
-            
-            plant_infos = []
-            for plant_name, noms in noms_locaux_simplifies.items():
-                if noms:
-                    noms_valides = [nom for nom in noms if "NULL" not in nom]
-                    if noms_valides:
-                        noms_text = ", ".join(noms_valides[:5])
-                        plant_infos.append(f"{plant_name} est connue sous le nom de: {noms_text}")
-            
-            if plant_infos:
-                nom_local_info = "Noms locaux: " + ". ".join(plant_infos)
-        else:
-            if "NULL" not in nom_local:
-                nom_local_info = f"Nom local: {nom_local} en {langue} ({pays})."    
-    pathologies = plant.get('maladiesoigneeparrecette', 'Non spécifié')
-    
-    if "palud" in symptoms.lower() or "malaria" in symptoms.lower():
-        if not ("palud" in pathologies.lower() or "malaria" in pathologies.lower()):
-            pathologies = "paludisme"
-    
-    try:
-        llm_chain = get_llm_chain()
-        
-        if llm_chain is not None:
-            explanation = llm_chain.run(
-                symptoms=symptoms,
-                plant_name=plant_names,
-                pathology=pathologies.strip(),
-                preparation=preparation,
-                dosage=dosage,
-                parties_utilisees=partie_utilisee,
-                contre_indications_recette=plant.get("recette_contreindication", "Aucune contre-indication spécifique à la recette mentionnée"),
-                contre_indications_plante=plant.get("plante_contreindication", "Aucune contre-indication spécifique à la plante mentionnée"),
-                composants=composants
-            )
-            
-            sections = extract_sections_from_explanation(explanation)
-        else:
-            raise Exception("LLM non disponible")
-        
-    except Exception:
-        sections = create_fallback_sections_hf(symptoms, plant_names, pathologies, preparation, dosage, partie_utilisee, contre_indications, composants)
-        explanation = f"{sections['diagnostic']}\n\n{sections['symptomes']}\n\n{sections['presentation']}\n\n{sections['mode']}\n\n{sections['traitement']}\n\n{sections['precautions']}\n\n{sections['composants_text']}\n\n{sections['resume']}"    
-    result = {
-        "plant": plant_names,
-        "dosage": dosage,
-        "prep": preparation,
-        "image_url": image_url,
-        "explanation": explanation,
-        "contre_indications": contre_indications,
-        "partie_utilisee": partie_utilisee,
-        "composants": composants,
-        "nom_local": nom_local_info if nom_local_info else f"Nom local: {nom_local}" if nom_local else "",
-        
-        "diagnostic": sections.get('diagnostic', ''),
-        "symptomes": sections.get('symptomes', ''),
-        "presentation": sections.get('presentation', ''),
-        "mode_action": sections.get('mode', ''),
-        "traitement_info": sections.get('traitement', ''),
-        "precautions_info": sections.get('precautions', ''),
-        "composants_info": sections.get('composants_text', ''),
-        "resume_traitement": sections.get('resume', '')
-    }
-    
-    return result
+def generate_explanation(symptoms: str, prompt_inputs):
+    llm_chain = get_llm_chain()
+    if llm_chain is None:
+        raise Exception("LLM non disponible")
+    explanation = llm_chain.run(symptoms=symptoms, **prompt_inputs)
+    # Réponse d'erreur du wrapper: ne doit pas être mise en cache
+    if explanation.startswith("[Erreur"):
+        raise Exception(explanation)
+    return explanation, extract_sections_from_explanation(explanation)
+
+async def generate_explanation_async(symptoms: str, prompt_inputs):
+    llm_chain = get_llm_chain()
+    if llm_chain is None:
+        raise Exception("LLM non disponible")
+    explanation = await llm_chain.arun(symptoms=symptoms, **prompt_inputs)
+    # Réponse d'erreur du wrapper: ne doit pas être mise en cache
+    if explanation.startswith("[Erreur"):
+        raise Exception(explanation)
+    return explanation, extract_sections_from_explanation(explanation)
+
+def stream_explanation(symptoms: str, prompt_inputs):
+    """Explication token par token (flux text-generation de l'API HuggingFace)"""
+    if get_llm_chain() is None:
+        raise Exception("LLM non disponible")
+    yield from stream_huggingface_response(
+        prompt=prompt.format(symptoms=symptoms, **prompt_inputs),
+        api_key=llm.api_key,
+        model_id=llm.model_id,
+        max_length=llm.max_length,
+        temperature=llm.temperature
+    )
 
-def generate_chat_response(prompt: str):
-    """
-    Génère une réponse pour le mode discussion en utilisant le modèle LLM hugging face optimisé.
-    """
-    global llm_chat
-    
-    logger.info(f"Mode discussion: Génération d'une réponse pour: '{prompt}'")
-    
-    # Template pour les discussions générales sur la phytothérapie africaine
-    chat_template = """
+def get_recommendation(symptoms: str, df, csv_path="data/baseplante.csv", attempt_count=1, vs=None, profile_mask=0):
+    """Recommandation avec ce backend (recommendation.get_recommendation)"""
+    return recommendation.get_recommendation(sys.modules[__name__], symptoms, df, csv_path, attempt_count, vs, profile_mask)
+
+async def get_recommendation_async(symptoms: str, df, csv_path="data/baseplante.csv", attempt_count=1, vs=None, profile_mask=0):
+    """Variante asynchrone pour /recommend (recommendation.get_recommendation_async)"""
+    return await recommendation.get_recommendation_async(
+        sys.modules[__name__], symptoms, df, csv_path, attempt_count, vs, profile_mask
+    )
+
+# Template pour les discussions générales sur la phytothérapie africaine
+CHAT_TEMPLATE = """
     Tu es un expert en phytothérapie africaine avec une approche très humaine et pédagogique.
     Réponds à la question suivante de manière concise, informative et bienveillante, en privilégiant
     toujours la sécurité du patient et l'exactitude des informations. Si la question concerne un traitement spécifique ou des symptômes particuliers, suggère poliment de passer en mode Consultation pour obtenir une recommandation plus détaillée et personnalisée.
     
     Question: {question}
     """
-    
-    # Dictionnaire de réponses de secours pour les mots-clés courants
+
+def chat_embeddings():
+    """Modèle d'embeddings du cache sémantique du chat (None: chat sans cache)"""
+    try:
+        return get_embeddings_model()
+    except Exception as e:
+        logger.warning(f"Modèle d'embeddings indisponible, chat sans cache sémantique: {e}")
+        return None
+
+def stream_chat_response(prompt: str):
+    """Réponse du mode discussion token par token; lève une exception si le modèle est indisponible"""
+    if not HF_API_KEY:
+        raise ValueError("Clé API HuggingFace manquante")
+    yield from stream_huggingface_response(
+        prompt=CHAT_TEMPLATE.replace("{question}", prompt),
+        api_key=HF_API_KEY,
+        model_id=LLM_MODEL_ID,
+        max_length=200,
+        temperature=0.7
+    )
+
+def fallback_chat_response(prompt: str):
+    """Réponse prédéfinie du mode discussion quand le modèle est indisponible (jamais mise en cache)"""
+    # Réponses de secours par concept détecté (vocabulaire data/synonyms.json)
     fallback_keywords = {
         "paludisme": "[⚠️ Mode assistance] Je n'ai pas pu réaliser une analyse complète de votre demande concernant le paludisme. Sans accès au modèle linguistique principal, il m'est impossible d'établir un diagnostic fiable. Le paludisme est une maladie grave nécessitant un avis médical professionnel. Certaines plantes comme la Cryptolepia sanguinolenta sont traditionnellement utilisées, mais uniquement comme complément au traitement médical. Pour explorer des options de phytothérapie, utilisez le mode Consultation tout en consultant un médecin.",
         "malaria": "[⚠️ Mode assistance] Je n'ai pas pu établir de diagnostic précis concernant votre question sur la malaria (paludisme). Cette infection grave requiert un diagnostic médical formel. Des plantes comme l'Artemisia annua sont utilisées traditionnellement, mais ne peuvent remplacer un traitement médical approprié. Pour des informations structurées sur ces plantes, utilisez le mode Consultation, mais consultez impérativement un médecin si vous suspectez cette maladie.",
-        "fièvre": "[⚠️ Mode assistance] Je n'ai pas pu analyser correctement la cause de votre fièvre. Ce symptôme pouvant être lié à de nombreuses pathologies, il serait imprudent de suggérer un traitement spécifique sans diagnostic médical. Certaines plantes comme le Nauclea latifolia sont traditionnellement utilisées en phytothérapie africaine pour soulager la fièvre, mais cela ne remplace jamais un avis médical. Pour des informations structurées, utilisez le mode Consultation.",
-        "tête": "[⚠️ Mode assistance] Je n'ai pas pu analyser la nature de vos maux de tête, qui peuvent avoir diverses causes. Sans examen médical, je ne peux recommander un traitement spécifique. Des plantes comme le Securidaca longipedunculata sont utilisées traditionnellement, mais uniquement après avoir écarté des causes plus graves nécessitant une intervention médicale. Pour des informations plus structurées sur les approches traditionnelles, utilisez le mode Consultation.",
+        "fievre": "[⚠️ Mode assistance] Je n'ai pas pu analyser correctement la cause de votre fièvre. Ce symptôme pouvant être lié à de nombreuses pathologies, il serait imprudent de suggérer un traitement spécifique sans diagnostic médical. Certaines plantes comme le Nauclea latifolia sont traditionnellement utilisées en phytothérapie africaine pour soulager la fièvre, mais cela ne remplace jamais un avis médical. Pour des informations structurées, utilisez le mode Consultation.",
+        "tete": "[⚠️ Mode assistance] Je n'ai pas pu analyser la nature de vos maux de tête, qui peuvent avoir diverses causes. Sans examen médical, je ne peux recommander un traitement spécifique. Des plantes comme le Securidaca longipedunculata sont utilisées traditionnellement, mais uniquement après avoir écarté des causes plus graves nécessitant une intervention médicale. Pour des informations plus structurées sur les approches traditionnelles, utilisez le mode Consultation.",
         "toux": "[⚠️ Mode assistance] Je n'ai pas pu analyser la nature exacte de votre toux, symptôme qui peut relever de diverses affections respiratoires. Sans examen médical, il m'est impossible de déterminer sa cause. L'Eucalyptus globulus ou le gingembre sont traditionnellement utilisés en phytothérapie africaine, mais une toux persistante nécessite un avis médical. Pour des informations sur ces plantes, utilisez le mode Consultation tout en consultant un professionnel de santé.",
         "digestion": "[⚠️ Mode assistance] Je n'ai pas pu analyser précisément votre problème digestif, qui peut avoir de nombreuses causes différentes. Sans diagnostic médical, je ne peux recommander un traitement spécifique. Le Moringa oleifera ou l'Aloe vera sont traditionnellement utilisés en phytothérapie africaine, mais leur pertinence dépend de la cause exacte de votre trouble. Pour des informations plus structurées, utilisez le mode Consultation.",
         "insomnie": "[⚠️ Mode assistance] Je n'ai pas pu analyser la cause de votre insomnie, qui peut être liée à divers facteurs physiologiques ou psychologiques. Sans évaluation complète, je ne peux recommander un traitement spécifique. La passiflore ou la valériane sont utilisées traditionnellement, mais leur efficacité varie selon les causes. Pour des approches de phytothérapie plus détaillées, utilisez le mode Consultation.",
@@ -618,10 +509,26 @@ def generate_chat_response(prompt: str):
         "[⚠️ Mode assistance] Je n'ai pas pu traiter votre requête de manière optimale. En Afrique, le savoir sur les plantes médicinales est transmis de génération en génération, avec des plantes comme l'Acacia senegal ou le Tamarindus indica utilisées depuis des siècles. Sans accès au modèle principal, je ne peux proposer de traitement spécifique. Pour explorer des options de phytothérapie, utilisez le mode Consultation tout en consultant un professionnel de santé.",
         "[⚠️ Mode assistance] Je n'ai pas pu analyser votre demande en profondeur. Les guérisseurs traditionnels africains possèdent un savoir immense sur les propriétés des plantes médicinales, incluant non seulement les plantes elles-mêmes mais aussi les méthodes de préparation qui optimisent leur efficacité. Sans accès au modèle principal, je vous invite à utiliser le mode Consultation pour des recommandations plus structurées, tout en consultant un professionnel de santé."    ]
     
-    try:
+    # Premier concept de la requête ayant une réponse spécifique (une seule passe sur le texte)
+    for concept_id in synonyms.get_matcher().concepts_in(prompt):
+        if concept_id in fallback_keywords:
+            logger.info(f"Concept '{concept_id}' détecté, utilisation de la réponse spécifique")
+            return fallback_keywords[concept_id]
+    
+    # Si aucun mot-clé spécifique, retourner une réponse générique aléatoire
+    return random.choice(phyto_responses) if random.random() < 0.7 else default_response
+
+def generate_chat_response(prompt: str, plant_words=frozenset()):
+    """
+    Génère une réponse pour le mode discussion en utilisant le modèle LLM hugging face optimisé.
+    """
+    logger.info(f"Mode discussion: Génération d'une réponse pour: '{prompt}'")
+    
+    def ask_model():
+        global llm_chat
         # Étape 1: Essayer d'utiliser le modèle LLM optimisé
         use_local = os.getenv("USE_LOCAL_MODEL", "False").lower() in ("true", "1", "t")
-        formatted_prompt = chat_template.replace("{question}", prompt)
+        formatted_prompt = CHAT_TEMPLATE.replace("{question}", prompt)
         
         # Initialiser le modèle chat si ce n'est pas déjà fait
         if llm_chat is None:
@@ -632,7 +539,7 @@ def generate_chat_response(prompt: str):
         if llm_chat is not None:
             from langchain_core.prompts import PromptTemplate
             chat_prompt = PromptTemplate(
-                template=chat_template,
+                template=CHAT_TEMPLATE,
                 input_variables=["question"]
             )
             
@@ -662,24 +569,48 @@ def generate_chat_response(prompt: str):
         if response and len(response.strip()) > 20:
             logger.info(f"Réponse générée avec succès via API HTTP (longueur: {len(response)})")
             return response.strip()
-            
-        # Étape 3: Fallback sur les réponses prédéfinies
-        logger.warning("Réponse API trop courte ou vide, utilisation des fallbacks prédéfinis")
+        raise ValueError("Réponse API trop courte ou vide")
+    
+    try:
+        # Question déjà posée, éventuellement reformulée: réponse reprise du cache sémantique
+        return semantic_cache.cached_answer(prompt, chat_embeddings(), ask_model, threshold=CHAT_CACHE_THRESHOLD, plant_words=plant_words)
         
-        # Vérifier si un mot clé est présent dans la requête
-        prompt_lower = prompt.lower()
-        for keyword, fallback_response in fallback_keywords.items():
-            if keyword in prompt_lower:
-                logger.info(f"Mot-clé '{keyword}' détecté, utilisation de la réponse spécifique")
-                return fallback_response
+    except Exception as e:
+        # Étape 3: Fallback sur les réponses prédéfinies (jamais mises en cache)
+        logger.warning(f"Génération de réponse chat impossible ({e}), utilisation des fallbacks prédéfinis")
+        return fallback_chat_response(prompt)
+
+async def generate_chat_response_async(prompt: str, plant_words=frozenset()):
+    """
+    Variante asynchrone de generate_chat_response: l'appel à l'API HuggingFace passe par le client
+    HTTP partagé et ne bloque pas la boucle d'événements pendant la génération.
+    """
+    logger.info(f"Mode discussion: Génération d'une réponse pour: '{prompt}'")
+    
+    async def ask_model():
+        global llm_chat
+        if llm_chat is None:
+            logger.info("Initialisation du modèle LLM pour le chat")
+            llm_chat = init_llm_model(use_local=os.getenv("USE_LOCAL_MODEL", "False").lower() in ("true", "1", "t"))
+        if llm_chat is None:
+            raise ValueError("Modèle LLM non disponible pour le chat")
         
-        # Si aucun mot-clé spécifique, retourner une réponse générique aléatoire
-        return random.choice(phyto_responses)
+        response = await llm_chat.arun(CHAT_TEMPLATE.replace("{question}", prompt))
+        
+        # Vérifier si la réponse est valide (le wrapper renvoie "[Erreur ...]" en cas d'échec)
+        if response and len(response.strip()) > 20 and not response.startswith("[Erreur"):
+            logger.info(f"Réponse générée avec succès via API HTTP (longueur: {len(response)})")
+            return response.strip()
+        raise ValueError("Réponse API trop courte ou vide")
+    
+    try:
+        # Question déjà posée, éventuellement reformulée: réponse reprise du cache sémantique
+        embeddings = await asyncio.to_thread(chat_embeddings)
+        return await semantic_cache.cached_answer_async(prompt, embeddings, ask_model, threshold=CHAT_CACHE_THRESHOLD, plant_words=plant_words)
         
     except Exception as e:
-        logger.error(f"Erreur lors de la génération de réponse chat: {str(e)}")
-        traceback.print_exc()
-        return random.choice(phyto_responses) if random.random() < 0.7 else default_response
+        logger.warning(f"Génération de réponse chat impossible ({e}), utilisation des fallbacks prédéfinis")
+        return fallback_chat_response(prompt)
 
 def clean_null_values(text):
     """
@@ -840,26 +771,17 @@ def create_fallback_sections_hf(symptoms, plant_names, pathologies, preparation,
         "resume": f"Pour traiter le {pathologies}, préparez une décoction de {plant_names} selon les instructions indiquées. Prenez la dose recommandée 2-3 fois par jour pendant 7 jours. Si les symptômes persistent après 3 jours ou s'aggravent, consultez immédiatement un professionnel de santé. Respectez les précautions mentionnées pour un traitement sûr et efficace."
     }
 
-def initialize_models():
-    """Pré-charge les modèles au démarrage de l'application pour éviter les latences"""
-    try:
-        logger.info("Initialisation des modèles au démarrage...")
-        
-        # Pré-charger le modèle d'embeddings
-        emb = get_embeddings_model()
-        logger.info("✅ Modèle d'embeddings pré-chargé")
-        
-        # Test rapide pour vérifier que ça fonctionne
-        test_text = "test"
-        emb.embed_query(test_text)
-        logger.info("✅ Test d'embedding réussi")
-        
-        return True
-    except Exception as e:
-        logger.error(f"❌ Erreur lors de l'initialisation des modèles: {e}")
-        return False
+# Nom commun aux deux backends (recommendation.fallback_explanation)
+create_fallback_sections = create_fallback_sections_hf
 
-# Initialiser les modèles au chargement du module (pour Render)
-if os.getenv("RENDER"):
-    logger.info("Environnement Render détecté, pré-chargement des modèles...")
-    initialize_models()
+def warm_up(df, csv_path):
+    """
+    Pré-charge le modèle d'embeddings, puis l'index vectoriel et le chemin de recommandation
+    (recommendation.warm_up): {"timings": ..., "vector_index": index chargé}.
+    """
+    start_time = time.time()
+    emb = get_embeddings_model()
+    emb.embed_query(retrieval.WARMUP_QUERY)
+    timings = {"embeddings": round(time.time() - start_time, 3)}
+    logger.info("✅ Modèle d'embeddings pré-chargé")
+    return recommendation.warm_up(sys.modules[__name__], df, csv_path, timings)
@@ -1,13 +1,11 @@
+import logging
 import os
-import pickle
-import requests
+import sys
 import time
 
 from dotenv import load_dotenv
 from langchain.chains import LLMChain
-from langchain.docstore.document import Document
 from langchain_community.chat_models import ChatOpenAI
-from langchain_community.vectorstores import FAISS
 from langchain_core.prompts import PromptTemplate
 
 try:
@@ -15,15 +13,36 @@ try:
 except ImportError:
     from langchain_community.embeddings import OpenAIEmbeddings
 
+import http_client
+import recommendation
+import retrieval
+import semantic_cache
+import synonyms
+from embedding_cache import CachedEmbeddings
+from vector_index import build_vector_index, load_vector_index, read_manifest, update_vector_index
+
+logger = logging.getLogger(__name__)
+
 load_dotenv()
 UNSPLASH_KEY = os.getenv("UNSPLASH_KEY")
 HF_API_KEY = os.getenv("HF_API_KEY")
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
 
-VECTORSTORE_PATH = os.path.join("data", "faiss_index_openai.pkl")  # Spécifique OpenAI
-METADATA_PATH = os.path.join("data", "vector_metadata_openai.pkl")
-
-emb = OpenAIEmbeddings(model="text-embedding-3-small", openai_api_key=OPENAI_API_KEY)
+VECTORSTORE_PATH = os.path.join("data", "index_openai")  # Spécifique OpenAI
+EMBEDDING_MODEL_ID = "text-embedding-3-small"
+LLM_MODEL_ID = "gpt-3.5-turbo"
+# Backend des clés du cache des explications
+BACKEND_NAME = "openai"
+# Similarité cosinus (text-embedding-3-small) au-delà de laquelle deux questions du chat sont équivalentes:
+# 0.8 réglé pour ce modèle, remplaçable par CHAT_CACHE_THRESHOLD_OPENAI (ou CHAT_CACHE_THRESHOLD pour tous les backends)
+CHAT_CACHE_THRESHOLD = semantic_cache.chat_cache_threshold("CHAT_CACHE_THRESHOLD_OPENAI", default=0.8)
+# Plage de similarité cosinus utile de text-embedding-3-small (bruit -> correspondance nette)
+SIMILARITY_RANGE = (0.15, 0.6)
+
+emb = CachedEmbeddings(
+    OpenAIEmbeddings(model=EMBEDDING_MODEL_ID, openai_api_key=OPENAI_API_KEY),
+    model_id=EMBEDDING_MODEL_ID
+)
 
 # Prompt template pour la consultation
 template = """
@@ -83,7 +102,7 @@ prompt = PromptTemplate(
 
 try:
     llm = ChatOpenAI(
-        model="gpt-3.5-turbo",
+        model=LLM_MODEL_ID,
         temperature=0.7,
         openai_api_key=OPENAI_API_KEY,
         request_timeout=30,
@@ -101,22 +120,49 @@ try:
         max_retries=2,
     )
     
+    # Mêmes modèles, tokens transmis au fil de la génération (/recommend/stream, /chat/stream)
+    llm_stream = ChatOpenAI(
+        model=LLM_MODEL_ID,
+        temperature=0.7,
+        openai_api_key=OPENAI_API_KEY,
+        request_timeout=30,
+        max_retries=2,
+        streaming=True,
+    )
+    
+    llm_chat_stream = ChatOpenAI(
+        model="gpt-3.5-turbo",
+        temperature=0.7,
+        max_tokens=500,
+        openai_api_key=OPENAI_API_KEY,
+        request_timeout=30,
+        max_retries=2,
+        streaming=True,
+    )
+    
     if not llm or not llm_chat:
         raise ValueError("Erreur d'initialisation des modèles OpenAI")
         
 except Exception as e:
-    import logging
-    logger = logging.getLogger(__name__)
     logger.error(f"❌ Erreur lors de l'initialisation des modèles OpenAI: {e}")
     logger.error(f"❌ Type d'erreur: {type(e).__name__}")
     logger.error(f"❌ Détails: {str(e)}")
     # Les variables restent None, ce qui causera les fallbacks
     llm = None
     llm_chat = None
+    llm_stream = None
+    llm_chat_stream = None
+
+UNSPLASH_SEARCH_URL = "https://api.unsplash.com/search/photos"
 
 def fetch_image(plant_name: str) -> str:
-    url = f"https://api.unsplash.com/search/photos?query={plant_name}&client_id={UNSPLASH_KEY}&per_page=1"
-    resp = requests.get(url).json()
+    params = {"query": plant_name, "client_id": UNSPLASH_KEY, "per_page": 1}
+    resp = http_client.get(UNSPLASH_SEARCH_URL, params=params).json()
+    return resp["results"][0]["urls"]["small"] if resp["results"] else ""
+
+async def fetch_image_async(plant_name: str) -> str:
+    params = {"query": plant_name, "client_id": UNSPLASH_KEY, "per_page": 1}
+    resp = (await http_client.aget(UNSPLASH_SEARCH_URL, params=params)).json()
     return resp["results"][0]["urls"]["small"] if resp["results"] else ""
 
 def get_csv_last_modified(csv_path):
@@ -129,69 +175,51 @@ def get_csv_last_modified(csv_path):
         return 0
 
 def create_documents_from_df(df):
-    """Crée les documents vectoriels à partir du DataFrame"""
-    documents = []
-    for idx, row in df.iterrows():
-        content = f"Symptômes: {row.get('maladiesoigneeparrecette', '')}\n"
-        content += f"Plante: {row.get('plante_recette', '')}\n"
-        content += f"Dosage: {row.get('plante_quantite_recette', '')}\n"
-        content += f"Préparation: {row.get('recette', '')}"
-        
-        metadata = {
-            "plant_name": str(row.get('plante_recette', '')).split(';')[0].strip(),
-            "index": idx
-        }
-        documents.append(Document(page_content=content, metadata=metadata))
-    return documents
-
-def build_and_save_vectorstore(df, csv_path):
-    """Construit et sauvegarde l'index vectoriel"""
+    """Crée les documents vectoriels à partir du DataFrame (un par couple pathologie/plante par défaut)"""
+    return retrieval.create_recipe_documents(df)
+
+def build_and_save_vectorstore(df, csv_path, incremental=True):
+    """
+    Construit et sauvegarde l'index vectoriel.
+    En mode incrémental, seules les lignes ajoutées ou modifiées du CSV sont re-vectorisées.
+    """
     try:
         documents = create_documents_from_df(df)
-        vs = FAISS.from_documents(documents, emb)
-        
-        os.makedirs(os.path.dirname(VECTORSTORE_PATH), exist_ok=True)
-        
-        with open(VECTORSTORE_PATH, "wb") as f:
-            pickle.dump(vs, f)
-        
-        metadata = {
+        build = update_vector_index if incremental else build_vector_index
+        return build(documents, emb, VECTORSTORE_PATH, manifest={
+            "embedding_model": EMBEDDING_MODEL_ID,
             "last_modified": get_csv_last_modified(csv_path),
-            "document_count": len(documents),
-            "created_at": time.time()
-        }
-        with open(METADATA_PATH, "wb") as f:
-            pickle.dump(metadata, f)
-        
-        return vs
-    except Exception:
+            "granularity": retrieval.INDEX_GRANULARITY,
+        })
+    except Exception as e:
+        logger.error(f"Erreur lors de la construction de l'index vectoriel: {e}")
         return None
 
 def should_rebuild_index(csv_path):
     """Détermine si l'index doit être reconstruit"""
-    if not os.path.exists(VECTORSTORE_PATH) or not os.path.exists(METADATA_PATH):
+    manifest = read_manifest(VECTORSTORE_PATH)
+    if manifest is None:
         return True
     
-    try:
-        with open(METADATA_PATH, "rb") as f:
-            metadata = pickle.load(f)
-        
-        current_mtime = get_csv_last_modified(csv_path)
-        last_indexed_mtime = metadata.get("last_modified", 0)
-        
-        return current_mtime > last_indexed_mtime
-    except Exception:
+    if manifest.get("embedding_model") != EMBEDDING_MODEL_ID:
         return True
 
+    # Changement de granularité des documents (INDEX_GRANULARITY)
+    if manifest.get("granularity", "row") != retrieval.INDEX_GRANULARITY:
+        return True
+    
+    current_mtime = get_csv_last_modified(csv_path)
+    last_indexed_mtime = manifest.get("last_modified", 0)
+    
+    return current_mtime > last_indexed_mtime
+
 def load_or_build_vectorstore(df, csv_path):
     """Charge l'index vectoriel existant ou en crée un nouveau"""
     if should_rebuild_index(csv_path):
         return build_and_save_vectorstore(df, csv_path)
     
     try:
-        with open(VECTORSTORE_PATH, "rb") as f:
-            vs = pickle.load(f)
-        return vs
+        return load_vector_index(VECTORSTORE_PATH, emb)
     except Exception:
         return build_and_save_vectorstore(df, csv_path)
 
@@ -312,267 +340,32 @@ def create_fallback_sections(symptoms, plant_names, pathologies, preparation, do
         "resume": f"Pour traiter le {pathologies}, préparez une décoction de {plant_names} selon les instructions indiquées. Prenez la dose recommandée 2-3 fois par jour pendant 7 jours. Si les symptômes persistent après 3 jours ou s'aggravent, consultez immédiatement un professionnel de santé. Respectez les précautions mentionnées pour un traitement sûr et efficace."
     }
 
-def get_recommendation(symptoms: str, df, csv_path="data/baseplante.csv", attempt_count=1):
-    import pandas as pd
-    
-    global vectorstore
-    
-    if 'vectorstore' not in globals() or vectorstore is None:
-        vectorstore = load_or_build_vectorstore(df, csv_path)
-    
-    vectorstore_initialized = vectorstore is not None
-    matches = None
-    if vectorstore_initialized:
-        try:
-            similar_docs = vectorstore.similarity_search(symptoms, k=3)
-            
-            if similar_docs:
-                most_similar_doc = similar_docs[0]
-                doc_index = most_similar_doc.metadata.get('index')
-                
-                if doc_index is not None:
-                    plant_data = df.iloc[doc_index].to_dict()
-                    matches = pd.DataFrame([plant_data])
-        except Exception:
-            pass
-    
-    if matches is None or len(matches) == 0:
-        clean_symptoms = symptoms.lower()
-        
-        for phrase in ["je pense que j'ai", "j'ai", "je souffre de", "je crois que", "traitement pour", "soigner", "guérir"]:
-            clean_symptoms = clean_symptoms.replace(phrase, "")
-        clean_symptoms = clean_symptoms.strip()
-        
-        symptom_mapping = {
-            "palud": ["malaria", "palu", "fièvre", "frissons"],
-            "malaria": ["paludisme", "palu", "fièvre", "frissons"],
-            "diarrhée": ["ventre", "intestin", "selles", "liquide"],
-            "constipation": ["intestin", "selles", "difficile"],
-            "fièvre": ["température", "chaud", "corps"],
-            "toux": ["respiration", "poumon", "gorge"],
-            "mal de tête": ["tête", "migraine", "céphalée"],
-            "douleur": ["mal", "souffrance"]
-        }
-        
-        for keyword, synonyms in symptom_mapping.items():
-            if keyword in clean_symptoms or any(syn in clean_symptoms for syn in synonyms):
-                search_term = keyword
-                matches = df[df["maladiesoigneeparrecette"].str.contains(search_term, case=False, na=False, regex=True)]
-                if not matches.empty:
-                    break
-        
-        if matches is None or len(matches) == 0:
-            matches = df[df["maladiesoigneeparrecette"].str.contains(clean_symptoms, case=False, na=False)]
-    
-    if matches.empty:
-        if "palud" in clean_symptoms or "malaria" in clean_symptoms:
-            matches = df[df["maladiesoigneeparrecette"].str.contains("malaria|paludisme", case=False, na=False, regex=True)]
-    
-    if matches.empty:
-        # Gestion intelligente des cas sans correspondance avec système de 2 tentatives basé sur attempt_count
-        if attempt_count == 1:
-            # Première tentative - demander plus de détails gentiment
-            return {
-                "plant": "Demande de précisions",
-                "explanation": """Je n'ai pas pu identifier une pathologie spécifique correspondant à vos symptômes dans notre base de données actuelle.
-
-Pourriez-vous m'aider en me donnant plus de détails sur ce que vous ressentez ? Par exemple :
-• Depuis quand avez-vous ces symptômes ?
-• À quel moment de la journée sont-ils plus intenses ?
-• Y a-t-il d'autres signes qui les accompagnent ?
-• Avez-vous des douleurs particulières ou des zones précises touchées ?
-
-Ces informations supplémentaires m'aideront à mieux vous orienter vers un traitement adapté.""",
-                "dosage": "Informations supplémentaires requises",
-                "prep": "Informations supplémentaires requises", 
-                "image_url": "",
-                "contre_indications": "Veuillez fournir plus de détails sur vos symptômes",
-                "partie_utilisee": "Informations supplémentaires requises",                "composants": "Informations supplémentaires requises",
-                "nom_local": "",
-                "needs_more_details": True  # Indicateur pour le frontend
-            }
-        else:
-            # Deuxième tentative ou plus - orienter vers un professionnel
-            return {
-                "plant": "Consultation recommandée",
-                "explanation": """Malgré les détails supplémentaires que vous avez fournis, notre base de données actuelle ne nous permet pas de vous proposer une recommandation de traitement spécifique pour vos symptômes.
-
-Dans ce cas, je vous recommande vivement de :
-
-**🌿 Consulter un thérapeute en phytothérapie :**
-Vous pouvez trouver des contacts qualifiés sur notre page d'accueil grâce à la fonctionnalité « Contacter un thérapeute ».
-
-**🩺 Consulter un médecin :**
-Pour obtenir un diagnostic médical précis et un traitement approprié.
-
-Votre santé est précieuse, et il est important d'obtenir l'avis d'un professionnel de santé qualifié lorsque nos ressources actuelles ne suffisent pas à vous orienter correctement.""",                "dosage": "Consultation professionnelle requise",
-                "prep": "Consultation professionnelle requise",
-                "image_url": "",
-                "contre_indications": "Consultez un professionnel de santé",
-                "partie_utilisee": "Consultation professionnelle requise", 
-                "composants": "Consultation professionnelle requise",
-                "nom_local": "",
-                "requires_consultation": True  # Indicateur pour le frontend
-            }
-    
-    plant = matches.iloc[0].to_dict()
-    plant_data = plant
-    
-    plant_names = plant.get("plante_recette", "").split(";")[0].strip() if plant.get("plante_recette") else "Plante inconnue"
-    
-    try:
-        image_url = plant.get("image_url") or fetch_image(plant_names)
-    except Exception:
-        image_url = ""
-    
-    dosage = plant.get("plante_quantite_recette", "Dosage non spécifié")
-    preparation = plant.get("recette", "Préparation non spécifiée")
-    contre_indications = plant.get("recette_contreindication", "") or plant.get("plante_contreindication", "Aucune contre-indication spécifiée")
-    partie_utilisee = plant.get("plante_partie_recette", "Partie non spécifiée")
-    composants = plant.get("plante_composantechimique", "Composants chimiques non spécifiés")
-    nom_local = plant.get("plante_nomlocal", "")
-    langue = plant.get("nomlocal_danslalangue", "")
-    pays = plant.get("danslalangue_dupays", "")
-    
-    if composants and ";" in composants:
-        composants_par_plante = {}
-        composants_parts = composants.split(";")
-        
-        for part in composants_parts:
-            if ":" in part:
-                plante, composant = part.split(":", 1)
-                plante = plante.strip()
-                composant = composant.strip()
-                
-                if "NULL" not in composant.upper():
-                    if plante not in composants_par_plante:
-                        composants_par_plante[plante] = []
-                    
-                    composants_par_plante[plante].append(composant)
-        
-        composants_lignes = []
-        for plante, comps in composants_par_plante.items():
-            if comps:
-                composants_lignes.append(f"{plante}: {', '.join(comps)}")
-        
-        if composants_lignes:
-            composants = "\n".join(composants_lignes)
-        else:
-            composants = "Composants chimiques spécifiques non disponibles actuellement"
-    elif "NULL" in composants.upper():
-        composants = "Composants chimiques spécifiques non disponibles actuellement"
-    
-    nom_local_info = ""
-    if nom_local and langue and pays:
-        noms_locaux_simplifies = {}
-        
-        if ";" in nom_local:
-            noms_plantes_raw = nom_local.split(";")
-            langues_raw = langue.split(";") if ";" in langue else [langue] * len(noms_plantes_raw)
-            pays_raw = pays.split(";") if ";" in pays else [pays] * len(noms_plantes_raw)
-            
-            plant_counts = {}
-            for nom in noms_plantes_raw:
-                if ":" in nom:
-                    plant_name, local_name = nom.split(":", 1)
-                    plant_name = plant_name.strip()
-                    if plant_name not in plant_counts:
-                        plant_counts[plant_name] = 0
-                    plant_counts[plant_name] += 1
-            
-            main_plants = sorted(plant_counts.keys(), key=lambda x: plant_counts[x], reverse=True)[:3]
-            
-            for plant_name in main_plants:
-                noms_locaux_simplifies[plant_name] = []
-                
-            for i, nom in enumerate(noms_plantes_raw):
-                if i >= len(langues_raw) or i >= len(pays_raw):
-                    break
-                    
-                if ":" in nom:
-                    plant_name, local_name = nom.split(":", 1)
-                    plant_name = plant_name.strip()
-                    local_name = local_name.strip()
-                    
-                    if plant_name in main_plants and "NULL" not in local_name.upper():
-                        langue_nom = langues_raw[i].strip() if i < len(langues_raw) else ""
-                        pays_nom = pays_raw[i].strip() if i < len(pays_raw) else ""
-                        
-                        if len(noms_locaux_simplifies[plant_name]) < 5:
-                            if langue_nom and pays_nom and "NULL" not in langue_nom.upper() and "NULL" not in pays_nom.upper():
-                                noms_locaux_simplifies[plant_name].append(f"{local_name} ({langue_nom}, {pays_nom})")
-            
-            plant_infos = []
-            for plant_name, noms in noms_locaux_simplifies.items():
-                if noms:
-                    noms_valides = [nom for nom in noms if "NULL" not in nom.upper()]
-                    if noms_valides:
-                        noms_text = ", ".join(noms_valides[:5])
-                        plant_infos.append(f"{plant_name} est connue sous le nom de: {noms_text}")
-            
-            if plant_infos:
-                nom_local_info = "Noms locaux: " + ". ".join(plant_infos)
-            else:
-                nom_local_info = "Noms locaux non disponibles dans les données actuelles"
-        else:
-            if "NULL" not in nom_local.upper():
-                nom_local_info = f"Nom local: {nom_local} en {langue} ({pays})."
-            else:
-                nom_local_info = "Noms locaux non disponibles dans les données actuelles"
-    else:
-        nom_local_info = "Noms locaux non disponibles dans les données actuelles"
-    
-    pathologies = plant.get('maladiesoigneeparrecette', 'Non spécifié')
-    
-    if "palud" in symptoms.lower() or "malaria" in symptoms.lower():
-        if not ("palud" in pathologies.lower() or "malaria" in pathologies.lower()):
-            pathologies = "paludisme"    
-    try:        
-        explanation = chain.run(
-            symptoms=symptoms,
-            plant_name=plant_names,
-            pathology=pathologies.strip(),
-            preparation=preparation,
-            dosage=dosage,
-            parties_utilisees=partie_utilisee,
-            contre_indications_recette=plant.get("recette_contreindication", "Aucune contre-indication spécifique à la recette mentionnée"),
-            contre_indications_plante=plant.get("plante_contreindication", "Aucune contre-indication spécifique à la plante mentionnée"),
-            composants=composants
-        )
-        
-        sections = extract_sections_from_explanation(explanation)
-        
-    except Exception:
-        sections = create_fallback_sections(symptoms, plant_names, pathologies, preparation, dosage, partie_utilisee, contre_indications, composants)
-        explanation = f"{sections['diagnostic']}\n\n{sections['symptomes']}\n\n{sections['presentation']}\n\n{sections['mode']}\n\n{sections['traitement']}\n\n{sections['precautions']}\n\n{sections['composants_text']}\n\n{sections['resume']}"    
-    result = {
-        "plant": plant_names,
-        "dosage": dosage,
-        "prep": preparation,
-        "image_url": image_url,
-        "explanation": explanation,
-        "contre_indications": contre_indications,
-        "partie_utilisee": partie_utilisee,
-        "composants": composants,
-        "nom_local": nom_local_info if nom_local_info else f"Nom local: {nom_local}" if nom_local else "",
-        
-        "diagnostic": sections.get('diagnostic', ''),
-        "symptomes": sections.get('symptomes', ''),
-        "presentation": sections.get('presentation', ''),
-        "mode_action": sections.get('mode', ''),
-        "traitement_info": sections.get('traitement', ''),
-        "precautions_info": sections.get('precautions', ''),
-        "composants_info": sections.get('composants_text', ''),
-        "resume_traitement": sections.get('resume', '')
-    }
-    
-    return result
+def generate_explanation(symptoms: str, prompt_inputs):
+    explanation = chain.run(symptoms=symptoms, **prompt_inputs)
+    return explanation, extract_sections_from_explanation(explanation)
+
+async def generate_explanation_async(symptoms: str, prompt_inputs):
+    explanation = await chain.arun(symptoms=symptoms, **prompt_inputs)
+    return explanation, extract_sections_from_explanation(explanation)
+
+def stream_explanation(symptoms: str, prompt_inputs):
+    """Explication token par token (ChatOpenAI en streaming)"""
+    if llm_stream is None:
+        raise ValueError("Modèle OpenAI non initialisé")
+    for chunk in llm_stream.stream(prompt.format(symptoms=symptoms, **prompt_inputs)):
+        yield chunk.content
+
+def get_recommendation(symptoms: str, df, csv_path="data/baseplante.csv", attempt_count=1, vs=None, profile_mask=0):
+    """Recommandation avec ce backend (recommendation.get_recommendation)"""
+    return recommendation.get_recommendation(sys.modules[__name__], symptoms, df, csv_path, attempt_count, vs, profile_mask)
+
+async def get_recommendation_async(symptoms: str, df, csv_path="data/baseplante.csv", attempt_count=1, vs=None, profile_mask=0):
+    """Variante asynchrone pour /recommend (recommendation.get_recommendation_async)"""
+    return await recommendation.get_recommendation_async(
+        sys.modules[__name__], symptoms, df, csv_path, attempt_count, vs, profile_mask
+    )
 
-def generate_chat_response(prompt: str):
-    """
-    Génère une réponse pour les discussions générales sur la phytothérapie africaine
-    """
-    chat_template = """
+CHAT_TEMPLATE = """
     Tu es un expert en phytothérapie africaine avec une approche très humaine et pédagogique.
     Réponds à la question suivante de manière concise, informative et bienveillante, en privilégiant
     toujours la sécurité du patient et l'exactitude des informations. Si la question concerne un traitement spécifique ou des symptômes particuliers, suggère poliment de passer en mode Consultation pour obtenir une recommandation plus détaillée et personnalisée.
@@ -581,7 +374,20 @@ def generate_chat_response(prompt: str):
     
     Réponds en français avec un ton chaleureux et professionnel. Maximum 200 mots.
     """
-    
+
+def chat_embeddings():
+    """Modèle d'embeddings du cache sémantique du chat"""
+    return emb
+
+def stream_chat_response(prompt: str):
+    """Réponse du mode discussion token par token; lève une exception si le modèle est indisponible"""
+    if llm_chat_stream is None:
+        raise ValueError("Modèle OpenAI non initialisé")
+    for chunk in llm_chat_stream.stream(CHAT_TEMPLATE.format(question=prompt)):
+        yield chunk.content
+
+def fallback_chat_response(prompt: str):
+    """Réponse prédéfinie du mode discussion quand le modèle est indisponible (jamais mise en cache)"""
     fallback_responses = {
         "bonjour": "Bonjour ! Je suis là pour vous accompagner dans vos questions sur la phytothérapie africaine. Comment puis-je vous aider aujourd'hui ?",
         "salut": "Salut ! Comment allez-vous ? Je suis disponible pour répondre à vos questions sur les plantes médicinales africaines.",
@@ -591,17 +397,42 @@ def generate_chat_response(prompt: str):
         "default": "C'est une excellente question sur la phytothérapie africaine ! Pour des conseils spécifiques adaptés à vos besoins, je vous encourage à utiliser le mode Consultation. Sinon, n'hésitez pas à me poser d'autres questions générales."
     }
     
-    try:
+    for concept_id in synonyms.get_matcher().concepts_in(prompt, kinds={"intent"}):
+        if concept_id in fallback_responses:
+            return fallback_responses[concept_id]
+    
+    return fallback_responses["default"]
+
+def generate_chat_response(prompt: str, plant_words=frozenset()):
+    """
+    Génère une réponse pour les discussions générales sur la phytothérapie africaine
+    """
+    def ask_model():
         if llm_chat is None:
             raise ValueError("Modèle OpenAI non initialisé")
-        
-        response = llm_chat.predict(chat_template.format(question=prompt))
-        return response.strip()
+        return llm_chat.predict(CHAT_TEMPLATE.format(question=prompt)).strip()
+    
+    try:
+        # Question déjà posée, éventuellement reformulée: réponse reprise du cache sémantique
+        return semantic_cache.cached_answer(prompt, emb, ask_model, threshold=CHAT_CACHE_THRESHOLD, plant_words=plant_words)
         
     except Exception:
-        prompt_lower = prompt.lower()
-        for keyword, response in fallback_responses.items():
-            if keyword in prompt_lower:
-                return response
+        return fallback_chat_response(prompt)
+
+async def generate_chat_response_async(prompt: str, plant_words=frozenset()):
+    """Variante asynchrone de generate_chat_response: l'appel à OpenAI ne bloque pas la boucle d'événements"""
+    async def ask_model():
+        if llm_chat is None:
+            raise ValueError("Modèle OpenAI non initialisé")
+        return (await llm_chat.apredict(CHAT_TEMPLATE.format(question=prompt))).strip()
+    
+    try:
+        # Question déjà posée, éventuellement reformulée: réponse reprise du cache sémantique
+        return await semantic_cache.cached_answer_async(prompt, emb, ask_model, threshold=CHAT_CACHE_THRESHOLD, plant_words=plant_words)
         
-        return fallback_responses["default"]
+    except Exception:
+        return fallback_chat_response(prompt)
+
+def warm_up(df, csv_path):
+    """Pré-charge l'index vectoriel et le chemin de recommandation (recommendation.warm_up)"""
+    return recommendation.warm_up(sys.modules[__name__], df, csv_path)
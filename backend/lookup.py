@@ -0,0 +1,186 @@
+"""
+Index secondaires de la base des recettes, construits une fois par génération du jeu de données.
+
+    plante            -> lignes des recettes, parties utilisées, composés, noms locaux
+    composé chimique  -> plantes qui le contiennent
+    partie de plante  -> lignes des recettes ("Leaves", "Root", ...)
+    nom local         -> noms scientifiques
+
+Les clés sont repliées (minuscules, sans accents, espaces normalisés): une recherche
+exacte est une lecture de dictionnaire, une recherche par préfixe une bisection dans
+la liste triée des clés, sans jamais parcourir le DataFrame.
+"""
+import bisect
+import logging
+
+import numpy as np
+
+import plant_store
+from generation_cache import GenerationCache
+from text_utils import fold_text, tokenize
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_PREFIX_LIMIT = 20
+DEFAULT_RECIPES_LIMIT = 50
+# Mots plus courts ignorés dans name_words ("de", "var", ...)
+MIN_NAME_WORD_LENGTH = 4
+
+
+def lookup_key(text):
+    return " ".join(fold_text(text).split())
+
+
+class PrefixIndex:
+    """Clé repliée -> (libellé d'origine, valeurs), avec recherche par préfixe"""
+
+    def __init__(self):
+        self.entries = {}
+        self.keys = []
+
+    def add(self, label, values):
+        """Ajoute des valeurs (tableau de lignes ou liste de noms) à une clé"""
+        key = lookup_key(label)
+        if key:
+            self.entries.setdefault(key, (label, []))[1].append(values)
+
+    def freeze(self):
+        # Lignes: tableau int32 trié et dédoublonné; noms: liste dédoublonnée (ordre conservé)
+        for key, (label, chunks) in self.entries.items():
+            if chunks and isinstance(chunks[0], np.ndarray):
+                values = np.unique(np.concatenate(chunks)).astype("int32")
+            else:
+                values = list(dict.fromkeys(value for chunk in chunks for value in chunk))
+            self.entries[key] = (label, values)
+        self.keys = sorted(self.entries)
+        return self
+
+    def get(self, label):
+        return self.entries.get(lookup_key(label))
+
+    def prefix(self, prefix, limit=DEFAULT_PREFIX_LIMIT):
+        """[(libellé, valeurs)] des clés commençant par le préfixe, par ordre alphabétique"""
+        key = lookup_key(prefix)
+        results = []
+        for i in range(bisect.bisect_left(self.keys, key), len(self.keys)):
+            if not self.keys[i].startswith(key) or len(results) >= limit:
+                break
+            results.append(self.entries[self.keys[i]])
+        return results
+
+    def __len__(self):
+        return len(self.entries)
+
+
+class PlantLookup:
+    """
+    Index secondaires d'une base compilée (plant_store.PlantStore), construits par cellule
+    distincte: une liste de plantes partagée par mille recettes n'est lue qu'une fois.
+    """
+
+    def __init__(self, store):
+        self.store = store
+        self.plants = PrefixIndex()
+        self.compounds = PrefixIndex()
+        self.parts = PrefixIndex()
+        self.local_names = PrefixIndex()
+
+        columns = store.columns
+        for cell_id, rows in columns["plants"].rows_by_cell():
+            for plant in store.plants_of(cell_id):
+                self.plants.add(plant, rows)
+        for cell_id, rows in columns["parts"].rows_by_cell():
+            for part in store.pairs_of("parts", "part", cell_id).values():
+                self.parts.add(part, rows)
+        for cell_id, _ in columns["components"].rows_by_cell():
+            for plant, compounds in store.components_of(cell_id).items():
+                for compound in compounds:
+                    self.compounds.add(compound, [plant])
+        for cell_id, _ in columns["local_names"].rows_by_cell():
+            for plant, names in store.local_names_of(cell_id).items():
+                for local_name in names:
+                    # "Gangamaa, Gwadda": le libellé complet et chacune de ses variantes
+                    for label in dict.fromkeys([local_name.name] + [n.strip() for n in local_name.name.split(",")]):
+                        self.local_names.add(label, [plant])
+
+        for index in (self.plants, self.compounds, self.parts, self.local_names):
+            index.freeze()
+        # Mots des noms scientifiques et locaux: repérage des plantes citées dans un texte libre
+        self.name_words = frozenset(
+            word for index in (self.plants, self.local_names) for key in index.keys
+            for word in tokenize(key) if len(word) >= MIN_NAME_WORD_LENGTH
+        )
+
+    def _cells(self, column, rows):
+        return np.unique(self.store.columns[column].codes[rows])
+
+    def plant_details(self, name, limit=DEFAULT_RECIPES_LIMIT):
+        """Fiche d'une plante: recettes, parties utilisées, composés, noms locaux, contre-indications"""
+        entry = self.plants.get(name)
+        if entry is None:
+            return None
+        label, rows = entry
+        store = self.store
+        parts, compounds, local_names, contraindications = [], [], {}, []
+        for cell_id in self._cells("parts", rows):
+            part = store.pairs_of("parts", "part", cell_id).get(label)
+            if part and part not in parts:
+                parts.append(part)
+        for cell_id in self._cells("components", rows):
+            for compound in store.components_of(cell_id).get(label, ()):
+                if compound not in compounds:
+                    compounds.append(compound)
+        for cell_id in self._cells("local_names", rows):
+            for local_name in store.local_names_of(cell_id).get(label, ()):
+                local_names.setdefault(local_name.name, local_name)
+        text = store.vocabularies["text"]
+        for text_id in np.unique(store.text_columns["plant_contraindications"][rows]):
+            for item in plant_store.parse_keyed_list(text[text_id]).get(label, []):
+                if item not in contraindications:
+                    contraindications.append(item)
+        return {
+            "name": label,
+            "parts": parts,
+            "compounds": compounds,
+            "local_names": [
+                {"name": n.name, "language": n.language, "countries": list(n.countries)}
+                for n in local_names.values()
+            ],
+            "contraindications": contraindications,
+            "recipe_count": len(rows),
+            "recipes": [self.recipe_summary(row) for row in rows[:limit]],
+        }
+
+    def recipe_summary(self, row):
+        record = self.store[row]
+        return {
+            "row": record.row,
+            "pathology": record.pathology,
+            "plants": list(record.plants),
+            "preparation": record.preparation,
+            "dosage": record.dosage,
+            "contre_indications": record.contre_indications,
+        }
+
+    def describe(self):
+        return {
+            "plants": len(self.plants),
+            "compounds": len(self.compounds),
+            "parts": len(self.parts),
+            "local_names": len(self.local_names),
+        }
+
+
+def _build_lookup(df):
+    plant_lookup = PlantLookup(plant_store.get_plant_store(df))
+    logger.info(f"Index secondaires construits: {plant_lookup.describe()}")
+    return plant_lookup
+
+
+# Index des deux dernières générations du jeu de données (double tampon du rechargement)
+_lookups = GenerationCache(_build_lookup)
+
+
+def get_lookup(df):
+    """Retourne les index secondaires de ce DataFrame (construits au premier appel, hors verrou)"""
+    return _lookups.get(df)
@@ -0,0 +1,86 @@
+"""
+Endpoints de consultation en lecture seule (plantes, composés, parties, noms locaux).
+
+Servis directement par les index secondaires de la génération courante (lookup.py),
+sans passer par la recherche ni par le LLM. Les index sont obtenus dans un thread: s'ils
+ne sont pas encore construits, leur construction ne bloque pas la boucle d'événements.
+"""
+import asyncio
+
+from fastapi import APIRouter, HTTPException, Query
+
+import lookup
+from reloader import reloader
+
+router = APIRouter(prefix="/api", tags=["lookup"])
+
+PrefixQuery = Query("", description="préfixe du nom (insensible à la casse et aux accents)")
+LimitQuery = Query(lookup.DEFAULT_PREFIX_LIMIT, ge=1, le=100)
+
+
+async def current_lookup():
+    generation = reloader.current
+    if generation is None:
+        raise HTTPException(status_code=503, detail="Données en cours de chargement, réessayez dans quelques instants")
+    return await asyncio.to_thread(lookup.get_lookup, generation.df)
+
+
+def not_found(kind, name):
+    return HTTPException(status_code=404, detail=f"{kind} introuvable: {name}")
+
+
+@router.get("/plants")
+async def search_plants(prefix: str = PrefixQuery, limit: int = LimitQuery):
+    """Plantes dont le nom commence par le préfixe, avec leur nombre de recettes"""
+    results = (await current_lookup()).plants.prefix(prefix, limit)
+    return {"prefix": prefix, "results": [{"name": name, "recipes": len(rows)} for name, rows in results]}
+
+
+@router.get("/plants/{name}")
+async def get_plant(name: str, limit: int = Query(lookup.DEFAULT_RECIPES_LIMIT, ge=1, le=500)):
+    """Fiche complète d'une plante (recettes, parties, composés, noms locaux)"""
+    details = (await current_lookup()).plant_details(name, limit)
+    if details is None:
+        raise not_found("Plante", name)
+    return details
+
+
+@router.get("/compounds")
+async def search_compounds(prefix: str = PrefixQuery, limit: int = LimitQuery):
+    results = (await current_lookup()).compounds.prefix(prefix, limit)
+    return {"prefix": prefix, "results": [{"name": name, "plants": plants} for name, plants in results]}
+
+
+@router.get("/compounds/{name}")
+async def get_compound(name: str):
+    """Plantes contenant ce composé chimique"""
+    entry = (await current_lookup()).compounds.get(name)
+    if entry is None:
+        raise not_found("Composé", name)
+    return {"name": entry[0], "plants": entry[1]}
+
+
+@router.get("/parts/{part}")
+async def get_part(part: str, limit: int = Query(lookup.DEFAULT_RECIPES_LIMIT, ge=1, le=500)):
+    """Recettes utilisant cette partie de plante"""
+    index = await current_lookup()
+    entry = index.parts.get(part)
+    if entry is None:
+        raise not_found("Partie de plante", part)
+    return {"part": entry[0], "recipe_count": len(entry[1]),
+            "recipes": [index.recipe_summary(row) for row in entry[1][:limit]]}
+
+
+@router.get("/local-names")
+async def search_local_names(prefix: str = PrefixQuery, limit: int = LimitQuery):
+    results = (await current_lookup()).local_names.prefix(prefix, limit)
+    return {"prefix": prefix, "results": [{"name": name, "plants": plants} for name, plants in results]}
+
+
+@router.get("/local-names/{name}")
+async def get_local_name(name: str):
+    """Noms scientifiques des plantes connues sous ce nom local"""
+    entry = (await current_lookup()).local_names.get(name)
+    if entry is None:
+        raise not_found("Nom local", name)
+    return {"name": entry[0], "plants": entry[1]}
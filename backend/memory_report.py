@@ -0,0 +1,131 @@
+#!/usr/bin/env python3
+"""
+Rapport mémoire d'un worker: taille des structures servies par la génération courante.
+
+Chaque composant est mesuré séparément (DataFrame de service, base des recettes encodée,
+index BM25, correction des fautes, index secondaires). L'index vectoriel et son docstore
+sont lus en mmap: leurs pages sont partagées entre workers par le cache système et
+comptées à part. La RSS du processus est séparée en mémoire privée (RssAnon, à
+multiplier par le nombre de workers) et pages de fichiers partagées (RssFile).
+
+Usage: python memory_report.py [--csv data/baseplante.csv]
+    compare le DataFrame complet (objets Python) et la représentation de service
+"""
+import argparse
+import gc
+import time
+import tracemalloc
+
+import dataset
+import lookup
+import plant_store
+import retrieval
+
+MB = 1 << 20
+
+
+def process_memory():
+    """RSS totale, privée et partagée du processus en Mo (Linux), ou {} si indisponible"""
+    fields = {"VmRSS": "rss_mb", "RssAnon": "rss_anon_mb", "RssFile": "rss_file_mb", "VmHWM": "peak_rss_mb"}
+    memory = {}
+    try:
+        with open("/proc/self/status", encoding="ascii") as f:
+            for line in f:
+                name, _, value = line.partition(":")
+                if name in fields:
+                    memory[fields[name]] = round(int(value.split()[0]) / 1024, 1)
+    except OSError:
+        pass
+    return memory
+
+
+def _mb(nbytes):
+    return round(nbytes / MB, 3)
+
+
+def bm25_nbytes(index):
+    return index.doc_lengths.nbytes + sum(rows.nbytes + tf.nbytes for rows, tf in index.postings.values())
+
+
+def fuzzy_nbytes(matcher):
+    if matcher is None:
+        return 0
+    matrix = matcher.matrix
+    return matrix.data.nbytes + matrix.indices.nbytes + matrix.indptr.nbytes + matcher.idf.nbytes
+
+
+def lookup_nbytes(plant_lookup):
+    total = 0
+    for index in (plant_lookup.plants, plant_lookup.compounds, plant_lookup.parts, plant_lookup.local_names):
+        total += sum(values.nbytes if hasattr(values, "nbytes") else 8 * len(values) for _, values in index.entries.values())
+    return total
+
+
+def vector_index_nbytes(vectorstore):
+    """Octets lus en mmap (vecteurs + colonnes du docstore)"""
+    if vectorstore is None or not hasattr(vectorstore, "docstore"):
+        return 0
+    docstore = vectorstore.docstore
+    columns = (docstore.doc_ids, docstore.row_index, docstore.content_hashes, docstore.text_offsets, docstore.text)
+    return vectorstore.index.ntotal * vectorstore.index.d * 4 + sum(column.nbytes for column in columns)
+
+
+def generation_report(df, vectorstore=None):
+    """Tailles (Mo) des structures d'une génération; construit celles qui manquent"""
+    store = plant_store.get_plant_store(df)
+    retriever = retrieval.get_retriever(df)
+    store_sizes = store.nbytes()
+    return {
+        "rows": len(df),
+        "private_mb": {
+            "dataframe": _mb(df.memory_usage(deep=True).sum()),
+            "plant_store": _mb(sum(store_sizes.values())),
+            "bm25": _mb(bm25_nbytes(retriever.bm25)),
+            "fuzzy": _mb(fuzzy_nbytes(retriever.fuzzy)),
+            "lookup": _mb(lookup_nbytes(lookup.get_lookup(df))),
+        },
+        "shared_mb": {"vector_index": _mb(vector_index_nbytes(vectorstore))},
+        "plant_store_mb": {name: _mb(size) for name, size in sorted(store_sizes.items(), key=lambda item: -item[1])[:8]},
+        "process": process_memory(),
+    }
+
+
+def _traced(build):
+    """(résultat, octets alloués et toujours vivants, secondes) d'une construction"""
+    gc.collect()
+    tracemalloc.start()
+    start_time = time.time()
+    result = build()
+    elapsed = time.time() - start_time
+    gc.collect()
+    allocated = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return result, allocated, elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--csv", default=dataset.DEFAULT_CSV_PATH)
+    args = parser.parse_args()
+
+    start_time = time.time()
+    full = dataset.read_csv(args.csv)
+    load_time = time.time() - start_time
+    # Les chaînes peuvent vivre dans des tampons Arrow, invisibles pour tracemalloc
+    full_bytes = full.memory_usage(deep=True).sum()
+    compact, compact_bytes, compact_time = _traced(lambda: dataset.compact_for_serving(full))
+    store_bytes = sum(plant_store.get_plant_store(compact).nbytes().values())
+    print(f"{len(full)} lignes, {len(full.columns)} colonnes")
+    print(f"  DataFrame complet            {full_bytes / MB:9.1f} Mo  (lecture {load_time:.1f}s)")
+    print(f"  Représentation de service    {compact_bytes / MB:9.1f} Mo  (compilation {compact_time:.1f}s)")
+    print(f"    dont base encodée          {store_bytes / MB:9.1f} Mo")
+    print(f"    dont DataFrame réduit      {compact.memory_usage(deep=True).sum() / MB:9.1f} Mo")
+    del full
+    report = generation_report(compact)
+    for name, size in report["private_mb"].items():
+        print(f"  {name:<28} {size:9.1f} Mo")
+    print(f"  processus: {report['process']}")
+
+
+if __name__ == "__main__":
+    main()
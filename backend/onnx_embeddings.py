@@ -0,0 +1,117 @@
+"""
+Runtime ONNX (quantifié int8) pour le modèle d'embeddings all-MiniLM-L6-v2.
+
+Le modèle est exporté une seule fois en ONNX puis quantifié dynamiquement en int8;
+les exécutions suivantes ne chargent que onnxruntime et le tokenizer Rust, sans PyTorch.
+Les vecteurs produits (mean pooling + normalisation L2) suivent le pipeline
+sentence-transformers du modèle, à la précision int8 près.
+"""
+import inspect
+import logging
+import os
+import time
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+ONNX_MAX_SEQ_LENGTH = 256
+ONNX_BATCH_SIZE = int(os.getenv("ONNX_BATCH_SIZE", "32"))
+
+
+def _export_quantized_model(model_id, export_dir):
+    """Export ONNX + quantification int8 dynamique (nécessite torch et transformers, une seule fois)"""
+    import torch
+    from onnxruntime.quantization import QuantType, quantize_dynamic
+    from transformers import AutoModel, AutoTokenizer
+
+    logger.info(f"Export ONNX de {model_id} (opération unique)...")
+    start_time = time.time()
+    os.makedirs(export_dir, exist_ok=True)
+
+    tokenizer = AutoTokenizer.from_pretrained(model_id)
+    model = AutoModel.from_pretrained(model_id)
+    model.eval()
+    tokenizer.save_pretrained(export_dir)
+
+    class _Encoder(torch.nn.Module):
+        """Signature positionnelle fixe, indépendante de la version de transformers"""
+
+        def __init__(self, model):
+            super().__init__()
+            self.model = model
+
+        def forward(self, input_ids, attention_mask, token_type_ids):
+            return self.model(
+                input_ids=input_ids, attention_mask=attention_mask, token_type_ids=token_type_ids
+            ).last_hidden_state
+
+    sample = tokenizer(["export"], return_tensors="pt")
+    fp32_path = os.path.join(export_dir, "model.onnx")
+    dynamic_axes = {name: {0: "batch", 1: "sequence"} for name in ("input_ids", "attention_mask", "token_type_ids")}
+    dynamic_axes["last_hidden_state"] = {0: "batch", 1: "sequence"}
+    # Exporteur TorchScript (les versions récentes de torch utilisent dynamo par défaut)
+    export_kwargs = {"dynamo": False} if "dynamo" in inspect.signature(torch.onnx.export).parameters else {}
+    with torch.no_grad():
+        torch.onnx.export(
+            _Encoder(model),
+            (sample["input_ids"], sample["attention_mask"], sample["token_type_ids"]),
+            fp32_path,
+            input_names=["input_ids", "attention_mask", "token_type_ids"],
+            output_names=["last_hidden_state"],
+            dynamic_axes=dynamic_axes,
+            opset_version=14,
+            **export_kwargs
+        )
+
+    int8_path = os.path.join(export_dir, "model-int8.onnx")
+    quantize_dynamic(fp32_path, int8_path, weight_type=QuantType.QInt8)
+    os.remove(fp32_path)
+    logger.info(f"Modèle ONNX int8 exporté en {time.time() - start_time:.2f}s: {int8_path}")
+    return int8_path
+
+
+class OnnxEmbeddings:
+    """Embeddings sentence-transformers servis par onnxruntime (interface LangChain)"""
+
+    def __init__(self, model_id, cache_dir):
+        import onnxruntime as ort
+        from tokenizers import Tokenizer
+
+        export_dir = os.path.join(cache_dir, "onnx", model_id.replace("/", "__"))
+        model_path = os.path.join(export_dir, "model-int8.onnx")
+        if not os.path.exists(model_path):
+            model_path = _export_quantized_model(model_id, export_dir)
+
+        self.tokenizer = Tokenizer.from_file(os.path.join(export_dir, "tokenizer.json"))
+        self.tokenizer.enable_truncation(max_length=ONNX_MAX_SEQ_LENGTH)
+        self.tokenizer.enable_padding()
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        options.intra_op_num_threads = int(os.getenv("ONNX_THREADS", "0"))
+        self.session = ort.InferenceSession(model_path, options, providers=["CPUExecutionProvider"])
+        self.input_names = {i.name for i in self.session.get_inputs()}
+
+    def _embed_batch(self, texts):
+        encodings = self.tokenizer.encode_batch(texts)
+        input_ids = np.array([e.ids for e in encodings], dtype="int64")
+        attention_mask = np.array([e.attention_mask for e in encodings], dtype="int64")
+        feeds = {"input_ids": input_ids, "attention_mask": attention_mask}
+        if "token_type_ids" in self.input_names:
+            feeds["token_type_ids"] = np.array([e.type_ids for e in encodings], dtype="int64")
+
+        hidden = self.session.run(None, feeds)[0]
+        mask = attention_mask[..., None].astype("float32")
+        pooled = (hidden * mask).sum(axis=1) / np.clip(mask.sum(axis=1), 1e-9, None)
+        pooled /= np.clip(np.linalg.norm(pooled, axis=1, keepdims=True), 1e-12, None)
+        return pooled
+
+    def embed_documents(self, texts):
+        vectors = []
+        for start in range(0, len(texts), ONNX_BATCH_SIZE):
+            vectors.extend(self._embed_batch(list(texts[start:start + ONNX_BATCH_SIZE])).tolist())
+        return vectors
+
+    def embed_query(self, text):
+        return self._embed_batch([text])[0].tolist()
@@ -0,0 +1,406 @@
+"""
+Base des recettes compilée une seule fois à partir de baseplante.csv, en colonnes encodées.
+
+Les champs multi-valués ("Plante : valeur; Plante : valeur") ne sont analysés qu'une fois
+par valeur distincte de cellule, puis stockés sous forme d'entiers:
+    - vocabulaires internés: plantes, parties, quantités, composés, noms locaux, langues,
+      pays et textes libres (pathologie, préparation, ...)
+    - chaque colonne est encodée par dictionnaire: un code int32 par ligne renvoie vers la
+      table de ses cellules distinctes, et une cellule est une liste d'identifiants (CSR)
+Une cellule répétée (même liste de plantes, mêmes noms locaux) n'est stockée qu'une fois.
+store[ligne] renvoie une vue (PlantRecord) qui décode la ligne à la demande et formate
+les textes renvoyés au frontend.
+
+Les noms locaux sont reliés par clés et non par position:
+    plante_nomlocal        "Plante : nom local"
+    nomlocal_danslalangue  "nom local : langue"
+    danslalangue_dupays    "langue : pays"
+"""
+import logging
+import math
+import sys
+import weakref
+from collections import defaultdict
+
+import numpy as np
+import pandas as pd
+
+import contraindications
+from generation_cache import GenerationCache
+
+logger = logging.getLogger(__name__)
+
+MAX_PLANTS_WITH_LOCAL_NAMES = 3
+MAX_LOCAL_NAMES_PER_PLANT = 5
+
+NO_COMPONENTS_TEXT = "Composants chimiques spécifiques non disponibles actuellement"
+NO_LOCAL_NAMES_TEXT = "Noms locaux non disponibles dans les données actuelles"
+UNKNOWN_PLANT = "Plante inconnue"
+
+# Colonnes texte: colonne du CSV et valeur affichée pour une cellule vide (PlantRecord)
+TEXT_COLUMNS = {
+    "pathology": ("maladiesoigneeparrecette", "Non spécifié"),
+    "preparation": ("recette", "Préparation non spécifiée"),
+    "dosage": ("plante_quantite_recette", "Dosage non spécifié"),
+    "parts_text": ("plante_partie_recette", "Partie non spécifiée"),
+    "recipe_contraindications": ("recette_contreindication", ""),
+    "plant_contraindications": ("plante_contreindication", ""),
+}
+LOCAL_NAME_COLUMNS = ("plante_nomlocal", "nomlocal_danslalangue", "danslalangue_dupays")
+
+
+def _clean(value):
+    """Valeur texte du CSV, "" pour les cellules vides ou NaN"""
+    if value is None or (isinstance(value, float) and math.isnan(value)):
+        return ""
+    return str(value).strip()
+
+
+def _is_null(value):
+    return not value or "NULL" in value.upper()
+
+
+def _split(value, sep=";"):
+    return [part.strip() for part in _clean(value).split(sep) if part.strip()]
+
+
+def drop_null_items(value):
+    """'A : NULL; B : pregnancy' -> 'B : pregnancy': seuls les éléments NULL sont retirés, les autres restent tels quels"""
+    return "; ".join(part for part in _split(value) if not _is_null(part.split(":", 1)[-1].strip()))
+
+
+def parse_keyed_list(value):
+    """'A : x; A : y; B : z' -> {"A": ["x", "y"], "B": ["z"]} (ordre conservé, valeurs NULL ignorées)"""
+    parsed = defaultdict(list)
+    for part in _split(value):
+        if ":" not in part:
+            continue
+        key, item = part.split(":", 1)
+        key, item = key.strip(), item.strip()
+        if key and not _is_null(item) and item not in parsed[key]:
+            parsed[key].append(item)
+    return dict(parsed)
+
+
+class Vocabulary:
+    """Valeurs distinctes (chaînes internées ou tuples) <-> identifiants entiers"""
+
+    def __init__(self):
+        self.values = []
+        self._ids = {}
+
+    def encode(self, value):
+        value_id = self._ids.get(value)
+        if value_id is None:
+            value_id = self._ids[value] = len(self.values)
+            self.values.append(sys.intern(value) if isinstance(value, str) else value)
+        return value_id
+
+    def freeze(self):
+        # La table inverse ne sert qu'à la construction
+        self._ids = None
+        return self
+
+    def __getitem__(self, value_id):
+        return self.values[value_id]
+
+    def __len__(self):
+        return len(self.values)
+
+    def nbytes(self):
+        return sys.getsizeof(self.values) + sum(sys.getsizeof(value) for value in self.values)
+
+
+class EncodedColumn:
+    """
+    Colonne encodée par dictionnaire: codes[ligne] -> cellule distincte, et chaque cellule
+    est une liste de tuples d'identifiants stockée à plat: values[offsets[c]:offsets[c + 1]]
+    """
+
+    def __init__(self, codes, offsets, values):
+        self.codes = codes
+        self.offsets = offsets
+        self.values = values
+
+    @classmethod
+    def build(cls, codes, cells, width):
+        """codes: int par ligne; cells: listes de tuples (width entiers) par cellule distincte"""
+        offsets = np.zeros(len(cells) + 1, dtype="int32")
+        offsets[1:] = np.cumsum([len(cell) for cell in cells])
+        values = np.asarray([item for cell in cells for item in cell], dtype="int32").reshape(-1, width)
+        return cls(np.asarray(codes, dtype="int32"), offsets, values)
+
+    def cell(self, cell_id):
+        return self.values[self.offsets[cell_id]:self.offsets[cell_id + 1]]
+
+    def row(self, row):
+        return self.cell(self.codes[row])
+
+    def rows_by_cell(self):
+        """Génère (cellule, lignes qui la contiennent)"""
+        order = np.argsort(self.codes, kind="stable")
+        cells, starts = np.unique(self.codes[order], return_index=True)
+        for cell_id, rows in zip(cells, np.split(order, starts[1:])):
+            yield int(cell_id), rows.astype("int32")
+
+    def nbytes(self):
+        return self.codes.nbytes + self.offsets.nbytes + self.values.nbytes
+
+
+def _factorize(df, columns):
+    """Codes par ligne et valeurs distinctes (tuples) d'une ou plusieurs colonnes"""
+    series = [df[column].fillna("") if column in df else pd.Series([""] * len(df)) for column in columns]
+    if len(series) == 1:
+        codes, uniques = pd.factorize(series[0])
+        return codes, [(value,) for value in uniques]
+    codes, uniques = pd.factorize(pd.Series(list(zip(*series)), dtype=object))
+    return codes, list(uniques)
+
+
+class LocalName:
+    """Nom local d'une plante, avec sa langue et les pays où elle est parlée"""
+    __slots__ = ("name", "language", "countries")
+
+    def __init__(self, name, language="", countries=()):
+        self.name = name
+        self.language = language
+        self.countries = countries
+
+    def label(self):
+        if self.language and self.countries:
+            return f"{self.name} ({self.language}, {', '.join(self.countries)})"
+        if self.language:
+            return f"{self.name} ({self.language})"
+        return self.name
+
+    def __repr__(self):
+        return f"LocalName({self.label()!r})"
+
+
+class PlantRecord:
+    """Vue d'une recette de la base: les champs sont décodés à la demande"""
+    __slots__ = ("store", "row")
+
+    def __init__(self, store, row):
+        self.store = store
+        self.row = row
+
+    def _text(self, name):
+        return self.raw_text(name) or TEXT_COLUMNS[name][1]
+
+    def raw_text(self, name):
+        """Texte de la cellule tel que dans le CSV, sans valeur par défaut ("" si vide)"""
+        return self.store.vocabularies["text"][self.store.text_columns[name][self.row]]
+
+    @property
+    def pathology(self):
+        return self._text("pathology")
+
+    @property
+    def preparation(self):
+        return self._text("preparation")
+
+    @property
+    def dosage(self):
+        return self._text("dosage")
+
+    @property
+    def parts_text(self):
+        return self._text("parts_text")
+
+    @property
+    def recipe_contraindications(self):
+        return self._text("recipe_contraindications")
+
+    @property
+    def plant_contraindications(self):
+        return self._text("plant_contraindications")
+
+    @property
+    def plants(self):
+        return self.store.plants_of(self.store.columns["plants"].codes[self.row])
+
+    @property
+    def main_plant(self):
+        plants = self.plants
+        return plants[0] if plants else UNKNOWN_PLANT
+
+    @property
+    def parts(self):
+        return self.store.pairs_of("parts", "part", self.store.columns["parts"].codes[self.row])
+
+    @property
+    def quantities(self):
+        return self.store.pairs_of("quantities", "quantity", self.store.columns["quantities"].codes[self.row])
+
+    @property
+    def components(self):
+        return self.store.components_of(self.store.columns["components"].codes[self.row])
+
+    @property
+    def local_names(self):
+        return self.store.local_names_of(self.store.columns["local_names"].codes[self.row])
+
+    # Textes formatés pour la réponse
+    @property
+    def contre_indications(self):
+        return self.recipe_contraindications or self.plant_contraindications or "Aucune contre-indication spécifiée"
+
+    @property
+    def composants(self):
+        lines = [f"{plant}: {', '.join(items)}" for plant, items in self.components.items() if items]
+        return "\n".join(lines) if lines else NO_COMPONENTS_TEXT
+
+    @property
+    def nom_local(self):
+        # Les plantes les mieux documentées d'abord
+        ranked = sorted(self.local_names.items(), key=lambda item: len(item[1]), reverse=True)
+        infos = []
+        for plant, names in ranked[:MAX_PLANTS_WITH_LOCAL_NAMES]:
+            labels = ", ".join(name.label() for name in names[:MAX_LOCAL_NAMES_PER_PLANT])
+            infos.append(f"{plant} est connue sous le nom de: {labels}")
+        return "Noms locaux: " + ". ".join(infos) if infos else NO_LOCAL_NAMES_TEXT
+
+    def __repr__(self):
+        return f"PlantRecord(row={self.row}, plant={self.main_plant!r}, pathology={self.pathology!r})"
+
+
+class PlantStore:
+    """Recettes encodées en colonnes, indexées par ligne du CSV (même ordre que le DataFrame)"""
+
+    def __init__(self, size, vocabularies, text_columns, columns, contraindication_flags=None):
+        self.size = size
+        self.vocabularies = vocabularies
+        self.text_columns = text_columns
+        self.columns = columns
+        # Masque uint64 des contre-indications (recette et plantes) de chaque ligne
+        if contraindication_flags is None:
+            contraindication_flags = np.zeros(size, dtype="uint64")
+        self.contraindication_flags = contraindication_flags
+
+    @classmethod
+    def from_dataframe(cls, df):
+        vocab = {name: Vocabulary() for name in
+                 ("text", "plant", "part", "quantity", "compound", "local_name", "language", "country", "country_set")}
+
+        text_columns = {}
+        for name, (column, _) in TEXT_COLUMNS.items():
+            codes, uniques = _factorize(df, [column])
+            ids = []
+            for (value,) in uniques:
+                text = _clean(value)
+                if name == "plant_contraindications":
+                    # Cellule par plante: une plante sans contre-indication (NULL) n'efface pas celles des autres
+                    text = drop_null_items(text)
+                ids.append(vocab["text"].encode(text))
+            text_columns[name] = np.asarray(ids, dtype="int32")[codes] if len(df) else np.zeros(0, dtype="int32")
+
+        def keyed_pairs(value, value_vocab, first_only=False):
+            return [
+                (vocab["plant"].encode(plant), vocab[value_vocab].encode(item))
+                for plant, items in parse_keyed_list(value).items()
+                for item in (items[:1] if first_only else items)
+            ]
+
+        def local_name_entries(names, languages, countries):
+            languages_by_name = parse_keyed_list(languages)
+            countries_by_language = parse_keyed_list(countries)
+            entries = []
+            for plant, local_names in parse_keyed_list(names).items():
+                for name in local_names:
+                    language = next(iter(languages_by_name.get(name, [])), "")
+                    country_set = tuple(vocab["country"].encode(c) for c in countries_by_language.get(language, ()))
+                    entries.append((vocab["plant"].encode(plant), vocab["local_name"].encode(name),
+                                    vocab["language"].encode(language), vocab["country_set"].encode(country_set)))
+            return entries
+
+        specs = {
+            "plants": (["plante_recette"], 1, lambda v: [(vocab["plant"].encode(p),) for p in _split(v)]),
+            "parts": (["plante_partie_recette"], 2, lambda v: keyed_pairs(v, "part", first_only=True)),
+            "quantities": (["plante_quantite_recette"], 2, lambda v: keyed_pairs(v, "quantity", first_only=True)),
+            "components": (["plante_composantechimique"], 2, lambda v: keyed_pairs(v, "compound")),
+            "local_names": (list(LOCAL_NAME_COLUMNS), 4, local_name_entries),
+        }
+        columns = {}
+        for name, (source_columns, width, parse_cell) in specs.items():
+            codes, uniques = _factorize(df, source_columns)
+            columns[name] = EncodedColumn.build(codes, [parse_cell(*values) for values in uniques], width)
+
+        flags = (contraindications.row_masks(text_columns["recipe_contraindications"], vocab["text"])
+                 | contraindications.row_masks(text_columns["plant_contraindications"], vocab["text"]))
+
+        for vocabulary in vocab.values():
+            vocabulary.freeze()
+        return cls(len(df), vocab, text_columns, columns, flags)
+
+    def __len__(self):
+        return self.size
+
+    def __getitem__(self, row):
+        if not -self.size <= row < self.size:
+            raise IndexError(row)
+        return PlantRecord(self, int(row) % self.size)
+
+    @property
+    def records(self):
+        return [self[row] for row in range(self.size)]
+
+    # Décodage d'une cellule distincte (partagé par toutes les lignes qui la contiennent)
+    def plants_of(self, cell_id):
+        names = self.vocabularies["plant"]
+        return tuple(names[plant_id] for (plant_id,) in self.columns["plants"].cell(cell_id))
+
+    def pairs_of(self, column, value_vocab, cell_id):
+        plants, values = self.vocabularies["plant"], self.vocabularies[value_vocab]
+        return {plants[plant_id]: values[value_id] for plant_id, value_id in self.columns[column].cell(cell_id)}
+
+    def components_of(self, cell_id):
+        plants, compounds = self.vocabularies["plant"], self.vocabularies["compound"]
+        components = defaultdict(list)
+        for plant_id, compound_id in self.columns["components"].cell(cell_id):
+            components[plants[plant_id]].append(compounds[compound_id])
+        return {plant: tuple(items) for plant, items in components.items()}
+
+    def local_names_of(self, cell_id):
+        v = self.vocabularies
+        local_names = defaultdict(list)
+        for plant_id, name_id, language_id, country_set_id in self.columns["local_names"].cell(cell_id):
+            countries = tuple(v["country"][country_id] for country_id in v["country_set"][country_set_id])
+            local_names[v["plant"][plant_id]].append(LocalName(v["local_name"][name_id], v["language"][language_id], countries))
+        return {plant: tuple(names) for plant, names in local_names.items()}
+
+    def nbytes(self):
+        """Taille des vocabulaires et des colonnes encodées, en octets"""
+        sizes = {f"vocabulary.{name}": vocabulary.nbytes() for name, vocabulary in self.vocabularies.items()}
+        sizes.update({f"text.{name}": codes.nbytes for name, codes in self.text_columns.items()})
+        sizes.update({f"column.{name}": column.nbytes() for name, column in self.columns.items()})
+        sizes["contraindication_flags"] = self.contraindication_flags.nbytes
+        return sizes
+
+
+def _build_store(df):
+    store = PlantStore.from_dataframe(df)
+    logger.info(f"Base des recettes compilée: {len(store)} enregistrements")
+    return store
+
+
+# Bases des deux dernières générations du jeu de données (double tampon du rechargement)
+_stores = GenerationCache(_build_store)
+
+# Bases rattachées à un DataFrame réduit (dataset.compact_for_serving): elles ne peuvent pas
+# être recompilées à partir de ce DataFrame et vivent donc aussi longtemps que lui
+_attached = {}
+
+
+def attach(df, store):
+    key = id(df)
+    _attached[key] = (weakref.ref(df), store)
+    weakref.finalize(df, _attached.pop, key, None)
+
+
+def get_plant_store(df):
+    """Retourne la base compilée pour ce DataFrame (compilée au premier appel, hors verrou)"""
+    attached = _attached.get(id(df))
+    if attached is not None and attached[0]() is df:
+        return attached[1]
+    return _stores.get(df)
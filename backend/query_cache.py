@@ -0,0 +1,90 @@
+"""
+Caches en mémoire (LRU + TTL) des vecteurs de requête et des résultats top-k.
+
+Les clés sont construites sur la forme normalisée des symptômes (sans accents ni
+formules du type "j'ai"), de sorte que "J'ai le paludisme" et "le paludisme"
+partagent la même entrée. Le vecteur est lui aussi calculé sur cette forme normalisée
+(vector_index), pour que l'entrée ne dépende pas de l'écriture arrivée en premier.
+"""
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from text_utils import normalize_symptoms
+
+QUERY_CACHE_SIZE = int(os.getenv("QUERY_CACHE_SIZE", "2048"))
+QUERY_CACHE_TTL = float(os.getenv("QUERY_CACHE_TTL", "3600"))
+
+
+class LRUCache:
+    """Cache LRU borné avec expiration (TTL), sûr entre threads"""
+
+    def __init__(self, maxsize=QUERY_CACHE_SIZE, ttl=QUERY_CACHE_TTL):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            value, expires_at = entry
+            if expires_at < time.monotonic():
+                del self._data[key]
+                self.expirations += 1
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key, value):
+        with self._lock:
+            self._data[key] = (value, time.monotonic() + self.ttl)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def stats(self):
+        with self._lock:
+            size = len(self._data)
+        total = self.hits + self.misses
+        return {
+            "size": size,
+            "maxsize": self.maxsize,
+            "ttl": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / total, 4) if total else 0.0,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+        }
+
+
+query_vectors = LRUCache()
+query_results = LRUCache()
+
+
+def query_key(symptoms):
+    """Clé de cache d'une requête: forme normalisée, ou texte brut si elle est vide"""
+    return normalize_symptoms(symptoms) or (symptoms or "").strip()
+
+
+def stats():
+    return {
+        "vectors": query_vectors.stats(),
+        "results": query_results.stats(),
+    }
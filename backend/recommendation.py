@@ -0,0 +1,284 @@
+"""
+Recommandation d'une recette pour /recommend et /recommend/stream, commune aux deux backends LLM.
+
+Recherche hybride (filtrée par le profil patient), champs de la recette tirés de la base
+compilée, image Unsplash, explication (cache des explications, sinon génération, sinon
+sections de secours) et assemblage de la réponse. Chaque fonction reçoit le module du
+backend (langchain_chains ou langchain_chains_openai), qui ne garde que le câblage de son
+modèle:
+    - vectorstore, load_or_build_vectorstore, SIMILARITY_RANGE: index vectoriel et plage
+      de similarité utile de ses embeddings
+    - fetch_image, fetch_image_async: recherche d'image
+    - generate_explanation, generate_explanation_async, create_fallback_sections:
+      explication générée par son LLM, ou sections de secours
+    - BACKEND_NAME, LLM_MODEL_ID, template: clé du cache des explications
+Le pré-chargement au démarrage (warm_up) parcourt le même chemin.
+"""
+import asyncio
+import logging
+import time
+
+import contraindications
+import explanation_cache
+import lookup
+import plant_store
+import retrieval
+import suggest
+
+logger = logging.getLogger(__name__)
+
+# Clés des sections de l'extracteur (extract_sections_from_explanation) -> champs de la réponse de /recommend
+SECTION_FIELDS = {
+    "diagnostic": "diagnostic",
+    "symptomes": "symptomes",
+    "presentation": "presentation",
+    "mode": "mode_action",
+    "traitement": "traitement_info",
+    "precautions": "precautions_info",
+    "composants_text": "composants_info",
+    "resume": "resume_traitement",
+}
+
+
+def section_fields(sections):
+    return {field: sections.get(key, "") for key, field in SECTION_FIELDS.items()}
+
+
+def current_vectorstore(backend, df, csv_path):
+    """Index global du backend, chargé ou construit au premier appel (remplacé par reloader et warm_up)"""
+    if getattr(backend, "vectorstore", None) is None:
+        backend.vectorstore = backend.load_or_build_vectorstore(df, csv_path)
+    return backend.vectorstore
+
+
+def find_recipe(backend, symptoms: str, df, csv_path="data/baseplante.csv", attempt_count=1, vs=None, profile_mask=0):
+    """
+    Recherche de la recette: (hits, None), ou (None, réponse) quand aucune recette n'est proposable
+    (demande de précisions, consultation recommandée, recettes contre-indiquées pour le patient).
+    """
+    if vs is None:
+        vs = current_vectorstore(backend, df, csv_path)
+    
+    # Recherche hybride en une passe: BM25 sur pathologie/plante/recette + similarité vectorielle (RRF)
+    retriever = retrieval.get_retriever(df)
+    hits = retriever.search(
+        symptoms, vectorstore=vs, k=3, similarity_range=backend.SIMILARITY_RANGE, profile_mask=profile_mask
+    )
+    # Les correspondances trop faibles reçoivent directement la réponse de précision, sans LLM ni Unsplash
+    hits = [hit for hit in hits if hit.confidence >= retrieval.MIN_CONFIDENCE]
+    
+    if not hits and profile_mask:
+        # Des recettes correspondent mais toutes sont contre-indiquées: orienter vers un professionnel
+        unfiltered = retriever.search(symptoms, vectorstore=vs, k=1, similarity_range=backend.SIMILARITY_RANGE)
+        if any(hit.confidence >= retrieval.MIN_CONFIDENCE for hit in unfiltered):
+            return None, contraindications.profile_excluded_response(profile_mask)
+    
+    if not hits:
+        # Gestion intelligente des cas sans correspondance avec système de 2 tentatives basé sur attempt_count
+        if attempt_count == 1:
+            # Première tentative - demander plus de détails gentiment
+            return None, {
+                "plant": "Demande de précisions",
+                "explanation": """Je n'ai pas pu identifier une pathologie spécifique correspondant à vos symptômes dans notre base de données actuelle.
+
+Pourriez-vous m'aider en me donnant plus de détails sur ce que vous ressentez ? Par exemple :
+• Depuis quand avez-vous ces symptômes ?
+• À quel moment de la journée sont-ils plus intenses ?
+• Y a-t-il d'autres signes qui les accompagnent ?
+• Avez-vous des douleurs particulières ou des zones précises touchées ?
+
+Ces informations supplémentaires m'aideront à mieux vous orienter vers un traitement adapté.""",
+                "dosage": "Informations supplémentaires requises",
+                "prep": "Informations supplémentaires requises", 
+                "image_url": "",
+                "contre_indications": "Veuillez fournir plus de détails sur vos symptômes",
+                "partie_utilisee": "Informations supplémentaires requises",
+                "composants": "Informations supplémentaires requises",
+                "nom_local": "",
+                "needs_more_details": True  # Indicateur pour le frontend
+            }
+        else:
+            # Deuxième tentative ou plus - orienter vers un professionnel
+            return None, {
+                "plant": "Consultation recommandée",
+                "explanation": """Malgré les détails supplémentaires que vous avez fournis, notre base de données actuelle ne nous permet pas de vous proposer une recommandation de traitement spécifique pour vos symptômes.
+
+Dans ce cas, je vous recommande vivement de :
+
+**🌿 Consulter un thérapeute en phytothérapie :**
+Vous pouvez trouver des contacts qualifiés sur notre page d'accueil grâce à la fonctionnalité « Contacter un thérapeute ».
+
+**🩺 Consulter un médecin :**
+Pour obtenir un diagnostic médical précis et un traitement approprié.
+
+Votre santé est précieuse, et il est important d'obtenir l'avis d'un professionnel de santé qualifié lorsque nos ressources actuelles ne suffisent pas à vous orienter correctement.""",
+                "dosage": "Consultation professionnelle requise",
+                "prep": "Consultation professionnelle requise",
+                "image_url": "",
+                "contre_indications": "Consultez un professionnel de santé",
+                "partie_utilisee": "Consultation professionnelle requise", 
+                "composants": "Consultation professionnelle requise",
+                "nom_local": "",
+                "requires_consultation": True  # Indicateur pour le frontend
+            }
+    
+    return hits, None
+
+
+def recipe_context(symptoms: str, df, hits):
+    """
+    Champs de la recette retenue, tirés du CSV sans LLM ("fields", envoyés en premier par /recommend/stream),
+    et variables du prompt d'explication ("prompt_inputs").
+    """
+    # Enregistrement pré-analysé (composants, noms locaux, ... déjà découpés par plante)
+    record = plant_store.get_plant_store(df)[hits[0].row]
+    pathologies = record.pathology
+    
+    if "palud" in symptoms.lower() or "malaria" in symptoms.lower():
+        if not ("palud" in pathologies.lower() or "malaria" in pathologies.lower()):
+            pathologies = "paludisme"
+    
+    return {
+        "pathology": pathologies,
+        "fields": {
+            "plant": record.main_plant,
+            "dosage": record.dosage,
+            "prep": record.preparation,
+            "contre_indications": record.contre_indications,
+            "partie_utilisee": record.parts_text,
+            "composants": record.composants,
+            "nom_local": record.nom_local,
+            "confidence": round(hits[0].confidence, 3),
+            "alternatives": retrieval.describe_hits(df, hits),
+        },
+        "prompt_inputs": {
+            "plant_name": record.main_plant,
+            "pathology": pathologies.strip(),
+            "preparation": record.preparation,
+            "dosage": record.dosage,
+            "parties_utilisees": record.parts_text,
+            "contre_indications_recette": record.recipe_contraindications or "Aucune contre-indication spécifique à la recette mentionnée",
+            "contre_indications_plante": record.plant_contraindications or "Aucune contre-indication spécifique à la plante mentionnée",
+            "composants": record.composants,
+        },
+    }
+
+
+def fallback_explanation(backend, symptoms: str, context):
+    fields = context["fields"]
+    sections = backend.create_fallback_sections(
+        symptoms, fields["plant"], context["pathology"], fields["prep"], fields["dosage"],
+        fields["partie_utilisee"], fields["contre_indications"], fields["composants"]
+    )
+    explanation = f"{sections['diagnostic']}\n\n{sections['symptomes']}\n\n{sections['presentation']}\n\n{sections['mode']}\n\n{sections['traitement']}\n\n{sections['precautions']}\n\n{sections['composants_text']}\n\n{sections['resume']}"
+    return explanation, sections
+
+
+def recommendation_result(context, explanation, sections, image_url):
+    fields = context["fields"]
+    return {
+        "plant": fields["plant"],
+        "dosage": fields["dosage"],
+        "prep": fields["prep"],
+        "image_url": image_url,
+        "explanation": explanation,
+        "contre_indications": fields["contre_indications"],
+        "partie_utilisee": fields["partie_utilisee"],
+        "composants": fields["composants"],
+        "nom_local": fields["nom_local"],
+        
+        **section_fields(sections),
+        
+        "confidence": fields["confidence"],
+        "alternatives": fields["alternatives"]
+    }
+
+
+def get_recommendation(backend, symptoms: str, df, csv_path="data/baseplante.csv", attempt_count=1, vs=None, profile_mask=0):
+    """
+    vs: index vectoriel construit à partir de df (génération courante du rechargement à chaud).
+    À défaut, l'index global du backend est utilisé (chargé ou construit au premier appel).
+    profile_mask: contre-indications du patient (contraindications.py), recettes incompatibles écartées.
+    """
+    hits, response = find_recipe(backend, symptoms, df, csv_path, attempt_count, vs=vs, profile_mask=profile_mask)
+    if response is not None:
+        return response
+    
+    context = recipe_context(symptoms, df, hits)
+    
+    try:
+        image_url = backend.fetch_image(context["fields"]["plant"])
+    except Exception:
+        image_url = ""
+    
+    try:
+        # Même recette et mêmes symptômes (au vocabulaire près): explication déjà générée réutilisée
+        explanation, sections = explanation_cache.cached_explanation(
+            backend.BACKEND_NAME, backend.LLM_MODEL_ID, backend.template, context["prompt_inputs"], symptoms,
+            lambda: backend.generate_explanation(symptoms, context["prompt_inputs"])
+        )
+    except Exception:
+        explanation, sections = fallback_explanation(backend, symptoms, context)
+    
+    return recommendation_result(context, explanation, sections, image_url)
+
+
+async def get_recommendation_async(backend, symptoms: str, df, csv_path="data/baseplante.csv", attempt_count=1, vs=None, profile_mask=0):
+    """
+    Variante asynchrone de get_recommendation pour /recommend: la recherche tourne dans un thread,
+    l'image et l'explication (clients asynchrones du backend) sont demandées en parallèle,
+    sans bloquer la boucle d'événements.
+    """
+    hits, response = await asyncio.to_thread(find_recipe, backend, symptoms, df, csv_path, attempt_count, vs, profile_mask)
+    if response is not None:
+        return response
+    
+    context = recipe_context(symptoms, df, hits)
+    prompt_inputs = context["prompt_inputs"]
+    
+    async def image():
+        try:
+            return await backend.fetch_image_async(context["fields"]["plant"])
+        except Exception:
+            return ""
+    
+    async def explanation():
+        try:
+            # Même recette et mêmes symptômes (au vocabulaire près): explication déjà générée réutilisée
+            return await explanation_cache.cached_explanation_async(
+                backend.BACKEND_NAME, backend.LLM_MODEL_ID, backend.template, prompt_inputs, symptoms,
+                lambda: backend.generate_explanation_async(symptoms, prompt_inputs),
+                refresh=lambda: backend.generate_explanation(symptoms, prompt_inputs)
+            )
+        except Exception:
+            return fallback_explanation(backend, symptoms, context)
+    
+    image_url, (explanation, sections) = await asyncio.gather(image(), explanation())
+    return recommendation_result(context, explanation, sections, image_url)
+
+
+def warm_up(backend, df, csv_path, timings=None):
+    """
+    Pré-charge l'index vectoriel du backend, la base compilée et le moteur hybride, puis exécute
+    une requête sonde, pour que la première requête /recommend ne paie aucun chargement.
+    Retourne {"timings": durée de chaque étape, "vector_index": index vectoriel chargé}: sans
+    index, l'instance sert en recherche lexicale seule (mode dégradé signalé par /ready).
+    """
+    timings = dict(timings or {})
+
+    start_time = time.time()
+    backend.vectorstore = backend.load_or_build_vectorstore(df, csv_path)
+    timings["vector_index"] = round(time.time() - start_time, 3)
+    if backend.vectorstore is None:
+        logger.warning("⚠️ Index vectoriel indisponible, recherche lexicale seule (mode dégradé)")
+
+    start_time = time.time()
+    plant_store.get_plant_store(df)
+    lookup.get_lookup(df)
+    suggest.get_suggester(df)
+    retrieval.get_retriever(df).search(
+        retrieval.WARMUP_QUERY, vectorstore=backend.vectorstore, k=3, similarity_range=backend.SIMILARITY_RANGE
+    )
+    timings["probe"] = round(time.time() - start_time, 3)
+    logger.info(f"✅ Pré-chargement terminé: {timings}")
+    return {"timings": timings, "vector_index": backend.vectorstore is not None}
@@ -0,0 +1,156 @@
+"""
+Rechargement à chaud du jeu de données et de l'index vectoriel (double tampon).
+
+Une génération regroupe tout ce qui sert une requête /recommend: le DataFrame, l'index
+vectoriel construit à partir de ce DataFrame, la base compilée, ses index secondaires
+et le moteur hybride.
+Un rechargement construit une nouvelle génération dans un thread de fond pendant que
+l'API continue de servir l'ancienne, puis la publie par une simple affectation de
+référence: une requête en cours termine sur la génération qu'elle a lue au départ.
+"""
+import logging
+import threading
+import time
+
+import dataset
+import lookup
+import plant_store
+import retrieval
+import suggest
+
+logger = logging.getLogger(__name__)
+
+MAX_HISTORY = 10
+
+
+class Generation:
+    """Jeu de données + index + tables dérivées, cohérents entre eux"""
+    __slots__ = ("number", "df", "csv_path", "vectorstore", "module", "created_at", "stats")
+
+    def __init__(self, number, df, csv_path, vectorstore, module, stats=None):
+        self.number = number
+        self.df = df
+        self.csv_path = csv_path
+        self.vectorstore = vectorstore
+        self.module = module
+        self.created_at = time.time()
+        self.stats = stats or {}
+
+    def vectorstore_for(self, module):
+        """L'index n'est utilisable qu'avec le module (modèle d'embeddings) qui l'a construit"""
+        return self.vectorstore if module is self.module else None
+
+    def describe(self):
+        return {
+            "number": self.number,
+            "rows": len(self.df),
+            "documents": len(self.vectorstore) if self.vectorstore is not None else 0,
+            "build_id": getattr(self.vectorstore, "build_id", None),
+            "backend": getattr(self.module, "__name__", None),
+            "created_at": self.created_at,
+            "stats": self.stats,
+        }
+
+
+class Reloader:
+    """Construit les générations en arrière-plan et publie la génération courante"""
+
+    def __init__(self):
+        self.current = None
+        self._lock = threading.Lock()
+        self._thread = None
+        self._next_number = 1
+        self.status = {"state": "idle", "phase": None, "progress": 0.0, "error": None,
+                       "started_at": None, "finished_at": None}
+        self.history = []
+
+    def install(self, df, csv_path, vectorstore, module, stats=None):
+        """Publie directement une génération déjà construite (pré-chargement au démarrage)"""
+        with self._lock:
+            generation = Generation(self._next_number, df, csv_path, vectorstore, module, stats)
+            self._next_number += 1
+            self._publish(generation)
+        return generation
+
+    def _publish(self, generation):
+        previous = self.current
+        self.current = generation  # affectation atomique: les nouvelles requêtes lisent la nouvelle génération
+        module = generation.module
+        if module is not None and generation.vectorstore is not None:
+            module.vectorstore = generation.vectorstore
+        logger.info(f"🔁 Génération {generation.number} publiée"
+                    + (f" (remplace la génération {previous.number})" if previous else ""))
+
+    def is_running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self, module, csv_path, incremental=True):
+        """Lance un rechargement en arrière-plan; sans effet si un rechargement est déjà en cours"""
+        with self._lock:
+            if self.is_running():
+                return False
+            self.status = {"state": "running", "phase": "queued", "progress": 0.0, "error": None,
+                           "started_at": time.time(), "finished_at": None, "incremental": incremental}
+            self._thread = threading.Thread(
+                target=self._run, args=(module, csv_path, incremental), name="aibotanik-reload", daemon=True
+            )
+            self._thread.start()
+        return True
+
+    def _progress(self, phase, progress):
+        self.status.update(phase=phase, progress=progress)
+        logger.info(f"🔄 Rechargement: {phase} ({progress:.0%})")
+
+    def _run(self, module, csv_path, incremental):
+        timings = {}
+        try:
+            self._progress("dataset", 0.05)
+            start_time = time.time()
+            df = dataset.compact_for_serving(dataset.load_dataset(csv_path))
+            timings["dataset"] = round(time.time() - start_time, 3)
+
+            self._progress("index", 0.25)
+            start_time = time.time()
+            vectorstore = module.build_and_save_vectorstore(df, csv_path, incremental=incremental)
+            if vectorstore is None:
+                raise RuntimeError("La construction de l'index vectoriel a échoué")
+            timings["index"] = round(time.time() - start_time, 3)
+
+            self._progress("lookups", 0.8)
+            start_time = time.time()
+            # Tables dérivées construites avant la publication (hors des verrous des caches):
+            # les requêtes servies par la génération courante n'attendent pas, et les premières
+            # requêtes sur la nouvelle génération les trouvent prêtes
+            plant_store.get_plant_store(df)
+            lookup.get_lookup(df)
+            suggest.get_suggester(df)
+            retriever = retrieval.get_retriever(df)
+            timings["lookups"] = round(time.time() - start_time, 3)
+
+            self._progress("probe", 0.9)
+            retriever.search(retrieval.WARMUP_QUERY, vectorstore=vectorstore, k=3,
+                             similarity_range=getattr(module, "SIMILARITY_RANGE", retrieval.DEFAULT_SIMILARITY_RANGE))
+
+            stats = {"timings": timings, "index": vectorstore.manifest.get("last_update", {})}
+            with self._lock:
+                generation = Generation(self._next_number, df, csv_path, vectorstore, module, stats)
+                self._next_number += 1
+                self._publish(generation)
+            self.status.update(state="succeeded", phase="done", progress=1.0, generation=generation.number)
+        except Exception as e:
+            logger.error(f"❌ Échec du rechargement: {e}")
+            self.status.update(state="failed", error=str(e))
+        finally:
+            self.status["finished_at"] = time.time()
+            self.history.append(dict(self.status))
+            del self.history[:-MAX_HISTORY]
+
+    def describe(self):
+        return {
+            "status": dict(self.status),
+            "current": self.current.describe() if self.current else None,
+            "history": list(self.history),
+        }
+
+
+reloader = Reloader()
@@ -0,0 +1,385 @@
+"""
+Recherche hybride des recettes: BM25 (index inversé pré-construit) + recherche vectorielle,
+fusionnées par Reciprocal Rank Fusion (RRF) en une seule liste classée.
+
+Les mots de la requête absents du vocabulaire (fautes de frappe: "diarhee") sont corrigés
+vers le mot de pathologie le plus proche (fuzzy.py) avant la recherche lexicale.
+
+Un profil patient (contraindications.py) écarte les recettes incompatibles par un masque
+de bits appliqué aux candidats des deux recherches, avant la fusion et le classement.
+
+Chaque résultat porte aussi un score de confiance calibré dans [0, 1]: le maximum entre
+la couverture lexicale de la requête et la similarité cosinus ramenée sur la plage
+utile du modèle d'embeddings. En dessous de MIN_CONFIDENCE, la correspondance est
+jugée trop faible pour lancer une génération LLM.
+"""
+import functools
+import logging
+import math
+import os
+from collections import Counter, defaultdict
+
+import numpy as np
+from langchain_core.documents import Document
+
+import contraindications
+import fuzzy
+import plant_store
+import synonyms
+from generation_cache import GenerationCache
+from text_utils import index_terms, normalize_symptoms, stem
+
+logger = logging.getLogger(__name__)
+
+# Champs indexés et leur poids dans le calcul des fréquences (BM25F simplifié)
+RETRIEVAL_FIELDS = {
+    "maladiesoigneeparrecette": 3.0,
+    "plante_recette": 1.0,
+    "recette": 1.0,
+}
+
+# Poids des termes ajoutés par les concepts détectés (vocabulaire data/synonyms.json)
+EXPANSION_WEIGHT = 0.5
+
+RRF_K = int(os.getenv("RRF_K", "60"))
+CANDIDATES_PER_RETRIEVER = int(os.getenv("RETRIEVAL_CANDIDATES", "10"))
+# Élargissement de la recherche vectorielle quand un profil patient écarte des recettes
+PROFILE_CANDIDATES_FACTOR = int(os.getenv("RETRIEVAL_PROFILE_FACTOR", "4"))
+MIN_CONFIDENCE = float(os.getenv("RECOMMEND_MIN_CONFIDENCE", "0.3"))
+
+# Granularité des documents vectorisés: "pair" (un document par couple pathologie/plante)
+# ou "row" (une recette entière par document)
+INDEX_GRANULARITY = os.getenv("INDEX_GRANULARITY", "pair").lower()
+
+# Requête sonde exécutée au démarrage (chargement des modèles et des index)
+WARMUP_QUERY = "fièvre paludisme"
+
+# Plage de similarité cosinus (bruit -> correspondance nette) par défaut, à préciser par modèle
+DEFAULT_SIMILARITY_RANGE = (0.2, 0.7)
+
+
+class RetrievalHit:
+    """Ligne du CSV retenue, avec son score fusionné, sa confiance et le détail par méthode"""
+    __slots__ = ("row", "score", "confidence", "vector_score", "lexical_score")
+
+    def __init__(self, row, score, confidence=0.0, vector_score=None, lexical_score=None):
+        self.row = row
+        self.score = score
+        self.confidence = confidence
+        self.vector_score = vector_score
+        self.lexical_score = lexical_score
+
+    def __repr__(self):
+        return f"RetrievalHit(row={self.row}, score={self.score:.4f}, confidence={self.confidence:.2f})"
+
+
+class BM25Index:
+    """Index inversé terme -> (lignes, fréquences) avec pondération BM25"""
+
+    def __init__(self, postings, doc_lengths, k1=1.5, b=0.75):
+        self.postings = postings
+        self.doc_lengths = doc_lengths
+        self.k1 = k1
+        self.b = b
+        self.avg_length = float(doc_lengths.mean()) if len(doc_lengths) else 0.0
+        n_docs = len(doc_lengths)
+        self.idf = {
+            term: math.log(1 + (n_docs - len(rows) + 0.5) / (len(rows) + 0.5))
+            for term, (rows, _) in postings.items()
+        }
+
+    @classmethod
+    def from_dataframe(cls, df, fields=RETRIEVAL_FIELDS, **kwargs):
+        columns = [(df[name].fillna("").astype(str).tolist(), weight) for name, weight in fields.items() if name in df]
+        term_rows = defaultdict(list)
+        term_freqs = defaultdict(list)
+        doc_lengths = np.zeros(len(df), dtype="float32")
+
+        for row in range(len(df)):
+            freqs = Counter()
+            for values, weight in columns:
+                for token in index_terms(values[row]):
+                    freqs[token] += weight
+            doc_lengths[row] = sum(freqs.values())
+            for term, tf in freqs.items():
+                term_rows[term].append(row)
+                term_freqs[term].append(tf)
+
+        postings = {
+            term: (np.asarray(rows, dtype="int32"), np.asarray(term_freqs[term], dtype="float32"))
+            for term, rows in term_rows.items()
+        }
+        return cls(postings, doc_lengths, **kwargs)
+
+    def match(self, terms, mode="and"):
+        """
+        Lignes contenant tous les termes (mode "and", intersection des listes) ou au moins
+        un terme (mode "or", union). Un terme absent du vocabulaire vide une intersection.
+        """
+        postings = [self.postings.get(term) for term in terms]
+        if not postings or (mode == "and" and any(p is None for p in postings)):
+            return np.empty(0, dtype="int32")
+        row_lists = [rows for rows, _ in (p for p in postings if p is not None)]
+        if not row_lists:
+            return np.empty(0, dtype="int32")
+        combine = np.intersect1d if mode == "and" else np.union1d
+        return functools.reduce(combine, row_lists)
+
+    def search(self, weighted_terms, k=10, rows=None, excluded=None):
+        """
+        Retourne [(ligne, score, poids des termes trouvés)] triés par score, éventuellement
+        restreints aux lignes `rows` (résultat de match()) et privés des lignes marquées dans
+        le tableau booléen `excluded`.
+        Le coût est proportionnel aux listes des termes de la requête, pas à la taille du corpus.
+        """
+        row_chunks, score_chunks, weight_chunks = [], [], []
+        for term, weight in weighted_terms.items():
+            posting = self.postings.get(term)
+            if posting is None:
+                continue
+            rows_, tf = posting
+            if rows is not None:
+                keep = np.isin(rows_, rows, assume_unique=True)
+                rows_, tf = rows_[keep], tf[keep]
+                if not len(rows_):
+                    continue
+            if excluded is not None:
+                keep = ~excluded[rows_]
+                rows_, tf = rows_[keep], tf[keep]
+                if not len(rows_):
+                    continue
+            norm = self.k1 * (1 - self.b + self.b * self.doc_lengths[rows_] / self.avg_length)
+            row_chunks.append(rows_)
+            score_chunks.append(weight * self.idf[term] * tf * (self.k1 + 1) / (tf + norm))
+            weight_chunks.append(np.full(len(rows_), weight, dtype="float32"))
+
+        if not row_chunks:
+            return []
+
+        unique_rows, inverse = np.unique(np.concatenate(row_chunks), return_inverse=True)
+        scores = np.bincount(inverse, weights=np.concatenate(score_chunks))
+        matched = np.bincount(inverse, weights=np.concatenate(weight_chunks))
+        top = np.argsort(-scores, kind="stable")[:k]
+        return [(int(unique_rows[i]), float(scores[i]), float(matched[i])) for i in top]
+
+
+def split_field(value, separators=",;"):
+    """Découpe un champ multi-valué du CSV ("malaria, paludisme") en valeurs distinctes"""
+    if value is None or (isinstance(value, float) and math.isnan(value)):
+        return []
+    parts = [str(value)]
+    for sep in separators:
+        parts = [piece for part in parts for piece in part.split(sep)]
+    return list(dict.fromkeys(p.strip() for p in parts if p.strip()))
+
+
+def _row_document(row_index, row):
+    content = f"Symptômes: {row.get('maladiesoigneeparrecette', '')}\n"
+    content += f"Plante: {row.get('plante_recette', '')}\n"
+    content += f"Dosage: {row.get('plante_quantite_recette', '')}\n"
+    content += f"Préparation: {row.get('recette', '')}"
+    return Document(page_content=content, metadata={"index": row_index})
+
+
+def _pair_documents(row_index, row):
+    """Un document court par couple (pathologie, plante) de la recette"""
+    pathologies = split_field(row.get("maladiesoigneeparrecette"))
+    plants = split_field(row.get("plante_recette"), separators=";")
+    if not pathologies:
+        return [_row_document(row_index, row)]
+
+    documents = []
+    for pathology in pathologies:
+        for plant in plants or [None]:
+            content = f"Symptômes: {pathology}"
+            if plant:
+                content += f"\nPlante: {plant}"
+            documents.append(Document(page_content=content, metadata={"index": row_index}))
+    return documents
+
+
+def create_recipe_documents(df, granularity=None, start_row=0):
+    """
+    Documents à vectoriser pour le DataFrame des recettes.
+    Chaque document garde en métadonnée "index" la ligne source; plusieurs documents
+    d'une même ligne sont regroupés au moment de la recherche.
+    start_row: position de la première ligne de df dans le CSV (ingestion par blocs).
+    """
+    granularity = granularity or INDEX_GRANULARITY
+    make_documents = _pair_documents if granularity == "pair" else lambda i, row: [_row_document(i, row)]
+    rows = df.to_dict("records")
+    if granularity != "pair" and "plante_quantite_recette" not in df:
+        # DataFrame de service (dataset.SERVING_COLUMNS): le dosage vient de la base compilée
+        store = plant_store.get_plant_store(df)
+        for position, row in enumerate(rows):
+            row["plante_quantite_recette"] = store[position].raw_text("dosage")
+    documents = []
+    for row_index, row in enumerate(rows, start=start_row):
+        documents.extend(make_documents(row_index, row))
+    return documents
+
+
+def expand_query(symptoms):
+    """Termes pondérés de la requête, enrichis des termes des concepts détectés (une passe Aho–Corasick)"""
+    terms = {}
+    for token in normalize_symptoms(symptoms).split():
+        terms[stem(token)] = 1.0
+
+    for match in synonyms.get_matcher().find(symptoms, kinds={"symptom"}):
+        for term in match.concept.terms:
+            for token in index_terms(term):
+                terms.setdefault(token, EXPANSION_WEIGHT)
+    return terms
+
+
+def reciprocal_rank_fusion(rankings, k=RRF_K):
+    """Fusionne plusieurs classements [ligne, ...] en {ligne: score RRF}"""
+    fused = defaultdict(float)
+    for ranking in rankings:
+        for rank, row in enumerate(ranking):
+            fused[row] += 1.0 / (k + rank + 1)
+    return fused
+
+
+class HybridRetriever:
+    """Moteur de recherche unique: BM25 + vecteurs, fusionnés par RRF"""
+
+    def __init__(self, df):
+        self.df = df
+        self.bm25 = BM25Index.from_dataframe(df)
+        self.contraindication_flags = plant_store.get_plant_store(df).contraindication_flags
+        self.fuzzy = None
+        if fuzzy.sparse is not None and "maladiesoigneeparrecette" in df:
+            self.fuzzy = fuzzy.FuzzyMatcher.from_values(df["maladiesoigneeparrecette"])
+
+    def vector_candidates(self, symptoms, vectorstore, k):
+        """[(ligne, similarité)] dédoublonnés par ligne du CSV (meilleur document de chaque ligne)"""
+        # Avec des sous-documents, plusieurs résultats tombent sur la même ligne: on élargit
+        # la recherche du nombre moyen de documents par ligne pour garder k lignes distinctes
+        docs_per_row = max(1, round(len(vectorstore) / max(1, len(self.df)))) if hasattr(vectorstore, "__len__") else 1
+        best = {}
+        for doc, score in vectorstore.similarity_search_with_score(symptoms, k=k * docs_per_row):
+            row = doc.metadata.get("index")
+            if row is not None and row < len(self.df) and (row not in best or score > best[row]):
+                best[row] = score
+        return sorted(best.items(), key=lambda item: item[1], reverse=True)
+
+    def keyword_rows(self, terms, mode="and"):
+        """Lignes contenant tous les termes (repli sur au moins un terme si l'intersection est vide)"""
+        rows = self.bm25.match(terms, mode)
+        if not len(rows) and mode == "and":
+            rows = self.bm25.match(terms, "or")
+        return rows
+
+    def correct_typos(self, symptoms):
+        """
+        {terme inconnu: {terme corrigé: similarité}} pour les mots de la requête absents de
+        l'index, d'après le mot de pathologie le plus proche (trigrammes + distance d'édition)
+        """
+        corrections = {}
+        if self.fuzzy is None:
+            return corrections
+        for token in normalize_symptoms(symptoms).split():
+            term = stem(token)
+            if term in self.bm25.postings or len(token) < fuzzy.FUZZY_MIN_LENGTH or not token.isalpha():
+                continue
+            for word, similarity in self.fuzzy.match(token, k=1):
+                corrections[term] = {corrected: similarity for corrected in index_terms(word)}
+        return corrections
+
+    def search(self, symptoms, vectorstore=None, k=3, similarity_range=DEFAULT_SIMILARITY_RANGE, profile_mask=0):
+        """profile_mask: masque des contre-indications du patient (0: aucune recette écartée)"""
+        excluded = contraindications.excluded_rows(self.contraindication_flags, profile_mask)
+
+        vector_hits = []
+        if vectorstore is not None:
+            try:
+                if excluded is None:
+                    vector_hits = self.vector_candidates(symptoms, vectorstore, CANDIDATES_PER_RETRIEVER)
+                else:
+                    candidates = self.vector_candidates(
+                        symptoms, vectorstore, CANDIDATES_PER_RETRIEVER * PROFILE_CANDIDATES_FACTOR)
+                    vector_hits = [(row, score) for row, score in candidates if not excluded[row]]
+                    vector_hits = vector_hits[:CANDIDATES_PER_RETRIEVER]
+            except Exception as e:
+                logger.warning(f"Recherche vectorielle indisponible: {e}")
+
+        terms = expand_query(symptoms)
+        # Un terme mal orthographié garde son poids (il compte dans la couverture) et le terme
+        # corrigé est ajouté avec un poids égal à sa similarité
+        corrections = self.correct_typos(symptoms)
+        for corrected_terms in corrections.values():
+            for term, similarity in corrected_terms.items():
+                terms[term] = max(terms.get(term, 0.0), similarity)
+
+        # Sans recherche vectorielle, le repli par mots-clés privilégie les lignes qui couvrent
+        # tous les termes de la requête (intersection des listes de l'index)
+        restrict = None
+        if not vector_hits:
+            required = []
+            for term, weight in terms.items():
+                if weight >= 1.0:
+                    required.extend(corrections.get(term, [term]))
+            restrict = self.keyword_rows(required)
+            if excluded is not None:
+                restrict = restrict[~excluded[restrict]]
+            if not len(restrict):
+                restrict = None
+        lexical_hits = self.bm25.search(terms, k=CANDIDATES_PER_RETRIEVER, rows=restrict, excluded=excluded)
+
+        fused = reciprocal_rank_fusion([
+            [row for row, _ in vector_hits],
+            [row for row, _, _ in lexical_hits],
+        ])
+        vector_scores = dict(vector_hits)
+        lexical_scores = {row: score for row, score, _ in lexical_hits}
+
+        # Couverture lexicale: part du poids des termes d'origine retrouvée dans la ligne
+        query_weight = sum(weight for weight in terms.values() if weight >= 1.0) or 1.0
+        coverage = {row: min(1.0, matched / query_weight) for row, _, matched in lexical_hits}
+
+        low, high = similarity_range
+        hits = []
+        for row, score in fused.items():
+            similarity = vector_scores.get(row)
+            vector_confidence = 0.0
+            if similarity is not None:
+                vector_confidence = min(1.0, max(0.0, (similarity - low) / (high - low)))
+            confidence = max(vector_confidence, coverage.get(row, 0.0))
+            hits.append(RetrievalHit(row, score, confidence, similarity, lexical_scores.get(row)))
+
+        # À score RRF égal (même rang dans deux classements), la confiance départage
+        hits.sort(key=lambda hit: (hit.score, hit.confidence), reverse=True)
+        return hits[:k]
+
+
+def describe_hits(df, hits):
+    """Alternatives classées, prêtes à être renvoyées au frontend"""
+    store = plant_store.get_plant_store(df)
+    alternatives = []
+    for rank, hit in enumerate(hits, start=1):
+        record = store[hit.row]
+        alternatives.append({
+            "rank": rank,
+            "plant": record.main_plant,
+            "pathology": record.pathology,
+            "score": round(hit.confidence, 3),
+            "similarity": round(hit.vector_score, 3) if hit.vector_score is not None else None,
+        })
+    return alternatives
+
+
+def _build_retriever(df):
+    retriever = HybridRetriever(df)
+    logger.info(f"Index BM25 construit: {len(retriever.bm25.postings)} termes, {len(df)} recettes"
+                + (f", {len(retriever.fuzzy)} mots de pathologie" if retriever.fuzzy is not None else ""))
+    return retriever
+
+
+# Moteurs des deux dernières générations du jeu de données (double tampon du rechargement)
+_retrievers = GenerationCache(_build_retriever)
+
+
+def get_retriever(df):
+    """Retourne le moteur construit pour ce DataFrame (construit au premier appel, hors verrou)"""
+    return _retrievers.get(df)
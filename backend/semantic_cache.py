@@ -0,0 +1,298 @@
+"""
+Cache sémantique des réponses du mode Discussion (/chat).
+
+Les questions se répètent sous des formes voisines ("c'est quoi le moringa ?", "le moringa
+sert à quoi"). La question est vectorisée avec le modèle d'embeddings déjà chargé du
+backend, puis comparée aux questions déjà traitées dans un petit index FAISS (produit
+scalaire sur vecteurs normalisés = cosinus). Au-dessus du seuil, la réponse en cache est
+renvoyée sans appel au LLM.
+
+Garde-fou: deux questions proches mais portant sur des plantes ou des affections
+différentes ("le moringa sert à quoi" / "le neem sert à quoi") ont des vecteurs très
+voisins. Une réponse n'est donc reprise que si les deux questions citent les mêmes
+concepts du vocabulaire (synonyms.py) et les mêmes noms de plantes. Les mots des noms
+de plantes (plant_words, lookup.py) sont fournis par l'appelant, qui connaît la
+génération courante du jeu de données.
+
+Seuil de similarité propre à chaque backend, l'échelle dépendant du modèle d'embeddings:
+0.85 pour all-MiniLM-L6-v2 (HuggingFace), 0.8 pour text-embedding-3-small (OpenAI);
+variables CHAT_CACHE_THRESHOLD_HF / CHAT_CACHE_THRESHOLD_OPENAI, ou CHAT_CACHE_THRESHOLD
+pour les deux (chat_cache_threshold).
+
+Une question identique après normalisation est servie sans calcul d'embedding.
+Éviction LRU bornée en nombre d'entrées, expiration après CHAT_CACHE_TTL secondes.
+"""
+import asyncio
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict, deque
+
+import faiss
+import numpy as np
+
+import synonyms
+from query_cache import query_key
+from text_utils import tokenize
+
+logger = logging.getLogger(__name__)
+
+CHAT_CACHE_SIZE = int(os.getenv("CHAT_CACHE_SIZE", "2000"))
+CHAT_CACHE_TTL = float(os.getenv("CHAT_CACHE_TTL", str(7 * 24 * 3600)))
+# Seuil de similarité cosinus par défaut; chaque backend fournit le sien (chat_cache_threshold)
+DEFAULT_THRESHOLD = 0.85
+CHAT_CACHE_ENABLED = os.getenv("CHAT_CACHE_ENABLED", "true").lower() in ("true", "1", "t")
+
+# Voisins examinés: le plus proche peut être écarté par le garde-fou
+SEARCH_NEIGHBORS = 4
+# Réponses plus courtes: réponses d'erreur ou vides, jamais mises en cache
+MIN_ANSWER_LENGTH = 20
+LATENCY_SAMPLES = 1000
+
+
+def chat_cache_threshold(backend_variable, default):
+    """
+    Seuil de similarité d'un backend: backend_variable (CHAT_CACHE_THRESHOLD_HF,
+    CHAT_CACHE_THRESHOLD_OPENAI), sinon CHAT_CACHE_THRESHOLD commun aux backends, sinon
+    default, la valeur réglée pour son modèle d'embeddings (l'échelle des similarités en
+    dépend). Seul endroit où ces variables sont lues.
+    """
+    value = os.getenv(backend_variable) or os.getenv("CHAT_CACHE_THRESHOLD")
+    return float(value) if value else default
+
+
+def question_signature(question, plant_words=frozenset()):
+    """
+    Concepts du vocabulaire et mots de noms de plantes (parmi plant_words) cités: doivent
+    être identiques pour réutiliser une réponse
+    """
+    concepts = frozenset(synonyms.get_matcher().concepts_in(question))
+    return concepts, frozenset(tokenize(question)) & plant_words
+
+
+class ChatEntry:
+    __slots__ = ("question", "answer", "signature", "created_at")
+
+    def __init__(self, question, answer, signature, created_at):
+        self.question = question
+        self.answer = answer
+        self.signature = signature
+        self.created_at = created_at
+
+
+class ChatProbe:
+    """Question manquée dans le cache: ce qu'il faut pour y enregistrer la réponse ensuite"""
+    __slots__ = ("key", "question", "vector", "signature", "start_time")
+
+    def __init__(self, key, question, vector, signature, start_time):
+        self.key = key
+        self.question = question
+        self.vector = vector
+        self.signature = signature
+        self.start_time = start_time
+
+
+def _percentile(samples, q):
+    return round(float(np.percentile(samples, q)), 3) if samples else None
+
+
+class SemanticCache:
+    """Questions déjà traitées d'un modèle d'embeddings: index FAISS + entrées LRU"""
+
+    def __init__(self, threshold=DEFAULT_THRESHOLD, maxsize=CHAT_CACHE_SIZE, ttl=CHAT_CACHE_TTL):
+        self.threshold = threshold
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.index = None  # créé au premier ajout (dimension du modèle)
+        self.entries = OrderedDict()  # identifiant FAISS -> ChatEntry, du moins au plus récemment utilisé
+        self.exact = {}  # question normalisée -> identifiant
+        self.exact_hits = 0
+        self.semantic_hits = 0
+        self.misses = 0
+        self.guard_rejections = 0
+        self.evictions = 0
+        self.hit_latencies = deque(maxlen=LATENCY_SAMPLES)
+        self.miss_latencies = deque(maxlen=LATENCY_SAMPLES)
+        self._next_id = 0
+        self._lock = threading.Lock()
+
+    def answer(self, question, embeddings, generate, plant_words=frozenset()):
+        """
+        Réponse en cache si une question équivalente a déjà été traitée, sinon generate().
+        Les exceptions de generate() remontent à l'appelant et rien n'est mis en cache.
+        """
+        cached, probe = self.lookup(question, embeddings, plant_words)
+        if cached is not None:
+            return cached
+        response = generate()
+        self.save(probe, response)
+        return response
+
+    def lookup(self, question, embeddings, plant_words=frozenset()):
+        """(réponse en cache ou None, sonde à passer à save() avec la réponse générée)"""
+        start_time = time.perf_counter()
+        key = query_key(question)
+        with self._lock:
+            entry = self._exact_entry(key)
+            if entry is not None:
+                self.exact_hits += 1
+                self.hit_latencies.append((time.perf_counter() - start_time) * 1000)
+                return entry.answer, None
+
+        signature = question_signature(question, plant_words)
+        vector = None
+        try:
+            vector = np.asarray(embeddings.embed_query(question), dtype="float32").reshape(1, -1)
+            faiss.normalize_L2(vector)
+        except Exception as e:
+            logger.warning(f"Cache sémantique: vectorisation de la question impossible ({e})")
+
+        with self._lock:
+            entry = self._nearest_entry(vector, signature) if vector is not None else None
+            if entry is not None:
+                self.semantic_hits += 1
+                self.hit_latencies.append((time.perf_counter() - start_time) * 1000)
+                return entry.answer, None
+            self.misses += 1
+        return None, ChatProbe(key, question, vector, signature, start_time)
+
+    def save(self, probe, response):
+        """Enregistre la réponse générée pour la question de la sonde (ignorée si vide ou trop courte)"""
+        if probe is None:
+            return
+        with self._lock:
+            self.miss_latencies.append((time.perf_counter() - probe.start_time) * 1000)
+        if probe.vector is not None and response and len(response.strip()) > MIN_ANSWER_LENGTH:
+            self.add(probe.key, probe.question, probe.vector, probe.signature, response)
+
+    def _exact_entry(self, key):
+        entry_id = self.exact.get(key)
+        if entry_id is None:
+            return None
+        entry = self.entries[entry_id]
+        if time.time() - entry.created_at > self.ttl:
+            self._remove(entry_id)
+            return None
+        self.entries.move_to_end(entry_id)
+        return entry
+
+    def _nearest_entry(self, vector, signature):
+        if self.index is None or not self.index.ntotal or self.index.d != vector.shape[1]:
+            return None
+        similarities, ids = self.index.search(vector, min(SEARCH_NEIGHBORS, self.index.ntotal))
+        for similarity, entry_id in zip(similarities[0], ids[0]):
+            if entry_id < 0 or similarity < self.threshold:
+                break
+            entry = self.entries[int(entry_id)]
+            if time.time() - entry.created_at > self.ttl:
+                continue
+            if entry.signature != signature:
+                self.guard_rejections += 1
+                continue
+            self.entries.move_to_end(int(entry_id))
+            return entry
+        return None
+
+    def add(self, key, question, vector, signature, answer):
+        with self._lock:
+            if self.index is None or self.index.d != vector.shape[1]:
+                self.index = faiss.IndexIDMap2(faiss.IndexFlatIP(vector.shape[1]))
+                self.entries.clear()
+                self.exact.clear()
+            if key in self.exact:
+                self._remove(self.exact[key])
+            entry_id = self._next_id
+            self._next_id += 1
+            self.index.add_with_ids(vector, np.asarray([entry_id], dtype="int64"))
+            self.entries[entry_id] = ChatEntry(question, answer, signature, time.time())
+            self.exact[key] = entry_id
+            while len(self.entries) > self.maxsize:
+                self._remove(next(iter(self.entries)))
+                self.evictions += 1
+
+    def _remove(self, entry_id):
+        entry = self.entries.pop(entry_id)
+        self.index.remove_ids(np.asarray([entry_id], dtype="int64"))
+        key = query_key(entry.question)
+        if self.exact.get(key) == entry_id:
+            del self.exact[key]
+
+    def clear(self):
+        with self._lock:
+            self.index = None
+            self.entries.clear()
+            self.exact.clear()
+
+    def stats(self):
+        with self._lock:
+            hits = self.exact_hits + self.semantic_hits
+            total = hits + self.misses
+            return {
+                "size": len(self.entries),
+                "maxsize": self.maxsize,
+                "threshold": self.threshold,
+                "ttl": self.ttl,
+                "exact_hits": self.exact_hits,
+                "semantic_hits": self.semantic_hits,
+                "misses": self.misses,
+                "hit_rate": round(hits / total, 4) if total else 0.0,
+                "guard_rejections": self.guard_rejections,
+                "evictions": self.evictions,
+                "hit_latency_ms": {"p50": _percentile(self.hit_latencies, 50), "p95": _percentile(self.hit_latencies, 95)},
+                "miss_latency_ms": {"p50": _percentile(self.miss_latencies, 50), "p95": _percentile(self.miss_latencies, 95)},
+            }
+
+
+# Un cache par modèle d'embeddings (dimensions et échelles de similarité différentes)
+_caches = {}
+_caches_lock = threading.Lock()
+
+
+def get_chat_cache(model_id, threshold=DEFAULT_THRESHOLD):
+    with _caches_lock:
+        cache = _caches.get(model_id)
+        if cache is None:
+            cache = _caches[model_id] = SemanticCache(threshold=threshold)
+            logger.info(f"Cache sémantique du chat créé pour {model_id} (seuil {threshold})")
+        return cache
+
+
+def cached_answer(question, embeddings, generate, threshold=DEFAULT_THRESHOLD, plant_words=frozenset()):
+    """Réponse via le cache du modèle d'embeddings, ou generate() directement sans cache ni modèle"""
+    if not CHAT_CACHE_ENABLED or embeddings is None:
+        return generate()
+    model_id = getattr(embeddings, "model_id", type(embeddings).__name__)
+    return get_chat_cache(model_id, threshold).answer(question, embeddings, generate, plant_words)
+
+
+async def cached_answer_async(question, embeddings, agenerate, threshold=DEFAULT_THRESHOLD,
+                              plant_words=frozenset()):
+    """Variante asynchrone de cached_answer(): la vectorisation de la question tourne dans un thread"""
+    cached, pending = await asyncio.to_thread(lookup_answer, question, embeddings, threshold, plant_words)
+    if cached is not None:
+        return cached
+    response = await agenerate()
+    save_answer(pending, response)
+    return response
+
+
+def lookup_answer(question, embeddings, threshold=DEFAULT_THRESHOLD, plant_words=frozenset()):
+    """(réponse en cache ou None, (cache, sonde) à passer à save_answer()); sans effet si désactivé"""
+    if not CHAT_CACHE_ENABLED or embeddings is None:
+        return None, None
+    cache = get_chat_cache(getattr(embeddings, "model_id", type(embeddings).__name__), threshold)
+    cached, probe = cache.lookup(question, embeddings, plant_words)
+    return cached, (cache, probe)
+
+
+def save_answer(pending, response):
+    if pending is not None:
+        cache, probe = pending
+        cache.save(probe, response)
+
+
+def stats():
+    with _caches_lock:
+        caches = dict(_caches)
+    return {model_id: cache.stats() for model_id, cache in caches.items()}
@@ -0,0 +1,98 @@
+"""
+Regroupement des requêtes identiques en cours (single-flight) pour /recommend et /chat.
+
+Une tablette partagée ou un frontend qui réessaie envoie souvent les mêmes symptômes
+plusieurs fois en même temps: sans regroupement, chaque requête relance la recherche,
+Unsplash et une génération LLM complète. Ici, la première requête d'une clé lance le
+calcul dans une tâche; les suivantes, tant qu'il est en cours, attendent cette même tâche
+et reçoivent son résultat (ou son exception) dès qu'il arrive. Une fois terminé, la clé
+est libérée: les caches (explications, chat) prennent le relais.
+
+La tâche est protégée (asyncio.shield): l'annulation d'une requête en attente,
+y compris la première, n'interrompt pas le calcul des autres.
+Le résultat est partagé entre les requêtes regroupées et ne doit pas être modifié.
+"""
+import asyncio
+import logging
+import os
+import threading
+
+logger = logging.getLogger(__name__)
+
+SINGLE_FLIGHT_ENABLED = os.getenv("SINGLE_FLIGHT_ENABLED", "true").lower() in ("true", "1", "t")
+
+
+class SingleFlight:
+    """Calculs en cours par clé (tâches asyncio) et compteurs d'appels économisés"""
+
+    def __init__(self, name):
+        self.name = name
+        self.inflight = {}  # clé -> tâche en cours
+        self.calls = 0  # calculs réellement lancés
+        self.coalesced = 0  # requêtes servies par un calcul déjà en cours (appels économisés)
+        self.failures = 0
+        self.max_waiters = 0
+        self._waiters = {}
+        self._lock = threading.Lock()
+
+    async def do(self, key, make_coro):
+        """Résultat de make_coro() pour la clé, calculé une seule fois pour les requêtes simultanées"""
+        with self._lock:
+            task = self.inflight.get(key)
+            if task is None:
+                task = asyncio.ensure_future(make_coro())
+                self.inflight[key] = task
+                self._waiters[key] = 1
+                self.calls += 1
+                task.add_done_callback(lambda done, key=key: self._finish(key, done))
+            else:
+                self._waiters[key] += 1
+                self.coalesced += 1
+                self.max_waiters = max(self.max_waiters, self._waiters[key])
+                logger.info(f"Requête {self.name} regroupée avec un calcul en cours ({self._waiters[key]} en attente)")
+        return await asyncio.shield(task)
+
+    def _finish(self, key, task):
+        with self._lock:
+            if self.inflight.get(key) is task:
+                del self.inflight[key]
+                del self._waiters[key]
+            if task.cancelled() or task.exception() is not None:
+                self.failures += 1
+
+    def stats(self):
+        with self._lock:
+            requests = self.calls + self.coalesced
+            return {
+                "in_flight": len(self.inflight),
+                "calls": self.calls,
+                "coalesced": self.coalesced,
+                "saved_ratio": round(self.coalesced / requests, 4) if requests else 0.0,
+                "failures": self.failures,
+                "max_waiters": self.max_waiters,
+            }
+
+
+_flights = {}
+_flights_lock = threading.Lock()
+
+
+def get_flight(name):
+    with _flights_lock:
+        flight = _flights.get(name)
+        if flight is None:
+            flight = _flights[name] = SingleFlight(name)
+        return flight
+
+
+async def coalesce(name, key, make_coro):
+    """make_coro() regroupé par clé dans le groupe name, ou appelé directement si le regroupement est désactivé"""
+    if not SINGLE_FLIGHT_ENABLED:
+        return await make_coro()
+    return await get_flight(name).do(key, make_coro)
+
+
+def stats():
+    with _flights_lock:
+        flights = dict(_flights)
+    return {"enabled": SINGLE_FLIGHT_ENABLED, **{name: flight.stats() for name, flight in flights.items()}}
@@ -0,0 +1,174 @@
+"""
+Réponses en flux (Server-Sent Events) pour /recommend/stream et /chat/stream.
+
+Consultation: les champs de la recette viennent du CSV et sont envoyés dès la fin de la
+recherche (événement "plant"), avant toute génération; l'image suit dès qu'Unsplash
+répond ("image"). L'explication est ensuite poussée token par token ("token") et
+chaque section est émise dès qu'elle est complète ("diagnostic", "symptomes", ...,
+"resume"). L'événement final "done" porte la réponse complète, identique à celle de
+/recommend. Discussion: "token" puis "done".
+
+Le découpage en sections réutilise l'extracteur de chaque backend
+(extract_sections_from_explanation) sur le texte déjà reçu: une section est complète
+quand la suivante commence, et le résultat final est celui de l'extracteur.
+"""
+import json
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+from fastapi.responses import StreamingResponse
+
+import explanation_cache
+import recommendation
+import semantic_cache
+
+logger = logging.getLogger(__name__)
+
+# Recherche d'image Unsplash en parallèle de la génération
+_image_executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix="stream-image")
+
+
+def format_event(event, data):
+    """Événement SSE: nom et données JSON sur une ligne"""
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+def event_stream(events):
+    """StreamingResponse d'un itérateur de (événement, données), sans mise en tampon par un proxy"""
+    return StreamingResponse(
+        (format_event(event, data) for event, data in events),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+class SectionStream:
+    """Découpage incrémental d'une explication en sections, ligne par ligne"""
+
+    def __init__(self, extract):
+        self.extract = extract
+        self.text = ""
+        self.parsed_length = 0
+        self.sections = {}
+        self.current = None
+        self.emitted = set()
+
+    def feed(self, chunk):
+        """Ajoute un fragment; retourne [(clé, texte)] des sections devenues complètes"""
+        self.text += chunk
+        end = self.text.rfind("\n") + 1
+        if end <= self.parsed_length:
+            return []
+        self.parsed_length = end
+        sections = self.extract(self.text[:end])
+        changed = [key for key, value in sections.items() if value != self.sections.get(key, "")]
+        if changed:
+            self.current = changed[-1]
+        self.sections = sections
+        return self._complete(exclude=self.current)
+
+    def finish(self):
+        """Sections finales (extracteur sur le texte complet) et [(clé, texte)] pas encore émises"""
+        self.sections = self.extract(self.text)
+        return self.sections, self._complete()
+
+    def _complete(self, exclude=None):
+        completed = []
+        for key, value in self.sections.items():
+            if value and key != exclude and key not in self.emitted:
+                self.emitted.add(key)
+                completed.append((key, value))
+        return completed
+
+
+def _section_events(completed):
+    for key, text in completed:
+        yield key, {"field": recommendation.SECTION_FIELDS.get(key, key), "text": text}
+
+
+def recommendation_events(module, symptoms, df, csv_path, attempt_count=1, vs=None, profile_mask=0):
+    """(événement, données) d'une consultation; module: backend LLM (langchain_chains*)"""
+    hits, response = recommendation.find_recipe(module, symptoms, df, csv_path, attempt_count, vs=vs, profile_mask=profile_mask)
+    if response is not None:
+        yield "done", response
+        return
+
+    context = recommendation.recipe_context(symptoms, df, hits)
+    yield "plant", context["fields"]
+    image = _image_executor.submit(module.fetch_image, context["fields"]["plant"])
+    image_sent = False
+
+    prompt_inputs = context["prompt_inputs"]
+
+    def generate():
+        return module.generate_explanation(symptoms, prompt_inputs)
+
+    cached, cache_key = explanation_cache.lookup_explanation(
+        module.BACKEND_NAME, module.LLM_MODEL_ID, module.template, prompt_inputs, symptoms, refresh=generate
+    )
+    if cached is not None:
+        explanation, sections = cached
+        yield from _section_events((key, text) for key, text in sections.items() if text)
+    else:
+        parser = SectionStream(module.extract_sections_from_explanation)
+        try:
+            for chunk in module.stream_explanation(symptoms, prompt_inputs):
+                if not chunk:
+                    continue
+                yield "token", {"text": chunk}
+                yield from _section_events(parser.feed(chunk))
+                if not image_sent and image.done():
+                    image_sent = True
+                    yield "image", {"image_url": _image_url(image)}
+            explanation = parser.text
+            sections, completed = parser.finish()
+            yield from _section_events(completed)
+            explanation_cache.store_explanation(cache_key, explanation, sections)
+        except Exception as e:
+            logger.warning(f"Génération en flux impossible, explication de secours: {e}")
+            explanation, sections = recommendation.fallback_explanation(module, symptoms, context)
+            yield "fallback", {"reason": str(e)}
+            yield from _section_events((key, text) for key, text in sections.items() if text)
+
+    image_url = _image_url(image)
+    if not image_sent:
+        yield "image", {"image_url": image_url}
+    yield "done", recommendation.recommendation_result(context, explanation, sections, image_url)
+
+
+def _image_url(future):
+    try:
+        return future.result() or ""
+    except Exception:
+        return ""
+
+
+def chat_events(module, message, plant_words=frozenset()):
+    """(événement, données) d'une réponse du mode discussion; plant_words: garde-fou du cache sémantique"""
+    cached, pending = semantic_cache.lookup_answer(
+        message, module.chat_embeddings(), module.CHAT_CACHE_THRESHOLD, plant_words)
+    if cached is not None:
+        yield "token", {"text": cached}
+        yield "done", {"response": cached, "cached": True}
+        return
+
+    chunks = []
+    try:
+        for chunk in module.stream_chat_response(message):
+            if chunk:
+                chunks.append(chunk)
+                yield "token", {"text": chunk}
+    except Exception as e:
+        logger.warning(f"Discussion en flux impossible: {e}")
+        if not chunks:
+            # Rien n'a encore été envoyé: chemin sans flux (avec ses réponses de secours)
+            response = module.generate_chat_response(message, plant_words)
+            yield "token", {"text": response}
+            yield "done", {"response": response, "cached": False}
+            return
+        yield "done", {"response": "".join(chunks).strip(), "cached": False, "truncated": True}
+        return
+
+    response = "".join(chunks).strip()
+    semantic_cache.save_answer(pending, response)
+    yield "done", {"response": response, "cached": False}
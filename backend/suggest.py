@@ -0,0 +1,157 @@
+"""
+Autocomplétion des symptômes: trie des préfixes construit une fois par génération.
+
+Libellés proposés:
+    - pathologies de la base (maladiesoigneeparrecette), pondérées par leur nombre de recettes
+    - alias des concepts du vocabulaire (data/synonyms.json), avec le poids de leurs termes
+    - noms locaux des plantes, pondérés par le nombre de recettes de la plante
+
+Les clés sont repliées (minuscules, sans accents) et chaque libellé est aussi indexé à
+partir de chacun de ses mots ("ulcère gastrique" est trouvé par "gastr"). Chaque nœud
+du trie garde ses meilleures complétions pré-calculées: une requête ne fait que
+descendre le long du préfixe, sans parcourir le sous-arbre.
+"""
+import heapq
+import logging
+import os
+from collections import defaultdict
+
+import numpy as np
+
+import lookup
+import plant_store
+import synonyms
+from generation_cache import GenerationCache
+from retrieval import split_field
+from text_utils import fold_text
+
+logger = logging.getLogger(__name__)
+
+SUGGEST_TOP_K = int(os.getenv("SUGGEST_TOP_K", "10"))
+
+# Ordre des types: les affections connues d'abord, les noms de plantes ensuite
+KIND_ORDER = {"pathology": 0, "symptom": 1, "local_name": 2}
+
+
+class Suggestion:
+    """Complétion proposée: libellé affiché, type, texte à envoyer à /recommend, poids"""
+    __slots__ = ("label", "kind", "value", "weight")
+
+    def __init__(self, label, kind, value, weight):
+        self.label = label
+        self.kind = kind
+        self.value = value
+        self.weight = weight
+
+    def rank_key(self):
+        # Affections avant noms locaux, poids décroissant, pathologie avant alias,
+        # puis libellé le plus court et ordre alphabétique
+        kind = KIND_ORDER.get(self.kind, len(KIND_ORDER))
+        return (kind == KIND_ORDER["local_name"], -self.weight, kind, len(self.label), self.label)
+
+    def to_dict(self):
+        return {"label": self.label, "kind": self.kind, "value": self.value, "recipes": self.weight}
+
+
+class SuggestionTrie:
+    """Trie caractère par caractère; top[nœud] = meilleures suggestions de son sous-arbre"""
+
+    def __init__(self, suggestions, top_k=SUGGEST_TOP_K):
+        self.suggestions = sorted(suggestions, key=Suggestion.rank_key)  # rang = identifiant
+        self.top_k = top_k
+        self.children = [{}]
+        own = [[]]
+        for rank, suggestion in enumerate(self.suggestions):
+            words = " ".join(fold_text(suggestion.label).split()).split(" ")
+            # Libellé complet et chacun de ses suffixes commençant à un mot
+            for start in range(len(words)):
+                node = 0
+                for char in " ".join(words[start:]):
+                    next_node = self.children[node].get(char)
+                    if next_node is None:
+                        next_node = self.children[node][char] = len(self.children)
+                        self.children.append({})
+                        own.append([])
+                    node = next_node
+                own[node].append(rank)
+
+        # Les identifiants sont créés parents avant enfants: un parcours inverse voit
+        # toujours les enfants d'un nœud avant lui
+        self.top = [None] * len(self.children)
+        for node in range(len(self.children) - 1, -1, -1):
+            merged = heapq.merge(own[node], *(self.top[child] for child in self.children[node].values()))
+            self.top[node] = tuple(_unique(merged, top_k))
+
+    def complete(self, prefix, limit=None):
+        key = " ".join(fold_text(prefix).split())
+        if not key:
+            return []
+        node = 0
+        for char in key:
+            node = self.children[node].get(char)
+            if node is None:
+                return []
+        return [self.suggestions[rank] for rank in self.top[node][:limit or self.top_k]]
+
+    def __len__(self):
+        return len(self.children)
+
+
+def _unique(sorted_ranks, limit):
+    """Premiers identifiants distincts d'un flux trié"""
+    previous = None
+    for rank in sorted_ranks:
+        if rank != previous:
+            yield rank
+            limit -= 1
+            if not limit:
+                return
+            previous = rank
+
+
+def build_suggestions(df):
+    store = plant_store.get_plant_store(df)
+    plant_lookup = lookup.get_lookup(df)
+
+    # Pathologies: une passe sur les textes distincts, pondérés par leur nombre de lignes
+    pathology_recipes = defaultdict(int)
+    text = store.vocabularies["text"]
+    text_ids, counts = np.unique(store.text_columns["pathology"], return_counts=True)
+    for text_id, count in zip(text_ids, counts):
+        for pathology in split_field(text[text_id]):
+            pathology_recipes[pathology] += int(count)
+    recipes_by_key = {lookup.lookup_key(p): count for p, count in pathology_recipes.items()}
+    suggestions = [Suggestion(p, "pathology", p, count) for p, count in pathology_recipes.items()]
+
+    # Alias des concepts: poids des pathologies de la base qui correspondent à leurs termes
+    seen = {lookup.lookup_key(p) for p in pathology_recipes}
+    for concept in synonyms.get_matcher().concepts.values():
+        if concept.kind != "symptom":
+            continue
+        weight = max([recipes_by_key.get(lookup.lookup_key(term), 0) for term in concept.terms] or [0])
+        for alias in concept.aliases:
+            key = lookup.lookup_key(alias)
+            if key not in seen:
+                seen.add(key)
+                suggestions.append(Suggestion(alias, "symptom", alias, weight))
+
+    # Noms locaux: renvoient vers la plante, pondérés par son nombre de recettes
+    for label, plants in plant_lookup.local_names.entries.values():
+        weight = sum(len(plant_lookup.plants.get(plant)[1]) for plant in plants if plant_lookup.plants.get(plant))
+        suggestions.append(Suggestion(label, "local_name", ", ".join(plants), weight))
+    return suggestions
+
+
+def _build_suggester(df):
+    trie = SuggestionTrie(build_suggestions(df))
+    logger.info(f"Trie d'autocomplétion construit: {len(trie.suggestions)} libellés, {len(trie)} nœuds")
+    return trie
+
+
+# Tries des deux dernières générations du jeu de données (double tampon du rechargement)
+_tries = GenerationCache(_build_suggester)
+
+
+def get_suggester(df):
+    """Retourne le trie d'autocomplétion de ce DataFrame (construit au premier appel, hors verrou)"""
+    return _tries.get(df)
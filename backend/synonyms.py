@@ -0,0 +1,180 @@
+"""
+Détection des concepts (symptômes, intentions) dans un texte libre en une seule passe.
+
+Le vocabulaire vient d'un fichier de données versionné (data/synonyms.json): chaque
+concept a des alias (français, anglais, expressions courantes) et des termes ajoutés à
+la recherche. Tous les alias sont compilés au chargement dans un automate Aho–Corasick:
+le coût d'une requête est linéaire en la longueur du texte, quel que soit le nombre
+d'alias. Texte et alias sont repliés (minuscules, sans accents, ponctuation -> espace)
+et seules les correspondances sur des mots entiers sont retenues.
+"""
+import json
+import logging
+import os
+import threading
+import unicodedata
+from collections import deque
+
+logger = logging.getLogger(__name__)
+
+SYNONYMS_PATH = os.getenv(
+    "SYNONYMS_PATH",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "synonyms.json")
+)
+
+
+def _fold_char(char):
+    folded = unicodedata.normalize("NFKD", char.casefold())
+    folded = "".join(c for c in folded if not unicodedata.combining(c))
+    return "".join(c if c.isalnum() else " " for c in folded)
+
+
+def fold_with_offsets(text):
+    """Texte replié et, pour chacun de ses caractères, la position dans le texte d'origine"""
+    chars, offsets = [], []
+    for position, char in enumerate(text or ""):
+        for folded in _fold_char(char):
+            chars.append(folded)
+            offsets.append(position)
+    return "".join(chars), offsets
+
+
+def fold_alias(alias):
+    return " ".join(fold_with_offsets(alias)[0].split())
+
+
+class Concept:
+    """Concept du vocabulaire: identifiant, type, alias et termes de recherche associés"""
+    __slots__ = ("id", "kind", "aliases", "terms")
+
+    def __init__(self, id, kind, aliases, terms):
+        self.id = id
+        self.kind = kind
+        self.aliases = aliases
+        self.terms = terms
+
+    def __repr__(self):
+        return f"Concept({self.id!r}, kind={self.kind!r})"
+
+
+class Match:
+    """Occurrence d'un alias dans le texte d'origine: [start, end)"""
+    __slots__ = ("concept", "alias", "start", "end")
+
+    def __init__(self, concept, alias, start, end):
+        self.concept = concept
+        self.alias = alias
+        self.start = start
+        self.end = end
+
+    def __repr__(self):
+        return f"Match({self.concept.id!r}, {self.alias!r}, {self.start}, {self.end})"
+
+
+class AhoCorasick:
+    """Automate multi-motifs: transitions (dict par état), liens d'échec et sorties"""
+
+    def __init__(self, patterns):
+        self.goto = [{}]
+        self.fail = [0]
+        self.outputs = [[]]
+        for pattern_id, pattern in enumerate(patterns):
+            state = 0
+            for char in pattern:
+                next_state = self.goto[state].get(char)
+                if next_state is None:
+                    next_state = len(self.goto)
+                    self.goto[state][char] = next_state
+                    self.goto.append({})
+                    self.fail.append(0)
+                    self.outputs.append([])
+                state = next_state
+            self.outputs[state].append((pattern_id, len(pattern)))
+
+        # Liens d'échec en largeur; les sorties des suffixes sont héritées
+        queue = deque(self.goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, next_state in self.goto[state].items():
+                queue.append(next_state)
+                fallback = self.fail[state]
+                while fallback and char not in self.goto[fallback]:
+                    fallback = self.fail[fallback]
+                self.fail[next_state] = self.goto[fallback].get(char, 0)
+                self.outputs[next_state] = self.outputs[next_state] + self.outputs[self.fail[next_state]]
+
+    def iter(self, text):
+        """Génère (fin exclusive, identifiant du motif, longueur) pour chaque occurrence"""
+        state = 0
+        for position, char in enumerate(text):
+            while state and char not in self.goto[state]:
+                state = self.fail[state]
+            state = self.goto[state].get(char, 0)
+            for pattern_id, length in self.outputs[state]:
+                yield position + 1, pattern_id, length
+
+    def __len__(self):
+        return len(self.goto)
+
+
+class SynonymMatcher:
+    """Vocabulaire compilé: une passe sur le texte renvoie tous les concepts trouvés"""
+
+    def __init__(self, concepts, version=None):
+        self.concepts = concepts
+        self.version = version
+        self.patterns = []
+        for concept in concepts.values():
+            for alias in concept.aliases:
+                folded = fold_alias(alias)
+                if folded:
+                    self.patterns.append((folded, concept))
+        self.automaton = AhoCorasick([pattern for pattern, _ in self.patterns])
+
+    @classmethod
+    def from_file(cls, path=SYNONYMS_PATH):
+        with open(path, encoding="utf-8") as f:
+            data = json.load(f)
+        concepts = {
+            concept_id: Concept(concept_id, entry.get("kind", "symptom"), entry.get("aliases", []), entry.get("terms", []))
+            for concept_id, entry in data.get("concepts", {}).items()
+        }
+        return cls(concepts, version=data.get("version"))
+
+    def find(self, text, kinds=None):
+        """Toutes les occurrences (mots entiers) des alias, avec leurs positions dans `text`"""
+        folded, offsets = fold_with_offsets(text)
+        matches = []
+        for end, pattern_id, length in self.automaton.iter(folded):
+            start = end - length
+            if (start > 0 and folded[start - 1] != " ") or (end < len(folded) and folded[end] != " "):
+                continue
+            alias, concept = self.patterns[pattern_id]
+            if kinds is not None and concept.kind not in kinds:
+                continue
+            matches.append(Match(concept, alias, offsets[start], offsets[end - 1] + 1))
+        matches.sort(key=lambda match: (match.start, -match.end))
+        return matches
+
+    def concepts_in(self, text, kinds=None):
+        """Identifiants des concepts présents, dans l'ordre de première apparition"""
+        return list(dict.fromkeys(match.concept.id for match in self.find(text, kinds)))
+
+
+_matcher = None
+_matcher_lock = threading.Lock()
+
+
+def get_matcher():
+    """Vocabulaire compilé au premier appel (vocabulaire vide si le fichier est illisible)"""
+    global _matcher
+    with _matcher_lock:
+        if _matcher is None:
+            try:
+                _matcher = SynonymMatcher.from_file()
+                logger.info(f"Vocabulaire v{_matcher.version} compilé: {len(_matcher.concepts)} concepts, "
+                            f"{len(_matcher.patterns)} alias, {len(_matcher.automaton)} états")
+            except (OSError, ValueError) as e:
+                logger.error(f"❌ Vocabulaire des synonymes illisible ({SYNONYMS_PATH}): {e}")
+                _matcher = SynonymMatcher({})
+        return _matcher
@@ -0,0 +1,81 @@
+"""
+Normalisation de texte partagée (requêtes utilisateur, champs du CSV).
+"""
+import re
+import unicodedata
+
+# Formules sans valeur pour la recherche ("j'ai", "je souffre de", ...), déjà sans accents
+STOP_PHRASES = [
+    "je pense que j ai", "je crois que j ai", "je pense que", "je crois que",
+    "je souffre de", "je souffre d", "je suis atteint de", "je suis atteinte de",
+    "j ai", "traitement pour", "traitement contre", "remede pour", "remede contre",
+    "soigner", "guerir", "s il vous plait", "svp", "bonjour", "bonsoir",
+]
+
+# Mots outils ignorés dans la forme canonique
+STOP_WORDS = {
+    "le", "la", "les", "l", "un", "une", "des", "du", "de", "d", "et", "ou",
+    "a", "au", "aux", "en", "mon", "ma", "mes", "me", "m", "tres", "beaucoup",
+}
+
+# Formes irrégulières ramenées à leur radical
+IRREGULAR_STEMS = {"maux": "mal", "yeux": "oeil"}
+
+_NON_WORD = re.compile(r"[^\w]+")
+_STOP_PHRASES_PATTERN = re.compile(
+    r"\b(?:" + "|".join(re.escape(p) for p in sorted(STOP_PHRASES, key=len, reverse=True)) + r")\b"
+)
+
+
+def fold_text(text):
+    """Minuscules sans accents: "Fièvre" -> "fievre" """
+    if not text:
+        return ""
+    decomposed = unicodedata.normalize("NFKD", str(text).casefold())
+    return "".join(c for c in decomposed if not unicodedata.combining(c))
+
+
+def tokenize(text):
+    """Découpe un texte replié (sans accents ni ponctuation) en mots"""
+    return [t for t in _NON_WORD.sub(" ", fold_text(text)).replace("_", " ").split() if t]
+
+
+def normalize_symptoms(symptoms):
+    """Forme canonique d'une description de symptômes (clé de cache, recherche lexicale)"""
+    text = " ".join(tokenize(symptoms))
+    text = _STOP_PHRASES_PATTERN.sub(" ", text)
+    return " ".join(t for t in text.split() if t not in STOP_WORDS)
+
+
+def stem(token):
+    """
+    Racinisation légère français/anglais d'un mot déjà replié, sans dépendance:
+    pluriels et quelques suffixes médicaux rapprochés entre les deux langues
+    ("otitis"/"otite" -> "otit", "gastric"/"gastrique" -> "gastric", "douleurs" -> "douleur").
+    """
+    if token in IRREGULAR_STEMS:
+        return IRREGULAR_STEMS[token]
+    if len(token) <= 3:
+        return token
+    if token.endswith("itis"):
+        token = token[:-2] + "e"
+    elif token.endswith("ies") and len(token) > 4:
+        token = token[:-3] + "y"
+    elif token.endswith("aux") and len(token) > 4:
+        token = token[:-3] + "al"
+    elif token.endswith("s") and not token.endswith(("ss", "us", "is")):
+        token = token[:-1]
+    if token.endswith("ing") and len(token) > 5:
+        token = token[:-3]
+    if token.endswith("ique"):
+        token = token[:-3] + "c"
+    if token.endswith("ie") and len(token) > 4:
+        return token[:-2] + "y"
+    if token.endswith("e") and len(token) > 4:
+        token = token[:-1]
+    return token
+
+
+def index_terms(text):
+    """Termes d'indexation d'un texte: mots repliés, sans mots outils, racinisés"""
+    return [stem(t) for t in tokenize(text) if t not in STOP_WORDS]
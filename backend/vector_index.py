@@ -0,0 +1,444 @@
+"""
+Index vectoriel natif (FAISS) avec un format disque versionné.
+
+Disposition sur disque d'un index (ex: data/index_hf/):
+
+    manifest.json                  -> manifeste JSON (version, modèle, build courant)
+    <build_id>/index.faiss         -> index FAISS brut, chargé en mmap
+    <build_id>/doc_id.npy          -> colonne des identifiants FAISS (triée)
+    <build_id>/row_index.npy       -> ligne du CSV source de chaque document (int32)
+    <build_id>/content_hash.npy    -> empreinte du contenu de chaque document
+    <build_id>/text_offsets.npy    -> offsets du texte des documents
+    <build_id>/text.bin            -> texte des documents concaténé (UTF-8)
+
+Tous les fichiers d'un build sont ouverts en lecture seule avec mmap: plusieurs
+workers uvicorn partagent les mêmes pages du cache système, et ni le temps de
+chargement ni la RSS par worker ne croissent avec la taille du corpus.
+Le manifeste est publié en dernier (remplacement atomique), un lecteur voit
+donc toujours un build complet. Seuls les builds terminés (marqueur .complete) et
+antérieurs au build précédent sont supprimés: plusieurs workers peuvent construire en
+parallèle sans effacer le build en cours d'écriture d'un autre.
+
+Les empreintes de contenu permettent une ré-indexation incrémentale: seuls les
+documents ajoutés ou modifiés sont re-vectorisés, les vecteurs des autres sont recopiés
+depuis le build précédent et les documents supprimés ne sont simplement pas réécrits.
+
+Un build complet s'écrit par lots (IndexWriter): chaque lot de documents est vectorisé
+puis ajouté à l'index, et son texte est écrit directement dans text.bin. La mémoire
+crête ne dépend que de la taille d'un lot et des vecteurs de l'index, pas du nombre
+de documents à lire (voir ingest.py pour l'ingestion en flux d'un grand CSV).
+"""
+import hashlib
+import json
+import logging
+import os
+import shutil
+import time
+import uuid
+
+import faiss
+import numpy as np
+from langchain_core.documents import Document
+
+import query_cache
+
+logger = logging.getLogger(__name__)
+
+INDEX_FORMAT_VERSION = 2
+MANIFEST_FILENAME = "manifest.json"
+
+INDEX_FILENAME = "index.faiss"
+DOC_ID_FILENAME = "doc_id.npy"
+ROW_INDEX_FILENAME = "row_index.npy"
+CONTENT_HASH_FILENAME = "content_hash.npy"
+TEXT_OFFSETS_FILENAME = "text_offsets.npy"
+TEXT_FILENAME = "text.bin"
+
+# Marqueur d'un build entièrement écrit (posé juste avant la publication du manifeste)
+COMPLETE_MARKER = ".complete"
+# Build incomplet plus ancien: abandonné par un processus interrompu, supprimable
+STALE_BUILD_AGE = float(os.getenv("STALE_BUILD_AGE", "3600"))
+
+# Taille des lots passés au modèle d'embeddings lors d'un build
+EMBED_BATCH_SIZE = int(os.getenv("EMBED_BATCH_SIZE", "256"))
+
+# Lecture mmap des codes des index plats quand la version de FAISS le permet
+_MMAP_FLAGS = getattr(faiss, "IO_FLAG_MMAP_IFC", faiss.IO_FLAG_MMAP) | faiss.IO_FLAG_READ_ONLY
+
+
+def content_hash(text):
+    """Empreinte (blake2b 128 bits) du contenu d'un document"""
+    return hashlib.blake2b(text.encode("utf-8"), digest_size=16).digest()
+
+
+def _as_matrix(vectors):
+    """Convertit une liste d'embeddings en matrice float32 normalisée (similarité cosinus)"""
+    matrix = np.ascontiguousarray(np.asarray(vectors, dtype="float32"))
+    if matrix.ndim == 1:
+        matrix = matrix.reshape(1, -1)
+    faiss.normalize_L2(matrix)
+    return matrix
+
+
+class ColumnarDocstore:
+    """Docstore en colonnes: identifiants, lignes du CSV, empreintes et texte, le tout en mmap"""
+
+    def __init__(self, doc_ids, row_index, content_hashes, text_offsets, text):
+        self.doc_ids = doc_ids
+        self.row_index = row_index
+        self.content_hashes = content_hashes
+        self.text_offsets = text_offsets
+        self.text = text
+
+    @classmethod
+    def load(cls, build_dir):
+        doc_ids = np.load(os.path.join(build_dir, DOC_ID_FILENAME), mmap_mode="r")
+        row_index = np.load(os.path.join(build_dir, ROW_INDEX_FILENAME), mmap_mode="r")
+        content_hashes = np.load(os.path.join(build_dir, CONTENT_HASH_FILENAME), mmap_mode="r")
+        text_offsets = np.load(os.path.join(build_dir, TEXT_OFFSETS_FILENAME), mmap_mode="r")
+        text_path = os.path.join(build_dir, TEXT_FILENAME)
+        if os.path.getsize(text_path) > 0:
+            text = np.memmap(text_path, dtype="uint8", mode="r")
+        else:
+            text = np.zeros(0, dtype="uint8")
+        return cls(doc_ids, row_index, content_hashes, text_offsets, text)
+
+    def __len__(self):
+        return len(self.doc_ids)
+
+    def position(self, doc_id):
+        """Position d'un identifiant FAISS dans les colonnes, ou None"""
+        pos = int(np.searchsorted(self.doc_ids, doc_id))
+        if pos < len(self.doc_ids) and self.doc_ids[pos] == doc_id:
+            return pos
+        return None
+
+    def text_at(self, pos):
+        start, end = int(self.text_offsets[pos]), int(self.text_offsets[pos + 1])
+        return bytes(self.text[start:end]).decode("utf-8")
+
+    def document_at(self, pos):
+        return Document(
+            page_content=self.text_at(pos),
+            metadata={"index": int(self.row_index[pos]), "doc_id": int(self.doc_ids[pos])}
+        )
+
+
+class VectorIndex:
+    """Index FAISS + docstore en colonnes, interrogeable comme un vectorstore LangChain"""
+
+    def __init__(self, index, docstore, manifest, embeddings):
+        self.index = index
+        self.docstore = docstore
+        self.manifest = manifest
+        self.embeddings = embeddings
+
+    @property
+    def build_id(self):
+        return self.manifest.get("build_id")
+
+    def __len__(self):
+        return self.index.ntotal
+
+    def similarity_search_by_vector_with_score(self, embedding, k=4):
+        if self.index.ntotal == 0:
+            return []
+        scores, ids = self.index.search(_as_matrix(embedding), min(k, self.index.ntotal))
+        results = []
+        for score, doc_id in zip(scores[0], ids[0]):
+            if doc_id < 0:
+                continue
+            pos = self.docstore.position(doc_id)
+            if pos is not None:
+                results.append((self.docstore.document_at(pos), float(score)))
+        return results
+
+    def similarity_search_with_score(self, query, k=4):
+        """
+        Recherche top-k, à travers les caches de requêtes (vecteurs et résultats).
+        C'est la forme normalisée (clé des caches) qui est vectorisée: toutes les écritures
+        d'une même requête ("J'ai le PALUDISME !!", "paludisme") ont le même vecteur et les
+        mêmes résultats, quel que soit l'ordre d'arrivée.
+        """
+        key = query_cache.query_key(query)
+        results_key = (self.build_id, key, k)
+        results = query_cache.query_results.get(results_key)
+        if results is not None:
+            return list(results)
+
+        vector_key = (self.manifest.get("embedding_model"), key)
+        vector = query_cache.query_vectors.get(vector_key)
+        if vector is None:
+            vector = self.embeddings.embed_query(key)
+            query_cache.query_vectors.put(vector_key, vector)
+
+        results = self.similarity_search_by_vector_with_score(vector, k=k)
+        query_cache.query_results.put(results_key, results)
+        return list(results)
+
+    def similarity_search(self, query, k=4):
+        return [doc for doc, _ in self.similarity_search_with_score(query, k=k)]
+
+
+def manifest_path(index_dir):
+    return os.path.join(index_dir, MANIFEST_FILENAME)
+
+
+def read_manifest(index_dir):
+    """Lit le manifeste d'un index, retourne None s'il est absent ou illisible"""
+    try:
+        with open(manifest_path(index_dir), "r", encoding="utf-8") as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        return None
+
+    if manifest.get("format_version") != INDEX_FORMAT_VERSION:
+        logger.warning(
+            f"Format d'index {manifest.get('format_version')} incompatible "
+            f"(attendu: {INDEX_FORMAT_VERSION}) dans {index_dir}"
+        )
+        return None
+    return manifest
+
+
+def write_manifest(index_dir, manifest):
+    """Publie le manifeste de manière atomique"""
+    tmp_path = manifest_path(index_dir) + f".{os.getpid()}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=2)
+    os.replace(tmp_path, manifest_path(index_dir))
+
+
+def _last_modified(build_dir):
+    """Dernière écriture dans un build (text.bin grossit pendant un build en flux)"""
+    entries = [build_dir] + [os.path.join(build_dir, name) for name in os.listdir(build_dir)]
+    return max(os.path.getmtime(entry) for entry in entries)
+
+
+def _cleanup_old_builds(index_dir, keep_build_ids):
+    """
+    Supprime les builds obsolètes (les workers qui les ont en mmap gardent leurs pages).
+    Seuls les builds terminés sont supprimés, hors keep_build_ids (build publié et précédent):
+    un build en cours d'écriture par un autre worker n'a pas de marqueur et reste intact,
+    sauf s'il n'a plus été modifié depuis STALE_BUILD_AGE secondes.
+    """
+    for name in os.listdir(index_dir):
+        path = os.path.join(index_dir, name)
+        if name in keep_build_ids or not os.path.isdir(path):
+            continue
+        try:
+            complete = os.path.exists(os.path.join(path, COMPLETE_MARKER))
+            if complete or time.time() - _last_modified(path) > STALE_BUILD_AGE:
+                shutil.rmtree(path, ignore_errors=True)
+        except OSError:
+            # Build supprimé entre-temps par un autre worker
+            continue
+
+
+def _new_build_dir(index_dir):
+    os.makedirs(index_dir, exist_ok=True)
+    build_id = f"{int(time.time())}-{uuid.uuid4().hex[:8]}"
+    build_dir = os.path.join(index_dir, build_id)
+    os.makedirs(build_dir)
+    return build_id, build_dir
+
+
+def _publish_build(index_dir, build_id, index, manifest):
+    """Complète le manifeste d'un build écrit, le publie et supprime les anciens builds"""
+    manifest = dict(manifest)
+    manifest.update({
+        "format_version": INDEX_FORMAT_VERSION,
+        "build_id": build_id,
+        "metric": "cosine",
+        "dimension": index.d,
+        "document_count": int(index.ntotal),
+        "created_at": time.time(),
+    })
+    previous = read_manifest(index_dir)
+    open(os.path.join(index_dir, build_id, COMPLETE_MARKER), "w").close()
+    write_manifest(index_dir, manifest)
+    # Le build précédent peut encore être en cours de chargement par un autre worker
+    _cleanup_old_builds(index_dir, {build_id, previous.get("build_id") if previous else None})
+    return manifest
+
+
+def batched(items, size):
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+class IndexWriter:
+    """
+    Écrit un nouveau build lot par lot sans garder les documents en mémoire: le texte
+    de chaque lot est ajouté à text.bin, ses vecteurs à l'index FAISS, et seules les
+    petites colonnes (ligne, empreinte, offset) sont conservées jusqu'au commit.
+    Les identifiants FAISS sont attribués dans l'ordre d'écriture (colonnes déjà triées).
+
+    reuse_from: répertoire d'un build précédent du même modèle d'embeddings; les vecteurs
+    des documents dont l'empreinte y figure sont recopiés au lieu d'être recalculés.
+    """
+
+    def __init__(self, index_dir, embeddings, reuse_from=None, batch_size=EMBED_BATCH_SIZE):
+        self.index_dir = index_dir
+        self.embeddings = embeddings
+        self.batch_size = batch_size
+        self.build_id, self.build_dir = _new_build_dir(index_dir)
+        self.index = None
+        self.count = 0
+        self.stats = {"reused": 0, "added": 0, "removed": 0}
+        self._text_file = open(os.path.join(self.build_dir, TEXT_FILENAME), "wb")
+        self._text_size = 0
+        self._row_index, self._hashes, self._offsets = [], [], [np.zeros(1, dtype="int64")]
+        self._previous = None
+        if reuse_from is not None:
+            self._open_previous(reuse_from)
+
+    def _open_previous(self, build_dir):
+        index = faiss.read_index(os.path.join(build_dir, INDEX_FILENAME), _MMAP_FLAGS)
+        if not hasattr(index, "id_map"):
+            return
+        docstore = ColumnarDocstore.load(build_dir)
+        hashes = np.asarray(docstore.content_hashes)
+        by_hash = np.argsort(hashes, kind="stable")
+        # Position de chaque identifiant dans l'index plat sous-jacent
+        id_map = faiss.vector_to_array(index.id_map)
+        by_id = np.argsort(id_map, kind="stable")
+        positions = by_id[np.searchsorted(id_map[by_id], np.asarray(docstore.doc_ids)[by_hash])]
+        self._previous = (index, hashes[by_hash], positions)
+
+    def _reused_vectors(self, hashes):
+        """(masque des documents réutilisables, leurs vecteurs) d'après le build précédent"""
+        if self._previous is None or not len(self._previous[1]):
+            return np.zeros(len(hashes), dtype=bool), None
+        index, sorted_hashes, positions = self._previous
+        found = np.minimum(np.searchsorted(sorted_hashes, hashes), len(sorted_hashes) - 1)
+        mask = sorted_hashes[found] == hashes
+        if not mask.any():
+            return mask, None
+        return mask, index.index.reconstruct_batch(positions[found[mask]])
+
+    def _embed(self, texts):
+        """Vectorise des textes par lots, une seule fois par texte distinct"""
+        unique = list(dict.fromkeys(texts))
+        vectors = np.concatenate([
+            _as_matrix(self.embeddings.embed_documents(batch)) for batch in batched(unique, self.batch_size)
+        ])
+        slot = {text: i for i, text in enumerate(unique)}
+        return vectors[[slot[text] for text in texts]]
+
+    def add(self, documents):
+        """Vectorise (ou réutilise) un lot de documents et l'ajoute au build"""
+        if not documents:
+            return
+        texts = [doc.page_content for doc in documents]
+        hashes = np.asarray([content_hash(t) for t in texts], dtype="S16")
+        reused, reused_vectors = self._reused_vectors(hashes)
+        missing = np.flatnonzero(~reused)
+
+        embedded = self._embed([texts[i] for i in missing]) if len(missing) else None
+        dimension = (embedded if embedded is not None else reused_vectors).shape[1]
+        vectors = np.empty((len(texts), dimension), dtype="float32")
+        if reused_vectors is not None:
+            vectors[reused] = reused_vectors
+        if embedded is not None:
+            vectors[missing] = embedded
+
+        if self.index is None:
+            self.index = faiss.IndexIDMap2(faiss.IndexFlatIP(dimension))
+        self.index.add_with_ids(vectors, np.arange(self.count, self.count + len(texts), dtype="int64"))
+
+        encoded = [t.encode("utf-8") for t in texts]
+        for b in encoded:
+            self._text_file.write(b)
+        self._offsets.append(self._text_size + np.cumsum([len(b) for b in encoded], dtype="int64"))
+        self._text_size = int(self._offsets[-1][-1])
+        self._row_index.append(np.asarray(
+            [int(doc.metadata.get("index", self.count + i)) for i, doc in enumerate(documents)], dtype="int32"
+        ))
+        self._hashes.append(hashes)
+        self.count += len(texts)
+        self.stats["reused"] += int(reused.sum())
+        self.stats["added"] += len(missing)
+
+    def commit(self, manifest=None):
+        """Écrit les colonnes et l'index, puis publie le manifeste du build"""
+        self._text_file.close()
+        if self.index is None:
+            self.abort()
+            raise ValueError("Aucun document à indexer")
+        if self._previous is not None:
+            # Documents du build précédent dont l'empreinte n'apparaît plus (un même texte
+            # partagé par plusieurs documents n'est compté qu'une fois dans reused)
+            self.stats["removed"] = int(np.isin(self._previous[1], np.concatenate(self._hashes), invert=True).sum())
+
+        np.save(os.path.join(self.build_dir, DOC_ID_FILENAME), np.arange(self.count, dtype="int64"))
+        np.save(os.path.join(self.build_dir, ROW_INDEX_FILENAME), np.concatenate(self._row_index))
+        np.save(os.path.join(self.build_dir, CONTENT_HASH_FILENAME), np.concatenate(self._hashes))
+        np.save(os.path.join(self.build_dir, TEXT_OFFSETS_FILENAME), np.concatenate(self._offsets))
+        faiss.write_index(self.index, os.path.join(self.build_dir, INDEX_FILENAME))
+
+        manifest = dict(manifest or {})
+        manifest["last_update"] = dict(self.stats)
+        return _publish_build(self.index_dir, self.build_id, self.index, manifest)
+
+    def abort(self):
+        """Abandonne le build en cours (le build publié reste intact)"""
+        self._text_file.close()
+        shutil.rmtree(self.build_dir, ignore_errors=True)
+
+
+def build_vector_index(documents, embeddings, index_dir, manifest=None):
+    """Vectorise tous les documents, écrit l'index sur disque et le recharge en mmap"""
+    return stream_vector_index(batched(documents, EMBED_BATCH_SIZE), embeddings, index_dir, manifest, reuse=False)
+
+
+def stream_vector_index(document_batches, embeddings, index_dir, manifest=None, reuse=True,
+                        batch_size=EMBED_BATCH_SIZE, progress=None):
+    """
+    Construit un build à partir d'un flux de lots de documents (générateur), puis le
+    recharge en mmap. Avec reuse, les vecteurs du build publié (même modèle) sont recopiés
+    pour les documents inchangés. progress(documents écrits, statistiques) après chaque lot.
+    """
+    manifest = dict(manifest or {})
+    previous = read_manifest(index_dir) if reuse else None
+    reuse_from = None
+    if previous is not None and previous.get("embedding_model") == manifest.get("embedding_model"):
+        reuse_from = os.path.join(index_dir, previous["build_id"])
+
+    start_time = time.time()
+    writer = IndexWriter(index_dir, embeddings, reuse_from=reuse_from, batch_size=batch_size)
+    try:
+        for documents in document_batches:
+            writer.add(documents)
+            if progress is not None:
+                progress(writer.count, writer.stats)
+        writer.commit(manifest)
+    except BaseException:
+        writer.abort()
+        raise
+    logger.info(
+        f"{writer.count} documents indexés en {time.time() - start_time:.2f}s "
+        f"({writer.stats['added']} vectorisés, {writer.stats['reused']} réutilisés, {writer.stats['removed']} supprimés)"
+    )
+    return load_vector_index(index_dir, embeddings)
+
+
+def update_vector_index(documents, embeddings, index_dir, manifest=None):
+    """
+    Met à jour l'index existant en ne vectorisant que les documents ajoutés ou modifiés
+    (même chemin de réutilisation que l'ingestion en flux). Reconstruit tout si aucun
+    index compatible (même modèle d'embeddings) n'existe.
+    """
+    return stream_vector_index(batched(documents, EMBED_BATCH_SIZE), embeddings, index_dir, manifest, reuse=True)
+
+
+def load_vector_index(index_dir, embeddings):
+    """Charge l'index courant en mmap, retourne None s'il n'existe pas"""
+    manifest = read_manifest(index_dir)
+    if manifest is None:
+        return None
+
+    build_dir = os.path.join(index_dir, manifest["build_id"])
+    index = faiss.read_index(os.path.join(build_dir, INDEX_FILENAME), _MMAP_FLAGS)
+    docstore = ColumnarDocstore.load(build_dir)
+    return VectorIndex(index, docstore, manifest, embeddings)
@@ -119,8 +119,8 @@ export default function AdminPage() {
 
       if (response.ok) {
         toast({
-          title: "Index reconstruit",
-          description: "L'index vectoriel a été reconstruit avec succès.",
+          title: "Reconstruction lancée",
+          description: "L'index vectoriel est reconstruit en arrière-plan, l'API reste disponible.",
         });
       } else {
         toast({
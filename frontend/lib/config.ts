@@ -13,7 +13,17 @@ export const API_ENDPOINTS = {
   chat: `${API_BASE_URL}/api/conversation/unified`,
   login: `${API_BASE_URL}/api/auth/login`,
   register: `${API_BASE_URL}/api/auth/register`,
-  admin: `${API_BASE_URL}/api/admin/config`
+  admin: `${API_BASE_URL}/api/admin/config`,
+  // Consultation en lecture seule (sans passer par le LLM)
+  plants: `${API_BASE_URL}/api/plants`,
+  compounds: `${API_BASE_URL}/api/compounds`,
+  parts: `${API_BASE_URL}/api/parts`,
+  localNames: `${API_BASE_URL}/api/local-names`,
+  // Autocomplétion de la saisie des symptômes
+  suggest: `${API_BASE_URL}/suggest`,
+  // Réponses en flux (Server-Sent Events)
+  recommendStream: `${API_BASE_URL}/recommend/stream`,
+  chatStream: `${API_BASE_URL}/chat/stream`
 }
 
 // Configuration de l'interface
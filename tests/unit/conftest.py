@@ -0,0 +1,62 @@
+"""
+Tests unitaires du backend: modules importés depuis backend/ et jeu de données
+data/baseplante.csv chargé une seule fois pour la session.
+"""
+import os
+import sys
+
+import numpy as np
+import pytest
+
+BACKEND_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), "backend")
+sys.path.insert(0, BACKEND_DIR)
+
+
+@pytest.fixture(scope="session")
+def dataset_df():
+    import dataset
+    return dataset.load_dataset(dataset.DEFAULT_CSV_PATH)
+
+
+class FakeEmbeddings:
+    """Vecteurs déterministes (sac de caractères), sans modèle; compte les textes vectorisés"""
+
+    def __init__(self):
+        self.embedded = 0
+
+    def embed_documents(self, texts):
+        self.embedded += len(texts)
+        return [self.vector(text) for text in texts]
+
+    def embed_query(self, text):
+        self.embedded += 1
+        return self.vector(text)
+
+    @staticmethod
+    def vector(text):
+        vector = np.zeros(32, dtype="float32")
+        for char in text:
+            vector[ord(char) % 32] += 1
+        return vector
+
+
+@pytest.fixture
+def embeddings():
+    return FakeEmbeddings()
+
+
+@pytest.fixture(scope="session")
+def app_module():
+    """app importé avec des identifiants Supabase factices; config.json restauré après l'import"""
+    config_path = os.path.join(BACKEND_DIR, "config.json")
+    with open(config_path, "rb") as f:
+        config = f.read()
+    with pytest.MonkeyPatch.context() as patch:
+        for name in ("SUPABASE_URL", "SUPABASE_ANON_KEY", "SUPABASE_KEY"):
+            patch.setenv(name, os.environ.get(name, "http://localhost:1"))
+        try:
+            import app
+        finally:
+            with open(config_path, "wb") as f:
+                f.write(config)
+    return app
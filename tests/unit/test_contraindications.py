@@ -0,0 +1,46 @@
+import pandas as pd
+import pytest
+
+import contraindications
+import dataset
+import plant_store
+import retrieval
+
+
+@pytest.fixture(scope="module")
+def pregnancy_mask():
+    return contraindications.get_vocabulary().profile_mask(["enceinte"])
+
+
+def test_pregnancy_profile_excludes_rows_with_plant_level_pregnancy(dataset_df, pregnancy_mask):
+    store = plant_store.PlantStore.from_dataframe(dataset_df)
+    excluded = contraindications.excluded_rows(store.contraindication_flags, pregnancy_mask)
+
+    # "Cymbopogon citratus : pregnancy" dans des cellules qui contiennent aussi des plantes NULL
+    for row in (39, 106):
+        assert "Cymbopogon citratus :  pregnancy" in store[row].plant_contraindications
+        assert excluded[row]
+
+
+def test_pregnancy_profile_filters_search_results(dataset_df, pregnancy_mask):
+    retriever = retrieval.get_retriever(dataset_df)
+    query = plant_store.get_plant_store(dataset_df)[106].pathology
+
+    assert 106 in [hit.row for hit in retriever.search(query, vectorstore=None, k=5)]
+    assert 106 not in [hit.row for hit in retriever.search(query, vectorstore=None, k=5, profile_mask=pregnancy_mask)]
+
+
+def test_recipe_without_contraindications_is_kept(pregnancy_mask):
+    df = pd.DataFrame({column: ["", ""] for column in dataset.EXPECTED_COLUMNS})
+    df["maladiesoigneeparrecette"] = ["paludisme", "paludisme"]
+    df["plante_recette"] = ["Cymbopogon citratus", "Carica papaya"]
+    df["plante_contreindication"] = ["Cymbopogon citratus : pregnancy", "Carica papaya : NULL"]
+    retriever = retrieval.get_retriever(df)
+
+    assert [hit.row for hit in retriever.search("paludisme", vectorstore=None, k=3, profile_mask=pregnancy_mask)] == [1]
+    assert {hit.row for hit in retriever.search("paludisme", vectorstore=None, k=3)} == {0, 1}
+
+
+def test_unknown_profile_term_is_rejected():
+    with pytest.raises(ValueError):
+        contraindications.get_vocabulary().profile_mask(["martien"])
@@ -0,0 +1,36 @@
+import pandas as pd
+
+import dataset
+import plant_store
+import retrieval
+
+
+def test_serving_dataframe_keeps_only_columns_read_from_it(dataset_df):
+    compact = dataset.compact_for_serving(dataset_df)
+
+    assert list(compact.columns) == dataset.SERVING_COLUMNS
+    assert "plante_quantite_recette" not in compact
+    assert plant_store.get_plant_store(compact)[0].dosage == plant_store.PlantStore.from_dataframe(dataset_df)[0].dosage
+
+
+def test_documents_are_unchanged_by_the_trimmed_dataframe(dataset_df):
+    compact = dataset.compact_for_serving(dataset_df)
+
+    for granularity in ("row", "pair"):
+        full = retrieval.create_recipe_documents(dataset_df.fillna(""), granularity)
+        served = retrieval.create_recipe_documents(compact, granularity)
+        assert [doc.page_content for doc in served] == [doc.page_content for doc in full]
+
+
+def test_empty_cells_keep_their_display_default():
+    compact = dataset.compact_for_serving(pd.DataFrame({
+        "plante_recette": ["Carica papaya"],
+        "maladiesoigneeparrecette": ["paludisme"],
+        "plante_quantite_recette": [None],
+        "recette": ["Décoction"],
+    }))
+    record = plant_store.get_plant_store(compact)[0]
+
+    assert record.dosage == "Dosage non spécifié"
+    assert record.raw_text("dosage") == ""
+    assert retrieval.create_recipe_documents(compact, "row")[0].page_content.splitlines()[2] == "Dosage: "
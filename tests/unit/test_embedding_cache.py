@@ -0,0 +1,51 @@
+import embedding_cache
+from embedding_cache import CachedEmbeddings, EmbeddingStore
+
+
+def last_access(store, key):
+    return store._conn.execute("SELECT last_access FROM embeddings WHERE text_hash = ?", (key,)).fetchone()[0]
+
+
+def test_hits_misses_and_lru_eviction(tmp_path):
+    store = EmbeddingStore(str(tmp_path / "cache.sqlite"), max_entries=2)
+    store.put_many("m", [("a", [1.0, 0.0])])
+    store.put_many("m", [("b", [0.0, 1.0])])
+
+    written = last_access(store, "a")
+    assert store.get_many("m", ["a", "c"]) == {"a": [1.0, 0.0]}
+    # Le hit n'écrit rien tout de suite
+    assert last_access(store, "a") == written
+
+    # La date d'accès en tampon est écrite avant l'éviction: "b" (le moins récent) part
+    store.put_many("m", [("c", [1.0, 1.0])])
+    assert set(store.get_many("m", ["a", "b", "c"])) == {"a", "c"}
+
+    stats = store.stats()
+    assert (stats["hits"], stats["misses"], stats["evictions"], stats["entries"]) == (3, 2, 1, 2)
+
+
+def test_access_times_written_in_batches(tmp_path):
+    store = EmbeddingStore(str(tmp_path / "cache.sqlite"), access_batch=2, access_interval=3600)
+    store.put_many("m", [("a", [1.0]), ("b", [2.0])])
+    written = last_access(store, "a")
+
+    store.get_many("m", ["a"])
+    assert last_access(store, "a") == written
+    store.get_many("m", ["b"])
+    assert last_access(store, "a") > written and not store._accessed
+
+    store.get_many("m", ["a"])
+    store.flush()
+    assert not store._accessed
+
+
+def test_cached_embeddings_embed_each_text_once(tmp_path, embeddings):
+    store = EmbeddingStore(str(tmp_path / "cache.sqlite"))
+    cached = CachedEmbeddings(embeddings, "fake", store=store)
+
+    first = cached.embed_documents(["toux", "fièvre", "toux"])
+    assert embeddings.embedded == 2
+    again = cached.embed_documents(["fièvre ", "toux"])
+    assert [list(vector) for vector in again] == [list(first[1]), list(first[0])]
+    assert embeddings.embedded == 2
+    assert embedding_cache.text_key("fièvre ") == embedding_cache.text_key(" fièvre")
@@ -0,0 +1,55 @@
+import time
+
+from explanation_cache import ExplanationCache, ExplanationStore
+
+
+def last_access(store, key):
+    return store._conn.execute("SELECT last_access FROM explanations WHERE cache_key = ?", (key,)).fetchone()[0]
+
+
+def test_reads_do_not_write_and_eviction_keeps_recent_reads(tmp_path):
+    store = ExplanationStore(str(tmp_path / "explanations.sqlite"), max_entries=2)
+    now = time.time()
+    store.put("a", "hf", "v1", "explication a", {"resume": "a"}, now)
+    store.put("b", "hf", "v1", "explication b", {"resume": "b"}, now)
+
+    written = last_access(store, "a")
+    assert store.get("a") == ("explication a", {"resume": "a"}, now)
+    assert last_access(store, "a") == written
+
+    store.put("c", "hf", "v1", "explication c", {}, now)
+    assert store.get("b") is None
+    assert store.get("a") is not None and len(store) == 2
+    assert store.evictions == 1
+
+
+def test_access_times_written_in_batches(tmp_path):
+    store = ExplanationStore(str(tmp_path / "explanations.sqlite"), access_batch=2, access_interval=3600)
+    store.put("a", "hf", "v1", "a", {}, time.time())
+    store.put("b", "hf", "v1", "b", {}, time.time())
+    written = last_access(store, "a")
+
+    store.get("a")
+    assert last_access(store, "a") == written
+    store.get("b")
+    assert last_access(store, "a") > written
+
+    store.get("b")
+    store.flush()
+    assert not store._accessed
+
+
+def test_cache_generates_once_per_recipe_and_symptom_group(tmp_path):
+    cache = ExplanationCache(ExplanationStore(str(tmp_path / "explanations.sqlite")))
+    calls = []
+
+    def generate():
+        calls.append(1)
+        return "explication", {"resume": "r"}
+
+    inputs = {"plant": "Cymbopogon citratus"}
+    assert cache.get_or_generate("hf", "m", "gabarit", inputs, "toux sèche", generate) == ("explication", {"resume": "r"})
+    assert cache.get_or_generate("hf", "m", "gabarit", inputs, "Toux seche", generate) == ("explication", {"resume": "r"})
+    assert len(calls) == 1
+    cache.get_or_generate("hf", "m", "autre gabarit", inputs, "toux sèche", generate)
+    assert len(calls) == 2
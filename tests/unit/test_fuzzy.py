@@ -0,0 +1,33 @@
+import pandas as pd
+import pytest
+
+import fuzzy
+import retrieval
+
+pytest.importorskip("scipy")
+
+
+def test_edit_distance():
+    assert fuzzy.edit_distance("diarhee", "diarrhee") == 1
+    assert fuzzy.edit_distance("", "toux") == 4
+    assert fuzzy.edit_similarity("toux", "toux") == 1.0
+
+
+def test_trigrams_are_padded():
+    assert fuzzy.trigrams("toux") == [" to", "tou", "oux", "ux "]
+
+
+def test_typo_matches_closest_word():
+    matcher = fuzzy.FuzzyMatcher.from_values(["Diarrhée, dysenterie", "paludisme", "mal", None])
+
+    assert len(matcher) == 3  # "mal" est trop court pour le vocabulaire
+    assert matcher.match("diarhee", k=1) == [("diarrhee", 0.875)]
+    assert matcher.match("paludism", k=1)[0][0] == "paludisme"
+    assert matcher.match("xylophone") == []
+
+
+def test_retriever_corrects_typos_before_lexical_search():
+    retriever = retrieval.HybridRetriever(pd.DataFrame({"maladiesoigneeparrecette": ["diarrhée", "paludisme"]}))
+
+    assert retriever.correct_typos("diarhee") == {"diarhe": {"diarrhe": 0.875}}
+    assert [hit.row for hit in retriever.search("diarhee", k=1)] == [0]
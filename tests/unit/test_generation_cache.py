@@ -0,0 +1,78 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pandas as pd
+import pytest
+
+from generation_cache import GenerationCache
+
+
+def test_building_a_new_generation_does_not_block_the_current_one():
+    release = threading.Event()
+    started = threading.Event()
+    current, following = pd.DataFrame({"a": [1]}), pd.DataFrame({"a": [2]})
+
+    def build(df):
+        if df is following:
+            started.set()
+            assert release.wait(5)
+        return int(df["a"].iloc[0])
+
+    cache = GenerationCache(build)
+    assert cache.get(current) == 1
+
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        pending = executor.submit(cache.get, following)
+        assert started.wait(5)
+        # Construction de la génération suivante en cours: la courante reste servie
+        assert cache.get(current) == 1
+        release.set()
+        assert pending.result(5) == 2
+
+
+def test_concurrent_requests_build_once():
+    calls = []
+    gate = threading.Barrier(4)
+
+    def build(df):
+        calls.append(1)
+        return object()
+
+    cache = GenerationCache(build)
+    df = pd.DataFrame({"a": [1]})
+
+    def get():
+        gate.wait(5)
+        return cache.get(df)
+
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        results = [future.result(5) for future in [executor.submit(get) for _ in range(4)]]
+
+    assert len(calls) == 1
+    assert all(result is results[0] for result in results)
+
+
+def test_keeps_the_last_two_generations():
+    cache = GenerationCache(lambda df: len(df))
+    frames = [pd.DataFrame({"a": range(n)}) for n in (1, 2, 3)]
+    for df in frames:
+        cache.get(df)
+
+    assert len(cache) == 2
+    assert cache._cached(frames[0]) is None and cache._cached(frames[2]) == 3
+
+
+def test_failed_build_can_be_retried():
+    attempts = []
+
+    def build(df):
+        attempts.append(1)
+        if len(attempts) == 1:
+            raise RuntimeError("index illisible")
+        return "ok"
+
+    cache = GenerationCache(build)
+    df = pd.DataFrame({"a": [1]})
+    with pytest.raises(RuntimeError):
+        cache.get(df)
+    assert cache.get(df) == "ok"
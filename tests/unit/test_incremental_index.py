@@ -0,0 +1,70 @@
+from langchain_core.documents import Document
+
+import vector_index
+
+MANIFEST = {"embedding_model": "fake"}
+TEXTS = ["paludisme fièvre", "toux sèche", "diarrhée", "maux de tête"]
+
+
+def documents(texts):
+    return [Document(page_content=text, metadata={"index": i}) for i, text in enumerate(texts)]
+
+
+def test_content_hash_depends_only_on_text():
+    assert vector_index.content_hash("toux") == vector_index.content_hash("toux")
+    assert vector_index.content_hash("toux") != vector_index.content_hash("Toux")
+    assert len(vector_index.content_hash("toux")) == 16
+
+
+def test_unchanged_documents_are_not_embedded_again(tmp_path, embeddings):
+    vector_index.build_vector_index(documents(TEXTS), embeddings, str(tmp_path), MANIFEST)
+    embeddings.embedded = 0
+
+    index = vector_index.update_vector_index(documents(TEXTS), embeddings, str(tmp_path), MANIFEST)
+
+    assert embeddings.embedded == 0
+    assert index.manifest["last_update"] == {"reused": 4, "added": 0, "removed": 0}
+
+
+def test_added_and_deleted_documents(tmp_path, embeddings):
+    vector_index.build_vector_index(documents(TEXTS), embeddings, str(tmp_path), MANIFEST)
+    embeddings.embedded = 0
+
+    texts = TEXTS[1:] + ["insomnie"]
+    index = vector_index.update_vector_index(documents(texts), embeddings, str(tmp_path), MANIFEST)
+
+    assert embeddings.embedded == 1
+    assert index.manifest["last_update"] == {"reused": 3, "added": 1, "removed": 1}
+    assert len(index) == 4
+    # Chaque document renvoie toujours sa ligne du CSV
+    (document, _), = index.similarity_search_by_vector_with_score(embeddings.embed_query("insomnie"), k=1)
+    assert document.page_content == "insomnie" and document.metadata["index"] == 3
+
+
+def test_other_embedding_model_rebuilds_everything(tmp_path, embeddings):
+    vector_index.build_vector_index(documents(TEXTS), embeddings, str(tmp_path), MANIFEST)
+    embeddings.embedded = 0
+
+    vector_index.update_vector_index(documents(TEXTS), embeddings, str(tmp_path), {"embedding_model": "other"})
+
+    assert embeddings.embedded == len(TEXTS)
+
+
+def test_edited_row_counts(tmp_path, embeddings):
+    vector_index.build_vector_index(documents(TEXTS), embeddings, str(tmp_path), MANIFEST)
+    embeddings.embedded = 0
+
+    # La ligne 3 prend le texte de la ligne 0: rien à vectoriser, mais "maux de tête" disparaît
+    texts = TEXTS[:3] + [TEXTS[0]]
+    index = vector_index.update_vector_index(documents(texts), embeddings, str(tmp_path), MANIFEST)
+
+    assert embeddings.embedded == 0
+    assert index.manifest["last_update"] == {"reused": 4, "added": 0, "removed": 1}
+
+    texts[1] = "toux grasse"
+    index = vector_index.update_vector_index(documents(texts), embeddings, str(tmp_path), MANIFEST)
+
+    assert embeddings.embedded == 1
+    assert index.manifest["last_update"] == {"reused": 3, "added": 1, "removed": 1}
+    assert [document.metadata["index"] for document, _ in
+            index.similarity_search_by_vector_with_score(embeddings.embed_query("toux grasse"), k=1)] == [1]
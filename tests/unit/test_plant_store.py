@@ -0,0 +1,24 @@
+import pandas as pd
+
+import plant_store
+
+
+def test_drop_null_items_keeps_other_plants():
+    assert plant_store.drop_null_items("A : NULL; B : pregnancy") == "B : pregnancy"
+    assert plant_store.drop_null_items("A : null;B : Children under 12; C : NULL") == "B : Children under 12"
+    assert plant_store.drop_null_items("NULL") == ""
+    assert plant_store.drop_null_items("") == ""
+
+
+def test_mixed_plant_contraindication_cell_is_kept():
+    df = pd.DataFrame({
+        "plante_recette": ["A; B", "C"],
+        "plante_contreindication": ["A : NULL; B : pregnancy", "C : NULL"],
+        "recette_contreindication": ["", ""],
+    })
+    store = plant_store.PlantStore.from_dataframe(df)
+
+    assert store[0].plant_contraindications == "B : pregnancy"
+    assert store[0].contre_indications == "B : pregnancy"
+    assert store[1].plant_contraindications == ""
+    assert store[1].contre_indications == "Aucune contre-indication spécifiée"
@@ -0,0 +1,70 @@
+import asyncio
+
+import httpx
+import pytest
+
+import recommendation
+from reloader import Generation
+
+
+class Backend:
+    """Backend LLM factice: seul l'index vectoriel (présent ou non) compte ici"""
+    SIMILARITY_RANGE = (0.2, 0.7)
+
+    def __init__(self, vectorstore):
+        self._vectorstore = vectorstore
+        self.vectorstore = None
+
+    def load_or_build_vectorstore(self, df, csv_path):
+        return self._vectorstore
+
+
+def ready(app_module, monkeypatch, df, backend, requires_index=False):
+    """/ready après un pré-chargement terminé avec ce backend"""
+    monkeypatch.setattr(app_module, "llm_module", backend)
+    monkeypatch.setattr(app_module, "READY_REQUIRES_VECTOR_INDEX", requires_index)
+    monkeypatch.setitem(app_module.warmup_state, "status", "ready")
+    monkeypatch.setattr(app_module.reloader, "current", Generation(1, df, "", backend.vectorstore, backend))
+
+    async def get():
+        transport = httpx.ASGITransport(app=app_module.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            return await client.get("/ready")
+    return asyncio.run(get())
+
+
+@pytest.fixture
+def warm(dataset_df):
+    def warm(vectorstore):
+        backend = Backend(vectorstore)
+        return backend, recommendation.warm_up(backend, dataset_df, "")
+    return warm
+
+
+def test_missing_vector_index_is_reported_as_degraded(app_module, monkeypatch, dataset_df, warm):
+    backend, report = warm(None)
+    assert report["vector_index"] is False and "probe" in report["timings"]
+
+    response = ready(app_module, monkeypatch, dataset_df, backend)
+    assert response.status_code == 200
+    assert response.json()["status"] == "degraded"
+    assert response.json()["degraded"] is True and response.json()["vector_index"] is False
+
+    response = ready(app_module, monkeypatch, dataset_df, backend, requires_index=True)
+    assert response.status_code == 503
+
+
+def test_instance_with_vector_index_is_ready(app_module, monkeypatch, dataset_df, warm):
+    class EmptyVectorstore:
+        def __len__(self):
+            return 0
+
+        def similarity_search_with_score(self, query, k=4):
+            return []
+
+    backend, report = warm(EmptyVectorstore())
+    assert report["vector_index"] is True
+
+    response = ready(app_module, monkeypatch, dataset_df, backend, requires_index=True)
+    assert response.status_code == 200
+    assert response.json()["status"] == "ready" and response.json()["vector_index"] is True
@@ -0,0 +1,74 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+import explanation_cache
+import langchain_chains
+import recommendation
+
+
+class EmptyVectorstore:
+    def __len__(self):
+        return 0
+
+    def similarity_search_with_score(self, query, k=4):
+        return []
+
+
+def make_backend(generate_explanation):
+    """Backend LLM minimal: câblage attendu par recommendation.py, index vectoriel vide (recherche lexicale)"""
+    backend = SimpleNamespace(
+        BACKEND_NAME="test",
+        LLM_MODEL_ID="test-model",
+        template="{symptoms}",
+        SIMILARITY_RANGE=(0.2, 0.7),
+        create_fallback_sections=langchain_chains.create_fallback_sections,
+        fetch_image=lambda plant: f"https://images/{plant}",
+        generate_explanation=generate_explanation,
+        index_loads=0,
+    )
+
+    def load_or_build_vectorstore(df, csv_path):
+        backend.index_loads += 1
+        return EmptyVectorstore()
+
+    async def fetch_image_async(plant):
+        return backend.fetch_image(plant)
+
+    async def generate_explanation_async(symptoms, prompt_inputs):
+        return generate_explanation(symptoms, prompt_inputs)
+
+    backend.load_or_build_vectorstore = load_or_build_vectorstore
+    backend.fetch_image_async = fetch_image_async
+    backend.generate_explanation_async = generate_explanation_async
+    return backend
+
+
+@pytest.fixture(autouse=True)
+def no_explanation_cache(monkeypatch):
+    monkeypatch.setattr(explanation_cache, "get_explanation_cache", lambda: None)
+
+
+def test_backend_pieces_are_used_for_the_recommendation(dataset_df):
+    backend = make_backend(lambda symptoms, inputs: ("explication", {"resume": f"{inputs['plant_name']}"}))
+
+    result = recommendation.get_recommendation(backend, "paludisme", dataset_df)
+    again = asyncio.run(recommendation.get_recommendation_async(backend, "paludisme", dataset_df))
+
+    assert result == again
+    assert result["explanation"] == "explication"
+    assert result["resume_traitement"] == result["plant"]
+    assert result["image_url"] == f"https://images/{result['plant']}"
+    # Index global du backend chargé une seule fois, puis réutilisé
+    assert backend.index_loads == 1
+
+
+def test_failed_generation_uses_backend_fallback_sections(dataset_df):
+    def fail(symptoms, inputs):
+        raise Exception("LLM non disponible")
+
+    result = recommendation.get_recommendation(make_backend(fail), "paludisme", dataset_df)
+
+    assert result["diagnostic"] and result["resume_traitement"]
+    assert result["explanation"].startswith(result["diagnostic"])
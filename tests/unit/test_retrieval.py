@@ -0,0 +1,79 @@
+import pandas as pd
+import pytest
+from langchain_core.documents import Document
+
+import dataset
+import langchain_chains
+import recommendation
+import retrieval
+
+
+class StaticVectorstore:
+    """Résultats vectoriels fixés: [(ligne, similarité)]"""
+
+    def __init__(self, results):
+        self.results = results
+
+    def __len__(self):
+        return len(self.results)
+
+    def similarity_search_with_score(self, query, k=4):
+        return [(Document(page_content="", metadata={"index": row}), score) for row, score in self.results][:k]
+
+
+def recipes(pathologies):
+    df = pd.DataFrame({column: [""] * len(pathologies) for column in dataset.EXPECTED_COLUMNS})
+    df["maladiesoigneeparrecette"] = pathologies
+    return df
+
+
+def test_reciprocal_rank_fusion_rewards_agreement():
+    fused = retrieval.reciprocal_rank_fusion([[1, 2, 3], [3, 1]], k=60)
+
+    assert fused[1] == pytest.approx(1 / 61 + 1 / 62)
+    assert fused[3] == pytest.approx(1 / 63 + 1 / 61)
+    assert fused[2] == pytest.approx(1 / 62)
+    assert sorted(fused, key=fused.get, reverse=True) == [1, 3, 2]
+
+
+def test_bm25_ranks_by_term_frequency_and_idf():
+    bm25 = retrieval.BM25Index.from_dataframe(pd.DataFrame({
+        "maladiesoigneeparrecette": ["toux", "toux fièvre", "fièvre", "paludisme"],
+        "recette": ["", "", "fièvre", ""],
+    }))
+
+    assert [row for row, _, _ in bm25.search({"fievr": 1.0})] == [2, 1]
+
+    excluded = pd.Series([False, True, False, False]).to_numpy()
+    assert [row for row, _, _ in bm25.search({"toux": 1.0}, excluded=excluded)] == [0]
+
+
+def test_hybrid_search_fuses_lexical_and_vector_rankings():
+    retriever = retrieval.HybridRetriever(recipes(["toux", "paludisme", "toux sèche"]))
+    # Le vecteur préfère la ligne 2, BM25 la ligne 0; la ligne 1 n'est trouvée que par le vecteur
+    vectorstore = StaticVectorstore([(2, 0.9), (1, 0.3), (0, 0.5)])
+
+    hits = retriever.search("toux", vectorstore=vectorstore, k=3, similarity_range=(0.2, 0.7))
+
+    assert [hit.row for hit in hits] == [2, 0, 1]
+    assert hits[0].vector_score == 0.9 and hits[0].lexical_score is not None
+    assert hits[2].lexical_score is None
+    # Confiance: similarité ramenée sur la plage utile, ou couverture lexicale complète
+    assert hits[0].confidence == 1.0
+    assert hits[2].confidence == pytest.approx(0.2)
+
+
+def test_weak_match_gets_clarification_without_generation(dataset_df, monkeypatch):
+    def fail(*args, **kwargs):
+        raise AssertionError("aucune génération attendue sous le seuil de confiance")
+
+    monkeypatch.setattr(langchain_chains, "generate_explanation", fail)
+    vectorstore = StaticVectorstore([])
+
+    hits, response = recommendation.find_recipe(langchain_chains, "paludisme", dataset_df, vs=vectorstore)
+    assert response is None and hits[0].confidence >= retrieval.MIN_CONFIDENCE
+
+    monkeypatch.setattr(retrieval, "MIN_CONFIDENCE", 1.01)
+    hits, response = recommendation.find_recipe(langchain_chains, "paludisme", dataset_df, vs=vectorstore)
+    assert hits is None
+    assert response["plant"] == "Demande de précisions"
@@ -0,0 +1,49 @@
+from semantic_cache import SemanticCache, chat_cache_threshold, question_signature
+
+PLANT_WORDS = frozenset({"moringa", "neem"})
+ANSWER = "Le moringa est riche en vitamines et en minéraux."
+
+
+def ask(cache, question, embeddings):
+    cached, probe = cache.lookup(question, embeddings, PLANT_WORDS)
+    if cached is None:
+        cache.save(probe, ANSWER if "moringa" in question else "Le neem est un antiparasitaire reconnu.")
+    return cached
+
+
+def test_signature_uses_the_plant_words_given_by_the_caller():
+    assert question_signature("le moringa sert à quoi", PLANT_WORDS) != question_signature("le neem sert à quoi", PLANT_WORDS)
+    assert question_signature("le moringa sert à quoi") == question_signature("le neem sert à quoi")
+
+
+def test_other_plant_is_not_served_from_cache(embeddings):
+    # Seuil bas: les deux questions sont voisines, seul le garde-fou les sépare
+    cache = SemanticCache(threshold=0.5)
+
+    assert ask(cache, "le moringa sert à quoi", embeddings) is None
+    assert ask(cache, "le neem sert à quoi", embeddings) is None
+    assert cache.guard_rejections == 1
+    assert ask(cache, "le neem sert à quoi", embeddings) == "Le neem est un antiparasitaire reconnu."
+    assert ask(cache, "le moringa sert à quoi", embeddings) == ANSWER
+
+
+def test_exact_repeat_is_served_without_embedding(embeddings):
+    cache = SemanticCache(threshold=0.99)
+    ask(cache, "le moringa sert à quoi", embeddings)
+    embedded = embeddings.embedded
+
+    assert ask(cache, "Le moringa sert à quoi ?", embeddings) == ANSWER
+    assert embeddings.embedded == embedded
+    assert cache.stats()["exact_hits"] == 1
+
+
+def test_backend_threshold_overrides_the_shared_one(monkeypatch):
+    monkeypatch.delenv("CHAT_CACHE_THRESHOLD", raising=False)
+    monkeypatch.delenv("CHAT_CACHE_THRESHOLD_OPENAI", raising=False)
+    assert chat_cache_threshold("CHAT_CACHE_THRESHOLD_OPENAI", default=0.8) == 0.8
+
+    monkeypatch.setenv("CHAT_CACHE_THRESHOLD", "0.9")
+    assert chat_cache_threshold("CHAT_CACHE_THRESHOLD_OPENAI", default=0.8) == 0.9
+
+    monkeypatch.setenv("CHAT_CACHE_THRESHOLD_OPENAI", "0.75")
+    assert chat_cache_threshold("CHAT_CACHE_THRESHOLD_OPENAI", default=0.8) == 0.75
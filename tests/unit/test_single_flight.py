@@ -0,0 +1,139 @@
+import asyncio
+import copy
+
+import pytest
+
+import single_flight
+from single_flight import SingleFlight
+
+pytest.importorskip("pytest_asyncio")
+
+
+@pytest.mark.asyncio
+async def test_concurrent_identical_calls_share_one_computation():
+    flight = SingleFlight("test")
+    started = []
+
+    async def compute():
+        started.append(1)
+        await asyncio.sleep(0.05)
+        return {"plant": "Moringa"}
+
+    first, second = await asyncio.gather(flight.do("k", compute), flight.do("k", compute))
+
+    assert first is second
+    assert len(started) == 1
+    assert (flight.calls, flight.coalesced, flight.max_waiters) == (1, 1, 2)
+    assert flight.stats()["in_flight"] == 0 and flight.stats()["saved_ratio"] == 0.5
+
+
+@pytest.mark.asyncio
+async def test_other_keys_are_computed_separately():
+    flight = SingleFlight("test")
+
+    async def compute(value):
+        await asyncio.sleep(0.01)
+        return value
+
+    assert await asyncio.gather(flight.do("a", lambda: compute(1)), flight.do("b", lambda: compute(2))) == [1, 2]
+    assert (flight.calls, flight.coalesced) == (2, 0)
+
+
+@pytest.mark.asyncio
+async def test_exception_reaches_every_waiter_and_frees_the_key():
+    flight = SingleFlight("test")
+
+    async def fail():
+        await asyncio.sleep(0.05)
+        raise ValueError("LLM indisponible")
+
+    results = await asyncio.gather(flight.do("k", fail), flight.do("k", fail), return_exceptions=True)
+
+    assert [type(result) for result in results] == [ValueError, ValueError]
+    assert flight.failures == 1 and not flight.inflight
+
+    async def succeed():
+        return "ok"
+
+    assert await flight.do("k", succeed) == "ok"
+    assert flight.calls == 2
+
+
+@pytest.mark.asyncio
+async def test_cancelling_a_waiter_does_not_cancel_the_shared_task():
+    flight = SingleFlight("test")
+    release = asyncio.Event()
+
+    async def compute():
+        await release.wait()
+        return "réponse"
+
+    first = asyncio.ensure_future(flight.do("k", compute))
+    second = asyncio.ensure_future(flight.do("k", compute))
+    await asyncio.sleep(0)
+
+    # Le client de la première requête se déconnecte
+    first.cancel()
+    release.set()
+
+    assert await second == "réponse"
+    assert first.cancelled()
+    assert flight.failures == 0
+
+
+@pytest.mark.asyncio
+async def test_disabled_coalescing_calls_directly(monkeypatch):
+    monkeypatch.setattr(single_flight, "SINGLE_FLIGHT_ENABLED", False)
+    started = []
+
+    async def compute():
+        started.append(1)
+        await asyncio.sleep(0.01)
+        return len(started)
+
+    await asyncio.gather(single_flight.coalesce("disabled", "k", compute),
+                         single_flight.coalesce("disabled", "k", compute))
+    assert len(started) == 2
+
+
+class SlowBackend:
+    """Backend LLM factice: une recommandation et une réponse de chat partagées, lentes"""
+    __name__ = "slow_backend"
+
+    def __init__(self):
+        self.recommendation = {
+            "plant": "Moringa oleifera", "dosage": "10 g", "prep": "Infusion", "image_url": "",
+            "explanation": "Explication", "alternatives": [{"rank": 1, "plant": "Moringa oleifera"}],
+        }
+        self.calls = 0
+
+    async def get_recommendation_async(self, symptoms, df, csv_path, attempt_count=1, vs=None, profile_mask=0):
+        self.calls += 1
+        await asyncio.sleep(0.05)
+        return self.recommendation
+
+    async def generate_chat_response_async(self, message, plant_words=frozenset()):
+        self.calls += 1
+        await asyncio.sleep(0.05)
+        return "Le moringa est riche en vitamines."
+
+
+@pytest.mark.asyncio
+async def test_handlers_leave_the_shared_result_unmodified(app_module, monkeypatch):
+    import httpx
+
+    backend = SlowBackend()
+    monkeypatch.setattr(app_module, "llm_module", backend)
+    snapshot = copy.deepcopy(backend.recommendation)
+
+    transport = httpx.ASGITransport(app=app_module.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        responses = await asyncio.gather(*(client.post("/recommend", json={"symptoms": "fatigue"}) for _ in range(3)))
+        chats = await asyncio.gather(*(client.post("/chat", json={"message": "le moringa sert à quoi"}) for _ in range(2)))
+
+    assert backend.calls == 2
+    assert [response.status_code for response in responses] == [200, 200, 200]
+    assert all(response.json() == responses[0].json() for response in responses)
+    assert responses[0].json()["plant"] == "Moringa oleifera"
+    assert backend.recommendation == snapshot
+    assert chats[0].json()["response"] == chats[1].json()["response"] == "Le moringa est riche en vitamines."
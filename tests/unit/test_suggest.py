@@ -0,0 +1,39 @@
+from suggest import Suggestion, SuggestionTrie
+
+
+def labels(suggestions):
+    return [suggestion.label for suggestion in suggestions]
+
+
+def trie(top_k=10):
+    return SuggestionTrie([
+        Suggestion("paludisme", "pathology", "paludisme", 3),
+        Suggestion("palu", "symptom", "palu", 3),
+        Suggestion("pallier", "local_name", "Carica papaya", 9),
+        Suggestion("ulcère gastrique", "pathology", "ulcère gastrique", 1),
+        Suggestion("gastro-entérite", "pathology", "gastro-entérite", 2),
+        Suggestion("toux", "pathology", "toux", 5),
+    ], top_k=top_k)
+
+
+def test_affections_rank_before_local_names_then_by_weight():
+    # Poids égal: la pathologie passe avant l'alias; le nom local vient en dernier malgré son poids
+    assert labels(trie().complete("pal")) == ["paludisme", "palu", "pallier"]
+    assert labels(trie().complete("pa")) == ["paludisme", "palu", "pallier"]
+
+
+def test_prefix_is_folded_and_matches_any_word():
+    assert labels(trie().complete("GASTR")) == ["gastro-entérite", "ulcère gastrique"]
+    assert labels(trie().complete("ulcere g")) == ["ulcère gastrique"]
+    assert labels(trie().complete("gastrique")) == ["ulcère gastrique"]
+
+
+def test_limit_top_k_and_unknown_prefix():
+    assert labels(trie().complete("pal", limit=1)) == ["paludisme"]
+    assert labels(trie(top_k=2).complete("pal")) == ["paludisme", "palu"]
+    assert trie().complete("zz") == []
+    assert trie().complete("  ") == []
+
+
+def test_label_indexed_from_several_words_is_returned_once():
+    assert labels(SuggestionTrie([Suggestion("toux toux", "pathology", "toux", 1)]).complete("t")) == ["toux toux"]
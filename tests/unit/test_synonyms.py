@@ -0,0 +1,45 @@
+import synonyms
+from synonyms import AhoCorasick, Concept, SynonymMatcher
+
+
+def matcher():
+    return SynonymMatcher({
+        "fever": Concept("fever", "symptom", ["fièvre", "forte fièvre", "fever"], ["fièvre"]),
+        "headache": Concept("headache", "symptom", ["mal de tête", "maux de tête"], ["céphalée"]),
+        "greeting": Concept("greeting", "intent", ["bonjour"], []),
+    })
+
+
+def test_automaton_reports_overlapping_patterns():
+    automaton = AhoCorasick(["he", "she", "hers"])
+
+    found = sorted((end - length, end, pattern_id) for end, pattern_id, length in automaton.iter("ushers"))
+    assert found == [(1, 4, 1), (2, 4, 0), (2, 6, 2)]
+
+
+def test_fold_with_offsets_points_back_to_original_text():
+    folded, offsets = synonyms.fold_with_offsets("Fièvre, Œil")
+    assert folded == "fievre  œil"
+    assert len(offsets) == len(folded)
+    assert offsets[folded.index("œ")] == 8
+
+
+def test_match_offsets_refer_to_original_text():
+    text = "Bonjour, j'ai une FORTE fièvre et des maux de tête."
+    matches = matcher().find(text)
+
+    assert [(m.concept.id, text[m.start:m.end]) for m in matches] == [
+        ("greeting", "Bonjour"),
+        ("fever", "FORTE fièvre"),
+        ("fever", "fièvre"),
+        ("headache", "maux de tête"),
+    ]
+
+
+def test_only_whole_words_match():
+    assert matcher().find("feverish") == []
+    assert matcher().concepts_in("fever, fièvre") == ["fever"]
+
+
+def test_kinds_filter():
+    assert matcher().concepts_in("bonjour, fièvre", kinds={"symptom"}) == ["fever"]
@@ -0,0 +1,39 @@
+import pandas as pd
+
+import retrieval
+from text_utils import fold_text, index_terms, normalize_symptoms, stem
+
+
+def test_fold_text_removes_accents_and_case():
+    assert fold_text("Fièvre") == "fievre"
+    assert fold_text("ÉRUPTION cutanée") == "eruption cutanee"
+    assert fold_text(None) == ""
+
+
+def test_normalize_symptoms_drops_stop_phrases():
+    assert normalize_symptoms("Bonjour, j'ai de la fièvre et des maux de tête") == "fievre maux tete"
+
+
+def test_stem_brings_french_and_english_forms_together():
+    assert stem("otitis") == stem("otite") == "otit"
+    assert stem("gastric") == stem("gastrique") == "gastric"
+    assert stem("douleurs") == stem("douleur") == "douleur"
+    assert stem("maux") == "mal"
+    assert stem("yeux") == "oeil"
+    assert stem("toux") == "toux"
+
+
+def test_index_terms_fold_and_stem():
+    assert index_terms("Diarrhées et douleurs") == index_terms("diarrhee, douleur")
+
+
+def test_keyword_match_intersects_then_falls_back_to_union():
+    retriever = retrieval.HybridRetriever(pd.DataFrame({
+        "maladiesoigneeparrecette": ["toux", "toux, fièvre", "fièvres", "paludisme"],
+    }))
+    bm25 = retriever.bm25
+
+    assert list(bm25.match(["toux", "fievr"], "and")) == [1]
+    assert list(bm25.match(["toux", "fievr"], "or")) == [0, 1, 2]
+    assert list(bm25.match(["toux", "inconnu"], "and")) == []
+    assert list(retriever.keyword_rows(["toux", "inconnu"])) == [0, 1]
@@ -0,0 +1,78 @@
+import os
+import time
+
+import pytest
+from langchain_core.documents import Document
+
+import query_cache
+import vector_index
+
+
+def documents(texts):
+    return [Document(page_content=text, metadata={"index": i}) for i, text in enumerate(texts)]
+
+
+MANIFEST = {"embedding_model": "fake"}
+
+
+def test_publishing_keeps_a_build_still_being_written(tmp_path, embeddings):
+    index_dir = str(tmp_path)
+    in_progress = vector_index.IndexWriter(index_dir, embeddings)
+    in_progress.add(documents(["paludisme", "toux"]))
+
+    # Un autre worker publie un build pendant ce temps
+    vector_index.build_vector_index(documents(["fièvre"]), embeddings, index_dir, MANIFEST)
+    assert os.path.isdir(in_progress.build_dir)
+
+    in_progress.add(documents(["diarrhée"]))
+    manifest = in_progress.commit(MANIFEST)
+    assert manifest["document_count"] == 3
+    assert vector_index.load_vector_index(index_dir, embeddings).build_id == in_progress.build_id
+
+
+def test_cleanup_removes_only_complete_or_stale_builds(tmp_path, embeddings):
+    index_dir = str(tmp_path)
+    first = vector_index.build_vector_index(documents(["a"]), embeddings, index_dir, MANIFEST).build_id
+    second = vector_index.build_vector_index(documents(["b"]), embeddings, index_dir, MANIFEST).build_id
+    stale = tmp_path / "stale-build"
+    stale.mkdir()
+    (stale / "text.bin").write_bytes(b"x")
+    old = time.time() - vector_index.STALE_BUILD_AGE - 10
+    os.utime(stale / "text.bin", (old, old))
+    os.utime(stale, (old, old))
+
+    third = vector_index.build_vector_index(documents(["c"]), embeddings, index_dir, MANIFEST).build_id
+
+    remaining = {name for name in os.listdir(index_dir) if os.path.isdir(os.path.join(index_dir, name))}
+    # Build publié et build précédent conservés, build terminé plus ancien et build abandonné supprimés
+    assert remaining == {second, third}
+    assert first not in remaining
+
+
+def test_abort_leaves_published_build_intact(tmp_path, embeddings):
+    index_dir = str(tmp_path)
+    published = vector_index.build_vector_index(documents(["a", "b"]), embeddings, index_dir, MANIFEST)
+    writer = vector_index.IndexWriter(index_dir, embeddings)
+    writer.abort()
+
+    assert not os.path.exists(writer.build_dir)
+    assert vector_index.load_vector_index(index_dir, embeddings).build_id == published.build_id
+    with pytest.raises(ValueError):
+        vector_index.IndexWriter(index_dir, embeddings).commit(MANIFEST)
+
+
+def test_query_spellings_share_vector_and_results_whatever_the_order(tmp_path, embeddings):
+    index = vector_index.build_vector_index(
+        documents(["paludisme", "toux sèche", "diarrhée"]), embeddings, str(tmp_path), MANIFEST)
+
+    def search_in_order(queries):
+        query_cache.query_vectors.clear()
+        query_cache.query_results.clear()
+        return [index.similarity_search_with_score(query, k=3) for query in queries]
+
+    def scores(results):
+        return [[score for _, score in found] for found in results]
+
+    first = search_in_order(["J'ai le PALUDISME !!", "paludisme"])
+    second = search_in_order(["paludisme", "J'ai le PALUDISME !!"])
+    assert scores(first)[0] == scores(first)[1] == scores(second)[0]